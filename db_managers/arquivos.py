@@ -1,7 +1,7 @@
 import os
 import sqlite3
 from datetime import datetime
-from typing import Dict, List, Tuple, Set
+from typing import Dict, List, Optional, Tuple, Set
 
 # Importações adicionais para otimização
 from fii_utils.cache_manager import get_cache_manager, cached, CachePolicy
@@ -59,15 +59,37 @@ class ArquivosProcessadosManager:
                 self.conn.close()
             raise
     
+    def criar_tabela(self, cursor: Optional[sqlite3.Cursor] = None) -> None:
+        """
+        Cria a tabela de arquivos processados se não existir.
+        
+        Args:
+            cursor: Cursor de uma transação externa (opcional). Quando informado,
+                    o DDL é executado nele e o commit fica a cargo do chamador.
+        """
+        if cursor is not None:
+            self._executar_ddl(cursor)
+        else:
+            self._criar_tabela_transacao()
+    
     @ensure_connection
     @transaction
-    def criar_tabela(self) -> None:
+    def _criar_tabela_transacao(self) -> None:
         """
-        Cria a tabela de arquivos processados se não existir.
+        Cria a tabela usando a conexão própria do gerenciador.
+        """
+        self._executar_ddl(self.cursor)
+    
+    def _executar_ddl(self, cursor: sqlite3.Cursor) -> None:
+        """
+        Executa os comandos de criação da tabela de arquivos processados.
+        
+        Args:
+            cursor: Cursor onde os comandos serão executados
         """
         try:
             # Cria tabela para controle de arquivos processados
-            self.cursor.execute('''
+            cursor.execute('''
             CREATE TABLE IF NOT EXISTS arquivos_processados (
                 nome_arquivo TEXT PRIMARY KEY,
                 tipo TEXT,
@@ -273,6 +295,31 @@ class ArquivosProcessadosManager:
             self.logger.error(f"Erro ao listar arquivos processados: {e}")
             return []
     
+    @ensure_connection
+    def estatisticas_por_tipo(self) -> Dict[str, Dict[str, int]]:
+        """
+        Agrega no banco a quantidade de arquivos e de registros por tipo.
+        
+        Returns:
+            Dicionário {tipo: {'count': arquivos, 'registros': registros adicionados}}
+        """
+        try:
+            self.cursor.execute('''
+            SELECT tipo, COUNT(*), COALESCE(SUM(registros_adicionados), 0)
+            FROM arquivos_processados
+            GROUP BY tipo
+            ORDER BY tipo
+            ''')
+            
+            return {
+                tipo: {'count': count, 'registros': registros}
+                for tipo, count, registros in self.cursor.fetchall()
+            }
+            
+        except sqlite3.Error as e:
+            self.logger.error(f"Erro ao obter estatísticas de arquivos processados: {e}")
+            return {}
+    
     @ensure_connection
     @cached('arquivos_processados', key_func=lambda self, diretorio: f'pendentes:{diretorio}')
     def verificar_arquivos_zip_pendentes(self, diretorio: str) -> Set[str]:
@@ -11,8 +11,8 @@ from fii_utils.db_decorators import (
     log_execution_time
 )
 
-from fii_utils.parsers import processar_chunk, CotacaoParser, ArquivoCotacao
-from fii_utils.db_utils import conectar_banco
+from fii_utils.parsers import processar_trecho, dividir_arquivo, CotacaoParser, ArquivoCotacao
+from fii_utils.db_utils import conectar_banco, inserir_multiplas_linhas
 from fii_utils.logging_manager import get_logger
 
 # Importação no nível do módulo para evitar importação circular dentro do método
@@ -25,6 +25,17 @@ class CotacoesManager:
     Responsável por inserir, atualizar e consultar cotações dos FIIs.
     """
     
+    # Tamanho (em bytes) dos trechos de arquivos grandes processados em paralelo;
+    # cerca de 100 mil linhas de 247 bytes
+    TAMANHO_CHUNK = 24 * 1024 * 1024
+    
+    # Índices secundários da tabela de cotações; são removidos durante cargas
+    # grandes (ver inserir_cotacoes) e recriados ao final
+    INDICES = (
+        'CREATE INDEX IF NOT EXISTS idx_cotacoes_data ON cotacoes(data)',
+        'CREATE INDEX IF NOT EXISTS idx_cotacoes_codigo ON cotacoes(codigo)',
+    )
+    
     def __init__(self, arquivo_db: str = 'fundos_imobiliarios.db', num_workers: int = None):
         self.arquivo_db = arquivo_db
         self.conn = None
@@ -47,16 +58,39 @@ class CotacoesManager:
         """
         self.conn, self.cursor = conectar_banco(self.arquivo_db)
     
-    def criar_tabela(self) -> None:
+    def criar_tabela(self, cursor: Optional[sqlite3.Cursor] = None) -> None:
         """
         Cria a tabela de cotações se não existir.
+        
+        Args:
+            cursor: Cursor de uma transação externa (opcional). Quando informado,
+                    o DDL é executado nele e o commit fica a cargo do chamador.
         """
+        if cursor is not None:
+            self._executar_ddl(cursor)
+            return
+        
         if not self.conn:
             self.conectar()
             
+        try:
+            self._executar_ddl(self.cursor)
+            self.conn.commit()
+            
+        except sqlite3.Error:
+            self.conn.rollback()
+            raise
+    
+    def _executar_ddl(self, cursor: sqlite3.Cursor) -> None:
+        """
+        Executa os comandos de criação da tabela de cotações e seus índices.
+        
+        Args:
+            cursor: Cursor onde os comandos serão executados
+        """
         try:
             # Cria tabela de cotações (sem a coluna 'media')
-            self.cursor.execute('''
+            cursor.execute('''
             CREATE TABLE IF NOT EXISTS cotacoes (
                 data TEXT,
                 codigo TEXT,
@@ -72,15 +106,13 @@ class CotacoesManager:
             ''')
             
             # Cria índices para otimizar consultas
-            self.cursor.execute('CREATE INDEX IF NOT EXISTS idx_cotacoes_data ON cotacoes(data)')
-            self.cursor.execute('CREATE INDEX IF NOT EXISTS idx_cotacoes_codigo ON cotacoes(codigo)')
+            for sql in self.INDICES:
+                cursor.execute(sql)
             
-            self.conn.commit()
             self.logger.info("Tabela cotacoes criada/verificada com sucesso")
             
         except sqlite3.Error as e:
             self.logger.error(f"Erro ao criar tabela de cotações: {e}")
-            self.conn.rollback()
             raise
     
     @ensure_connection
@@ -118,7 +150,8 @@ class CotacoesManager:
     
     @ensure_connection
     @retry_on_db_locked()
-    @optimize_lote_size(data_size_bytes=100)  # Estimativa de tamanho por registro
+    @optimize_lote_size(data_size_bytes=100, cols_per_row=9,  # Estimativa de tamanho por registro
+                        drop_indexes=('idx_cotacoes_data', 'idx_cotacoes_codigo'))
     def inserir_cotacoes(self, registros: List[Tuple], tamanho_lote: int = 5000) -> int:
         """
         Insere múltiplos registros de cotações no banco com tratamento de conflitos.
@@ -133,18 +166,17 @@ class CotacoesManager:
         registros_inseridos = 0
         
         try:
-            inserir_query = '''
-            INSERT OR IGNORE INTO cotacoes 
-            (data, codigo, abertura, maxima, minima, fechamento, volume, negocios, quantidade)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            '''
+            inserir_prefixo = (
+                "INSERT OR IGNORE INTO cotacoes "
+                "(data, codigo, abertura, maxima, minima, fechamento, volume, negocios, quantidade)"
+            )
             
-            # Insere em lotes usando o tamanho otimizado pelo decorator
+            # Insere em lotes usando o tamanho otimizado pelo decorator,
+            # com INSERTs de múltiplas linhas dentro de cada lote
             for i in range(0, len(registros), tamanho_lote):
                 lote = registros[i:i+tamanho_lote]
                 
-                self.cursor.executemany(inserir_query, lote)
-                registros_inseridos += len(lote)
+                registros_inseridos += inserir_multiplas_linhas(self.conn, inserir_prefixo, 9, lote)
                 self.conn.commit()  # Commit após cada lote
                 
                 if i % 20000 == 0 and i > 0:
@@ -211,6 +243,11 @@ class CotacoesManager:
         registros_inseridos = 0
         
         try:
+            # Recria índices que uma carga anterior interrompida tenha deixado removidos
+            with self.conn:
+                for sql in self.INDICES:
+                    self.conn.execute(sql)
+            
             # Se for para substituir, remove registros existentes no período
             if substituir_existentes:
                 data_inicio = arquivo_cotacao.data_inicio.strftime('%Y-%m-%d')
@@ -255,34 +292,17 @@ class CotacoesManager:
         registros_inseridos = 0
         
         try:
-            # Lê o arquivo e divide em chunks
-            chunks = []
-            current_chunk = []
-            chunk_size = 100000  # Tamanho do chunk
-            
-            # Lê o arquivo uma vez para dividir em chunks
-            with open(arquivo_cotacao.caminho, 'r', encoding='iso-8859-1') as arquivo:
-                self.logger.info(f"Dividindo arquivo {arquivo_cotacao.nome_arquivo} em chunks...")
-                for i, linha in enumerate(arquivo):
-                    # Verifica se é registro tipo 01 (cotações) e com BDI 12 (FII)
-                    if len(linha) >= 245 and linha[0:2] == '01' and linha[10:12].strip() == '12':
-                        current_chunk.append(linha)
-                    
-                    if i % chunk_size == chunk_size - 1:
-                        if current_chunk:  # Só adiciona se houver registros de FII
-                            chunks.append((current_chunk.copy(), self.parser))
-                            current_chunk = []
-                            
-                            # Log de progresso na leitura do arquivo
-                            if len(chunks) % 10 == 0:
-                                self.logger.info(f"Criados {len(chunks)} chunks até agora...")
-            
-            # Adiciona o último chunk se houver
-            if current_chunk:
-                chunks.append((current_chunk, self.parser))
+            # Divide o arquivo em trechos de bytes alinhados ao fim das linhas. Cada
+            # processo lê e filtra o próprio trecho direto do arquivo, então as linhas
+            # não passam pelo processo principal nem são serializadas entre processos
+            self.logger.info(f"Dividindo arquivo {arquivo_cotacao.nome_arquivo} em chunks...")
+            chunks = [
+                (arquivo_cotacao.caminho, inicio, fim, self.parser)
+                for inicio, fim in dividir_arquivo(arquivo_cotacao.caminho, self.TAMANHO_CHUNK)
+            ]
             
             total_chunks = len(chunks)
-            self.logger.info(f"Arquivo {arquivo_cotacao.nome_arquivo} dividido em {total_chunks} chunks de FIIs")
+            self.logger.info(f"Arquivo {arquivo_cotacao.nome_arquivo} dividido em {total_chunks} chunks")
             
             # Ajusta o número de workers com base na quantidade de chunks
             num_workers = min(self.num_workers, total_chunks)
@@ -306,18 +326,21 @@ class CotacoesManager:
             
             with concurrent.futures.ProcessPoolExecutor(max_workers=num_workers) as executor:
                 # Submete todos os chunks para processamento
-                future_to_chunk = {executor.submit(processar_chunk, chunk): i for i, chunk in enumerate(chunks)}
+                future_to_chunk = {executor.submit(processar_trecho, chunk): i for i, chunk in enumerate(chunks)}
                 
                 # Coleta os resultados à medida que ficam prontos
                 for future in concurrent.futures.as_completed(future_to_chunk):
                     chunk_index = future_to_chunk[future]
                     try:
-                        registros_chunk = future.result()
-                        if registros_chunk:
-                            todos_registros.extend(registros_chunk)
+                        # O chunk volta em colunas; as tuplas dos registros são montadas aqui
+                        # Tupla vazia indica erro no processo; colunas vazias são um trecho
+                        # sem registros de FII, o que é normal (ex: arquivos anuais antigos)
+                        colunas_chunk = future.result()
+                        if colunas_chunk:
+                            todos_registros.extend(zip(*colunas_chunk))
                             chunks_processados += 1
                         else:
-                            self.logger.warning(f"Chunk {chunk_index} retornou vazio (possível erro)")
+                            self.logger.warning(f"Chunk {chunk_index} falhou (ver log do processo)")
                             chunks_com_erro += 1
                     except Exception as e:
                         self.logger.error(f"Erro ao processar chunk {chunk_index}: {e}")
@@ -367,26 +390,14 @@ class CotacoesManager:
             Número de registros inseridos
         """
         self.logger.info(f"Processando arquivo diretamente: {arquivo_cotacao}")
-        registros = []
         
         try:
-            with open(arquivo_cotacao.caminho, 'r', encoding='iso-8859-1') as arquivo:
-                for linha in arquivo:
-                    # Verificar se é um registro de FII (tipo 01 e BDI 12)
-                    if len(linha) >= 245 and linha[0:2] == '01' and linha[10:12].strip() == '12':
-                        registro = self.parser.parse_linha(linha)
-                        if registro:
-                            registros.append((
-                                registro['data'],
-                                registro['codigo'],
-                                registro['abertura'],
-                                registro['maxima'],
-                                registro['minima'],
-                                registro['fechamento'],
-                                registro['volume'],
-                                registro['negocios'],
-                                registro['quantidade']
-                            ))
+            with open(arquivo_cotacao.caminho, 'rb') as arquivo:
+                linhas = arquivo.readlines()
+            
+            # Analisa os registros de FII de uma vez, campo a campo (parse_linhas
+            # descarta as linhas que não são cotações de fundos imobiliários)
+            registros = self.parser.parse_linhas(linhas)
             
             # Insere os registros no banco
             registros_inseridos = 0
@@ -33,14 +33,36 @@ class EventosCorporativosManager:
         """
         self.conn, self.cursor = conectar_banco(self.arquivo_db)
     
+    def criar_tabela(self, cursor: Optional[sqlite3.Cursor] = None) -> None:
+        """
+        Cria a tabela de eventos corporativos se não existir.
+        
+        Args:
+            cursor: Cursor de uma transação externa (opcional). Quando informado,
+                    o DDL é executado nele e o commit fica a cargo do chamador.
+        """
+        if cursor is not None:
+            self._executar_ddl(cursor)
+        else:
+            self._criar_tabela_transacao()
+    
     @ensure_connection
     @transaction
-    def criar_tabela(self) -> None:
+    def _criar_tabela_transacao(self) -> None:
+        """
+        Cria a tabela usando a conexão própria do gerenciador.
         """
-        Cria a tabela de eventos corporativos se ela não existir.
+        self._executar_ddl(self.cursor)
+    
+    def _executar_ddl(self, cursor: sqlite3.Cursor) -> None:
+        """
+        Executa os comandos de criação da tabela de eventos corporativos.
+        
+        Args:
+            cursor: Cursor onde os comandos serão executados
         """
         try:
-            self.cursor.execute('''
+            cursor.execute('''
             CREATE TABLE IF NOT EXISTS eventos_corporativos (
                 codigo TEXT,
                 data TEXT,
@@ -52,7 +74,7 @@ class EventosCorporativosManager:
             ''')
             
             # Índice para otimizar consultas
-            self.cursor.execute('CREATE INDEX IF NOT EXISTS idx_eventos_codigo ON eventos_corporativos(codigo)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_eventos_codigo ON eventos_corporativos(codigo)')
             
             self.logger.info("Tabela eventos_corporativos criada/verificada com sucesso")
             
@@ -204,6 +226,28 @@ class EventosCorporativosManager:
             self.logger.error(f"Erro ao listar eventos: {e}")
             return []
     
+    @ensure_connection
+    def contagem_por_tipo(self) -> Dict[str, int]:
+        """
+        Conta no banco os eventos corporativos de cada tipo.
+        
+        Returns:
+            Dicionário {tipo_evento: quantidade}
+        """
+        try:
+            self.cursor.execute('''
+            SELECT tipo_evento, COUNT(*)
+            FROM eventos_corporativos
+            GROUP BY tipo_evento
+            ORDER BY tipo_evento
+            ''')
+            
+            return dict(self.cursor.fetchall())
+            
+        except sqlite3.Error as e:
+            self.logger.error(f"Erro ao contar eventos por tipo: {e}")
+            return {}
+    
     @ensure_connection
     @transaction
     def remover_evento(self, codigo: str, data: str, tipo_evento: str) -> bool:
@@ -247,7 +247,7 @@ class ExportacaoCotacoesManager:
             self.logger.info(f"Executando consulta para {len(lista_sql)} tickers")
             
             # Usa retry_on_db_locked decorador inline para essa operação específica
-            @retry_on_db_locked(max_retries=3, delay_seconds=2)
+            @retry_on_db_locked(max_retries=3)
             def executar_consulta():
                 return pd.read_sql_query(query, self.conn, params=lista_sql, parse_dates=['data'])
                 
@@ -7,7 +7,7 @@ import os
 import logging
 from typing import List, Tuple
 
-from fii_utils.parsers import ArquivoCotacao
+from fii_utils.parsers import ArquivoCotacao, arquivo_cotacao
 from fii_utils.logging_manager import get_logger
 
 
@@ -145,7 +145,7 @@ def identificar_arquivos(diretorio: str, logger: logging.Logger) -> List[Arquivo
         # Cria o objeto ArquivoCotacao
         caminho_completo = os.path.join(diretorio, nome_escolhido)
         try:
-            arquivo = ArquivoCotacao(caminho_completo)
+            arquivo = arquivo_cotacao(caminho_completo)
             arquivos.append(arquivo)
             # Registra outras versões encontradas
             if len(versoes) > 1:
@@ -236,7 +236,7 @@ def identificar_arquivos_novos_modificados(diretorio: str, arquivos_manager, log
                         continue
                 
                 # Criar o objeto ArquivoCotacao com o TXT extraído
-                arquivo = ArquivoCotacao(txt_path)
+                arquivo = arquivo_cotacao(txt_path)
                 arquivos_para_processar.append((arquivo, False))
                 nomes_processados.add(nome_zip)
             
@@ -271,7 +271,7 @@ def identificar_arquivos_novos_modificados(diretorio: str, arquivos_manager, log
                         logger.error(f"Arquivo TXT não encontrado após extração de {nome_zip}")
                         continue
                         
-                    arquivo = ArquivoCotacao(txt_path)
+                    arquivo = arquivo_cotacao(txt_path)
                     arquivos_para_processar.append((arquivo, True))
                     nomes_processados.add(nome_zip)
                     
@@ -0,0 +1,346 @@
+"""
+Motor de downloads concorrentes da B3.
+Executa vários downloads em paralelo usando asyncio, limitando a quantidade
+de transferências simultâneas para não sobrecarregar o servidor.
+"""
+
+import time
+import logging
+import asyncio
+import functools
+import threading
+import email.utils
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+
+# Mesmo logger do downloader; a configuração dos handlers fica a cargo dele
+_LOG = logging.getLogger('b3_downloader')
+
+# Mínimo de verificações de disponibilidade (HEAD) simultâneas; o limite
+# efetivo é o maior entre este e o de downloads simultâneos da configuração
+LIMITE_SONDAGENS = 4
+
+# Taxa máxima de verificações iniciadas por segundo. Passam pelo mesmo balde de
+# fichas dos downloads, que reduz a taxa a cada resposta 429
+TAXA_SONDAGENS = 4.0
+
+# Executor compartilhado entre as rodadas de downloads e verificações. Como as
+# conexões keep-alive do downloader são mantidas por thread, reaproveitar as
+# threads também reaproveita as conexões (e os handshakes TLS) entre rodadas.
+_EXECUTOR: Optional[ThreadPoolExecutor] = None
+_EXECUTOR_THREADS = 0
+_EXECUTOR_LOCK = threading.Lock()
+
+
+class LimitadorTaxa:
+    """
+    Balde de fichas (token bucket) que espaça o início dos downloads.
+    
+    Cada download consome uma ficha, e as fichas são repostas continuamente
+    à taxa atual. Um download lento já "paga" o próprio espaçamento, sem espera
+    artificial extra. A taxa cai pela metade a cada resposta 429 (Too Many
+    Requests) e volta a dobrar, até a taxa máxima, após uma sequência de
+    respostas bem-sucedidas.
+    """
+    
+    # Respostas bem-sucedidas seguidas necessárias para dobrar a taxa
+    SUCESSOS_PARA_AUMENTAR = 10
+    
+    # Fração da taxa máxima abaixo da qual a taxa não é reduzida
+    FRACAO_MINIMA = 1 / 16
+    
+    def __init__(self, taxa: float, capacidade: int = 1) -> None:
+        """
+        Inicializa o limitador com o balde cheio.
+        
+        Args:
+            taxa: Taxa máxima de downloads iniciados por segundo
+            capacidade: Downloads que podem iniciar de imediato (rajada)
+        """
+        self.taxa_maxima = taxa
+        self.capacidade = max(1, capacidade)
+        self._taxa = taxa
+        self._fichas = float(self.capacidade)
+        self._ultimo = time.monotonic()
+        self._bloqueado_ate = 0.0
+        self._sucessos = 0
+        self._lock = threading.Lock()
+    
+    @property
+    def taxa(self) -> float:
+        """
+        Taxa atual de downloads por segundo.
+        """
+        return self._taxa
+    
+    def _repor(self, agora: float) -> None:
+        """
+        Repõe as fichas acumuladas desde a última atualização. Deve ser chamada com _lock adquirido.
+        """
+        self._fichas = min(self.capacidade, self._fichas + (agora - self._ultimo) * self._taxa)
+        self._ultimo = agora
+    
+    def reservar(self) -> float:
+        """
+        Reserva uma ficha para um novo download.
+        
+        Returns:
+            Segundos a aguardar antes de iniciar o download
+        """
+        with self._lock:
+            agora = time.monotonic()
+            self._repor(agora)
+            self._fichas -= 1
+            
+            espera = -self._fichas / self._taxa if self._fichas < 0 else 0.0
+            return max(espera, self._bloqueado_ate - agora)
+    
+    def registrar_resposta(self, status: int, retry_after: Optional[float] = None) -> None:
+        """
+        Ajusta a taxa conforme a resposta do servidor.
+        
+        Args:
+            status: Código de status HTTP
+            retry_after: Espera pedida pelo servidor em segundos (cabeçalho Retry-After, opcional)
+        """
+        with self._lock:
+            agora = time.monotonic()
+            self._repor(agora)
+            
+            if status == 429:
+                self._taxa = max(self.taxa_maxima * self.FRACAO_MINIMA, self._taxa / 2)
+                self._sucessos = 0
+                
+                # Ninguém inicia antes do prazo pedido pelo servidor (ou de um intervalo da nova taxa)
+                atraso = retry_after if retry_after is not None else 1 / self._taxa
+                self._bloqueado_ate = max(self._bloqueado_ate, agora + atraso)
+                
+                _LOG.warning(f"Servidor limitou as requisições (429). Taxa reduzida para {self._taxa:.3f} downloads/s")
+            elif status < 400 and self._taxa < self.taxa_maxima:
+                self._sucessos += 1
+                if self._sucessos >= self.SUCESSOS_PARA_AUMENTAR:
+                    self._taxa = min(self.taxa_maxima, self._taxa * 2)
+                    self._sucessos = 0
+
+
+# Limitador reaproveitado entre rodadas com a mesma configuração
+_LIMITADOR: Optional[LimitadorTaxa] = None
+
+# Limitador das verificações de disponibilidade, reaproveitado entre rodadas
+_LIMITADOR_SONDAGENS: Optional[LimitadorTaxa] = None
+
+# Limitador da rodada de downloads ou verificações em andamento (None fora delas)
+_LIMITADOR_ATIVO: Optional[LimitadorTaxa] = None
+
+
+def _obter_limitador(limite: int, intervalo: Tuple[float, float]) -> Optional[LimitadorTaxa]:
+    """
+    Retorna o limitador para a rodada, reaproveitando o anterior (e a taxa
+    aprendida com respostas 429) se a configuração não mudou.
+    
+    Args:
+        limite: Número máximo de downloads simultâneos
+        intervalo: Espera (mínima, máxima) em segundos entre downloads de cada slot
+    
+    Returns:
+        Limitador com taxa de 'limite' downloads a cada intervalo médio,
+        ou None se não há espera entre downloads
+    """
+    global _LIMITADOR
+    
+    media = (intervalo[0] + intervalo[1]) / 2
+    if media <= 0:
+        return None
+    
+    taxa = limite / media
+    if _LIMITADOR is None or _LIMITADOR.taxa_maxima != taxa or _LIMITADOR.capacidade != limite:
+        _LIMITADOR = LimitadorTaxa(taxa, limite)
+    return _LIMITADOR
+
+
+def registrar_resposta_http(status: int, retry_after: Optional[str] = None) -> None:
+    """
+    Informa ao limitador de downloads o status de uma resposta do servidor.
+    
+    Args:
+        status: Código de status HTTP
+        retry_after: Valor do cabeçalho Retry-After, em segundos ou data HTTP (opcional)
+    """
+    limitador = _LIMITADOR_ATIVO
+    if limitador is None:
+        return
+    
+    espera = None
+    if status == 429 and retry_after:
+        try:
+            espera = max(0.0, float(retry_after))
+        except ValueError:
+            try:
+                espera = max(0.0, email.utils.parsedate_to_datetime(retry_after).timestamp() - time.time())
+            except (TypeError, ValueError):
+                pass
+    
+    limitador.registrar_resposta(status, espera)
+
+
+def _obter_executor(minimo: int) -> ThreadPoolExecutor:
+    """
+    Retorna o executor compartilhado, ampliando-o se tiver menos de 'minimo' threads.
+    
+    Args:
+        minimo: Número mínimo de threads necessário
+    
+    Returns:
+        Executor de threads compartilhado
+    """
+    global _EXECUTOR, _EXECUTOR_THREADS
+    
+    with _EXECUTOR_LOCK:
+        if _EXECUTOR is None or _EXECUTOR_THREADS < minimo:
+            if _EXECUTOR is not None:
+                _EXECUTOR.shutdown(wait=False)
+            _EXECUTOR_THREADS = max(minimo, LIMITE_SONDAGENS)
+            _EXECUTOR = ThreadPoolExecutor(max_workers=_EXECUTOR_THREADS, thread_name_prefix='b3_download')
+        return _EXECUTOR
+
+
+async def fetch_one(sem: asyncio.Semaphore, executor: ThreadPoolExecutor,
+                    baixar: Callable[..., Any], tarefa: Tuple,
+                    limitador: Optional[LimitadorTaxa] = None) -> Any:
+    """
+    Executa um download respeitando o limite de concorrência.
+    
+    O download em si é bloqueante (http.client), por isso roda em uma thread do
+    executor; o event loop apenas coordena as transferências.
+    
+    Args:
+        sem: Semáforo que limita os downloads simultâneos
+        executor: Executor de threads onde o download é executado
+        baixar: Função de download a chamar
+        tarefa: Argumentos posicionais para a função de download
+        limitador: Limitador que espaça o início dos downloads (opcional)
+    
+    Returns:
+        O resultado da função de download
+    """
+    async with sem:
+        if limitador is not None:
+            espera = limitador.reservar()
+            if espera > 0:
+                await asyncio.sleep(espera)
+        
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, functools.partial(baixar, *tarefa))
+
+
+async def _run_all(baixar: Callable[..., Any], tarefas: Sequence[Tuple], limite: int,
+                   limitador: Optional[LimitadorTaxa]) -> List[Any]:
+    """
+    Dispara todos os downloads e aguarda a conclusão.
+    
+    Args:
+        baixar: Função de download a chamar
+        tarefas: Lista de tuplas de argumentos, uma por download
+        limite: Número máximo de downloads simultâneos
+        limitador: Limitador que espaça o início dos downloads (opcional)
+    
+    Returns:
+        Resultados na mesma ordem das tarefas
+    """
+    sem = asyncio.Semaphore(limite)
+    executor = _obter_executor(limite)
+    
+    return await asyncio.gather(
+        *(fetch_one(sem, executor, baixar, tarefa, limitador) for tarefa in tarefas)
+    )
+
+
+def baixar_concorrente(baixar: Callable[..., Any], tarefas: Sequence[Tuple], limite: int = 1,
+                       intervalo: Optional[Tuple[float, float]] = None) -> List[Any]:
+    """
+    Executa downloads concorrentemente e retorna os resultados em ordem.
+    
+    Args:
+        baixar: Função de download a chamar (ex: download_utils.baixar_arquivo)
+        tarefas: Lista de tuplas de argumentos, uma por download
+        limite: Número máximo de downloads simultâneos (config "concurrent_downloads")
+        intervalo: Espera (mínima, máxima) entre downloads de cada slot; define a
+                   taxa máxima do limitador, que se adapta a respostas 429 (opcional)
+    
+    Returns:
+        Lista com o resultado de cada download, na ordem das tarefas
+    """
+    global _LIMITADOR_ATIVO
+    
+    if not tarefas:
+        return []
+    
+    limite = max(1, min(int(limite), len(tarefas)))
+    _LIMITADOR_ATIVO = _obter_limitador(limite, intervalo) if intervalo else None
+    
+    _LOG.info(f"Iniciando {len(tarefas)} downloads com até {limite} simultâneos")
+    
+    try:
+        return asyncio.run(_run_all(baixar, tarefas, limite, _LIMITADOR_ATIVO))
+    finally:
+        # Fora de uma rodada, respostas (ex: verificações) não ajustam a taxa
+        _LIMITADOR_ATIVO = None
+
+
+async def probe_all(datas: Sequence[Tuple], sondar: Callable[..., bool], limite: int,
+                    limitador: Optional[LimitadorTaxa] = None) -> List[Tuple]:
+    """
+    Verifica a disponibilidade de todas as datas concorrentemente.
+    
+    Args:
+        datas: Lista de tuplas de argumentos para a função de verificação
+        sondar: Função que retorna True se o arquivo da data está disponível
+        limite: Número máximo de verificações simultâneas
+        limitador: Limitador que espaça o início das verificações (opcional)
+    
+    Returns:
+        Datas disponíveis, na ordem original
+    """
+    sem = asyncio.Semaphore(limite)
+    executor = _obter_executor(limite)
+    
+    resultados = await asyncio.gather(
+        *(fetch_one(sem, executor, sondar, data, limitador) for data in datas)
+    )
+    
+    return [data for data, ok in zip(datas, resultados) if ok]
+
+
+def filtrar_disponiveis(datas: Sequence[Tuple], sondar: Callable[..., bool],
+                        limite: int = 1) -> List[Tuple]:
+    """
+    Filtra as datas cujos arquivos estão disponíveis, com uma rodada de
+    verificações em paralelo em vez de uma por vez. As verificações iniciam
+    no máximo a TAXA_SONDAGENS por segundo, taxa reduzida a cada resposta 429.
+    
+    Args:
+        datas: Lista de tuplas de argumentos para a função de verificação
+        sondar: Função que retorna True se o arquivo da data está disponível
+        limite: Downloads simultâneos da configuração ("concurrent_downloads");
+                as verificações simultâneas são no mínimo LIMITE_SONDAGENS
+    
+    Returns:
+        Lista das datas disponíveis, na ordem original
+    """
+    global _LIMITADOR_SONDAGENS, _LIMITADOR_ATIVO
+    
+    if not datas:
+        return []
+    
+    limite = max(1, min(max(int(limite), LIMITE_SONDAGENS), len(datas)))
+    
+    if _LIMITADOR_SONDAGENS is None or _LIMITADOR_SONDAGENS.capacidade != limite:
+        _LIMITADOR_SONDAGENS = LimitadorTaxa(TAXA_SONDAGENS, limite)
+    _LIMITADOR_ATIVO = _LIMITADOR_SONDAGENS
+    
+    _LOG.info(f"Verificando disponibilidade de {len(datas)} arquivos com até {limite} verificações simultâneas")
+    
+    try:
+        return asyncio.run(probe_all(datas, sondar, limite, _LIMITADOR_SONDAGENS))
+    finally:
+        _LIMITADOR_ATIVO = None
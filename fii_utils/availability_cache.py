@@ -0,0 +1,231 @@
+"""
+Cache persistente de disponibilidade de arquivos da B3.
+Guarda entre execuções os arquivos que o servidor informou não existirem
+(fins de semana, feriados, datas anteriores à série), evitando repetir
+as mesmas verificações HEAD a cada execução.
+"""
+
+import os
+import time
+import atexit
+import sqlite3
+import calendar
+import datetime
+import threading
+from typing import Optional
+
+from fii_utils.logging_manager import get_logger
+from fii_utils.config_manager import get_config_manager
+
+class CacheDisponibilidade:
+    """
+    Cache em SQLite de veredictos de disponibilidade, implementado como Singleton.
+    Apenas respostas "não disponível" são reaproveitadas, e somente para
+    períodos já encerrados há alguns dias, pois arquivos recentes ainda
+    podem ser publicados.
+    """
+    
+    # Variável de classe para armazenar a instância única (Singleton)
+    _instance = None
+    
+    # Nome do arquivo do cache dentro de data_dir
+    NOME_ARQUIVO = ".disponibilidade.db"
+    
+    # Dias após o fim do período a partir dos quais "não disponível" é considerado definitivo
+    CARENCIA_DIAS = 7
+    
+    def __new__(cls) -> 'CacheDisponibilidade':
+        """
+        Implementação do padrão Singleton. Garante que apenas uma instância da classe seja criada.
+        
+        Returns:
+            Instância única do CacheDisponibilidade
+        """
+        if cls._instance is None:
+            cls._instance = super(CacheDisponibilidade, cls).__new__(cls)
+            cls._instance._initialized = False
+        return cls._instance
+    
+    def __init__(self) -> None:
+        """
+        Inicializa o cache. A conexão é aberta apenas no primeiro uso.
+        """
+        if not self._initialized:
+            self._logger = get_logger('b3_downloader')
+            
+            config_manager = get_config_manager()
+            self._validade = config_manager.get("availability_cache_days", 30) * 86400
+            self._caminho = os.path.join(config_manager.get("data_dir"), self.NOME_ARQUIVO)
+            
+            self._conn = None
+            self._lock = threading.Lock()
+            
+            self._initialized = True
+    
+    def _conexao(self) -> Optional[sqlite3.Connection]:
+        """
+        Abre a conexão com o arquivo do cache, criando a tabela se necessário.
+        
+        Returns:
+            Conexão SQLite, ou None se o cache não puder ser aberto
+        """
+        if self._conn is None:
+            try:
+                os.makedirs(os.path.dirname(self._caminho), exist_ok=True)
+                conn = sqlite3.connect(self._caminho, isolation_level=None, check_same_thread=False)
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("PRAGMA synchronous=NORMAL")
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS avail ("
+                    "key TEXT PRIMARY KEY, available INTEGER NOT NULL, checked_at INTEGER NOT NULL)"
+                )
+                self._conn = conn
+            except sqlite3.Error as e:
+                self._logger.warning(f"Cache de disponibilidade indisponível ({self._caminho}): {e}")
+                return None
+        return self._conn
+    
+    @staticmethod
+    def _chave(periodo: str, dia: Optional[str], mes: Optional[str], ano: str) -> str:
+        """
+        Monta a chave de um arquivo no cache.
+        
+        Args:
+            periodo: Tipo de período ('daily', 'monthly', 'yearly')
+            dia: Dia (string de 2 dígitos, ou None)
+            mes: Mês (string de 2 dígitos, ou None)
+            ano: Ano (string de 4 dígitos)
+        
+        Returns:
+            str: Chave no formato "periodo:AAAAMMDD"
+        """
+        return f"{periodo}:{ano}{mes or ''}{dia or ''}"
+    
+    def _periodo_encerrado(self, dia: Optional[str], mes: Optional[str], ano: str) -> bool:
+        """
+        Verifica se o período terminou há mais de CARENCIA_DIAS dias.
+        
+        Args:
+            dia: Dia (string de 2 dígitos, ou None)
+            mes: Mês (string de 2 dígitos, ou None)
+            ano: Ano (string de 4 dígitos)
+        
+        Returns:
+            bool: True se um "não disponível" para o período pode ser guardado
+        """
+        ano_int = int(ano)
+        if dia:
+            fim = datetime.date(ano_int, int(mes), int(dia))
+        elif mes:
+            fim = datetime.date(ano_int, int(mes), calendar.monthrange(ano_int, int(mes))[1])
+        else:
+            fim = datetime.date(ano_int, 12, 31)
+        
+        return (datetime.date.today() - fim).days > self.CARENCIA_DIAS
+    
+    def nao_disponivel(self, periodo: str, dia: Optional[str], mes: Optional[str], ano: str) -> bool:
+        """
+        Indica se o arquivo foi recentemente verificado como não disponível.
+        
+        Args:
+            periodo: Tipo de período ('daily', 'monthly', 'yearly')
+            dia: Dia (string de 2 dígitos, ou None)
+            mes: Mês (string de 2 dígitos, ou None)
+            ano: Ano (string de 4 dígitos)
+        
+        Returns:
+            bool: True se há um veredicto "não disponível" ainda válido
+        """
+        with self._lock:
+            conn = self._conexao()
+            if conn is None:
+                return False
+            
+            # Falhas do cache (ex: arquivo bloqueado) não devem impedir a verificação
+            try:
+                linha = conn.execute(
+                    "SELECT available, checked_at FROM avail WHERE key = ?",
+                    (self._chave(periodo, dia, mes, ano),)
+                ).fetchone()
+            except sqlite3.Error as e:
+                self._logger.warning(f"Erro ao consultar o cache de disponibilidade: {e}")
+                return False
+        
+        return linha is not None and not linha[0] and time.time() - linha[1] < self._validade
+    
+    def registrar(self, periodo: str, dia: Optional[str], mes: Optional[str], ano: str, disponivel: bool) -> None:
+        """
+        Registra o resultado de uma verificação de disponibilidade.
+        
+        Args:
+            periodo: Tipo de período ('daily', 'monthly', 'yearly')
+            dia: Dia (string de 2 dígitos, ou None)
+            mes: Mês (string de 2 dígitos, ou None)
+            ano: Ano (string de 4 dígitos)
+            disponivel: Resultado da verificação
+        """
+        chave = self._chave(periodo, dia, mes, ano)
+        
+        with self._lock:
+            conn = self._conexao()
+            if conn is None:
+                return
+            
+            try:
+                if disponivel or not self._periodo_encerrado(dia, mes, ano):
+                    # Só veredictos negativos definitivos são reaproveitados
+                    conn.execute("DELETE FROM avail WHERE key = ?", (chave,))
+                else:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO avail (key, available, checked_at) VALUES (?, 0, ?)",
+                        (chave, int(time.time()))
+                    )
+            except sqlite3.Error as e:
+                self._logger.warning(f"Erro ao gravar no cache de disponibilidade: {e}")
+    
+    def invalidar(self, periodo: str, dia: Optional[str], mes: Optional[str], ano: str) -> None:
+        """
+        Remove o veredicto guardado para um arquivo.
+        
+        Args:
+            periodo: Tipo de período ('daily', 'monthly', 'yearly')
+            dia: Dia (string de 2 dígitos, ou None)
+            mes: Mês (string de 2 dígitos, ou None)
+            ano: Ano (string de 4 dígitos)
+        """
+        with self._lock:
+            conn = self._conexao()
+            if conn is None:
+                return
+            
+            try:
+                conn.execute("DELETE FROM avail WHERE key = ?", (self._chave(periodo, dia, mes, ano),))
+            except sqlite3.Error as e:
+                self._logger.warning(f"Erro ao remover do cache de disponibilidade: {e}")
+    
+    def fechar(self) -> None:
+        """
+        Fecha a conexão com o arquivo do cache.
+        """
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+def get_availability_cache() -> CacheDisponibilidade:
+    """
+    Função de conveniência para obter a instância única do cache de disponibilidade.
+    
+    Returns:
+        Instância do CacheDisponibilidade
+    """
+    return CacheDisponibilidade()
+
+def _fechar_cache_disponibilidade() -> None:
+    """
+    Fecha o cache de disponibilidade ao final do processo, se foi criado.
+    """
+    if CacheDisponibilidade._instance is not None and CacheDisponibilidade._instance._initialized:
+        CacheDisponibilidade._instance.fechar()
+
+atexit.register(_fechar_cache_disponibilidade)
@@ -3,7 +3,11 @@ Gerenciador de calendário da B3 para o Sistema de Análise de FIIs.
 Implementa o padrão Singleton para gerenciar o calendário de dias de pregão da B3.
 """
 
+import bisect
 import datetime
+import threading
+from collections import OrderedDict
+from typing import FrozenSet, List
 import pandas as pd
 import pandas_market_calendars as mcal
 
@@ -19,6 +23,12 @@ class CalendarManager:
     # Variável de classe para armazenar a instância única (Singleton)
     _instance = None
     
+    # Tamanho máximo dos caches de consulta por data (LRU)
+    MEMO_MAX_SIZE = 4096
+    
+    # Sentinela para diferenciar "não está no cache" de valores armazenados
+    _MISSING = object()
+    
     def __new__(cls) -> 'CalendarManager':
         """
         Implementação do padrão Singleton. Garante que apenas uma instância da classe seja criada.
@@ -39,10 +49,22 @@ class CalendarManager:
         if not self._initialized:
             self._logger = get_logger('FIICalendar')
             
+            # Validade do calendário em cache, em dias
+            self._cache_days = get_config_manager().get("calendar_cache_days", 30)
+            
             # Inicializa variáveis de instância
             self._calendar_cache = None
             self._last_update = None
             
+            # Dias de pregão do calendário em cache: conjunto para consultas de
+            # pertinência O(1) e lista ordenada para recortar intervalos
+            self._dias_pregao = frozenset()
+            self._dias_pregao_ordenados = []
+            
+            # Cache de consultas de dia de pregão anterior, indexado pelo ordinal da data
+            self._prev_td_cache = OrderedDict()
+            self._memo_lock = threading.RLock()
+            
             # Marca a instância como inicializada
             self._initialized = True
     
@@ -54,9 +76,7 @@ class CalendarManager:
         Returns:
             pandas.DatetimeIndex: Calendário de dias de pregão na B3
         """
-        # Acessa o gerenciador de configuração
-        config_manager = get_config_manager()
-        cache_days = config_manager.get("calendar_cache_days", 30)
+        cache_days = self._cache_days
         
         now = datetime.datetime.now()
         
@@ -81,7 +101,10 @@ class CalendarManager:
             
             # Atualizar o cache
             self._calendar_cache = trading_days
+            self._dias_pregao_ordenados = sorted(dia.date() for dia in trading_days)
+            self._dias_pregao = frozenset(self._dias_pregao_ordenados)
             self._last_update = now
+            self._limpar_memo()
             
             self._logger.info(f"Calendário da B3 atualizado. {len(trading_days)} dias de pregão encontrados")
             return trading_days
@@ -95,6 +118,46 @@ class CalendarManager:
                 self._logger.error("Nenhum calendário em cache disponível. Não é possível determinar dias de pregão")
                 raise
     
+    def _memo_get(self, cache: OrderedDict, chave: int):
+        """
+        Obtém um valor de um cache LRU de consultas, marcando-o como recente.
+        
+        Args:
+            cache: Cache a ser consultado
+            chave: Ordinal da data
+            
+        Returns:
+            Valor armazenado ou _MISSING se a chave não estiver no cache
+        """
+        with self._memo_lock:
+            valor = cache.get(chave, self._MISSING)
+            if valor is not self._MISSING:
+                cache.move_to_end(chave)
+            return valor
+    
+    def _memo_set(self, cache: OrderedDict, chave: int, valor) -> None:
+        """
+        Armazena um valor em um cache LRU de consultas, removendo a entrada
+        menos recente quando o limite é atingido.
+        
+        Args:
+            cache: Cache a ser atualizado
+            chave: Ordinal da data
+            valor: Valor a armazenar
+        """
+        with self._memo_lock:
+            cache[chave] = valor
+            cache.move_to_end(chave)
+            if len(cache) > self.MEMO_MAX_SIZE:
+                cache.popitem(last=False)
+    
+    def _limpar_memo(self) -> None:
+        """
+        Limpa o cache de consultas por data.
+        """
+        with self._memo_lock:
+            self._prev_td_cache.clear()
+    
     def is_trading_day(self, date: datetime.date) -> bool:
         """
         Verifica se uma data é dia de pregão na B3.
@@ -105,18 +168,11 @@ class CalendarManager:
         Returns:
             bool: True se for dia de pregão, False caso contrário
         """
-        # Converter para datetime se for date
-        if isinstance(date, datetime.date) and not isinstance(date, datetime.datetime):
-            date = datetime.datetime.combine(date, datetime.datetime.min.time())
-        
-        # Obter o calendário da B3
-        b3_calendar = self.get_calendar()
-        
-        # Converter para Timestamp para comparação com o calendário
-        data_ts = pd.Timestamp(date)
-        
-        # Verificar se a data está no calendário de pregão
-        return data_ts in b3_calendar
+        # Verificar se a data está no calendário de pregão (consulta O(1) ao conjunto,
+        # que get_trading_days_set mantém atualizado)
+        if isinstance(date, datetime.datetime):
+            date = date.date()
+        return date in self.get_trading_days_set()
     
     def get_previous_trading_day(self, date: datetime.date) -> datetime.date:
         """
@@ -128,6 +184,12 @@ class CalendarManager:
         Returns:
             datetime.date: Data do dia de pregão anterior
         """
+        # Consultas repetidas para a mesma data são respondidas pelo cache
+        chave = date.toordinal()
+        resultado = self._memo_get(self._prev_td_cache, chave)
+        if resultado is not self._MISSING:
+            return resultado
+        
         # Converter para datetime se for date
         if isinstance(date, datetime.date) and not isinstance(date, datetime.datetime):
             date = datetime.datetime.combine(date, datetime.datetime.min.time())
@@ -143,18 +205,56 @@ class CalendarManager:
         
         if len(previous_trading_days) > 0:
             previous_trading_day = previous_trading_days[-1]
-            return previous_trading_day.date()
+            resultado = previous_trading_day.date()
         else:
             self._logger.warning(f"Nenhum dia de pregão anterior a {date.strftime('%Y-%m-%d')} encontrado")
             # Retornar a data original - 1 dia como fallback
-            return (date - datetime.timedelta(days=1)).date()
+            resultado = (date - datetime.timedelta(days=1)).date()
+        
+        self._memo_set(self._prev_td_cache, chave, resultado)
+        return resultado
+    
+    def get_trading_days_set(self) -> FrozenSet[datetime.date]:
+        """
+        Retorna o conjunto de dias de pregão do calendário em cache, atualizando-o se necessário.
+        
+        Returns:
+            FrozenSet[datetime.date]: Dias de pregão na B3
+        """
+        self.get_calendar()
+        return self._dias_pregao
+    
+    def get_trading_days(self, start: datetime.date, end: datetime.date) -> List[datetime.date]:
+        """
+        Lista os dias de pregão na B3 entre duas datas (inclusive), recortando
+        o intervalo da lista ordenada do calendário por busca binária.
+        
+        Args:
+            start: Data inicial (datetime.date ou datetime.datetime)
+            end: Data final (datetime.date ou datetime.datetime)
+            
+        Returns:
+            List[datetime.date]: Dias de pregão no intervalo, em ordem
+        """
+        if isinstance(start, datetime.datetime):
+            start = start.date()
+        if isinstance(end, datetime.datetime):
+            end = end.date()
+        
+        self.get_calendar()
+        dias = self._dias_pregao_ordenados
+        
+        return dias[bisect.bisect_left(dias, start):bisect.bisect_right(dias, end)]
     
     def clear_cache(self) -> None:
         """
         Limpa o cache do calendário, forçando uma nova consulta na próxima vez.
         """
         self._calendar_cache = None
+        self._dias_pregao = frozenset()
+        self._dias_pregao_ordenados = []
         self._last_update = None
+        self._limpar_memo()
         self._logger.info("Cache do calendário da B3 limpo")
 
 
@@ -34,12 +34,12 @@ class ConfigManager:
         "max_log_backups": 5,
         "verify_downloads": True,
         "concurrent_downloads": 1,
-        "enable_curl_verbose": True,
         "fix_permissions": False,
         "secure_permissions": "750",
         "default_period": "daily",
         "try_previous_day": True,
         "calendar_cache_days": 30,    # Dias para manter o cache do calendário da B3
+        "availability_cache_days": 30,  # Dias para lembrar arquivos não disponíveis no servidor
         "extract_retries": 3,         # Número de tentativas para extrair um arquivo ZIP
         "extract_retry_delay": 2.0    # Tempo de espera (segundos) entre tentativas de extração
     }
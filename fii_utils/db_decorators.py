@@ -4,16 +4,55 @@ Centraliza padrões repetitivos e fornece utilidades para otimizar operações d
 """
 
 import functools
+import logging
 import time
+import random
 import sqlite3
+import threading
 
 from fii_utils.logging_manager import get_logger
 from fii_utils.config_manager import get_config_manager
+from fii_utils.db_utils import MAX_VARIAVEIS_SQLITE
 
 # Obtém um logger específico para operações de banco
 logger = get_logger('FIIDatabase')
 config = get_config_manager()
 
+# Gerador aleatório por thread, evitando disputa pelo gerador global no backoff
+_rng_local = threading.local()
+
+def _rng() -> random.Random:
+    """
+    Retorna o gerador de números aleatórios da thread atual.
+    
+    Returns:
+        Instância de random.Random exclusiva da thread
+    """
+    rng = getattr(_rng_local, 'rng', None)
+    if rng is None:
+        rng = _rng_local.rng = random.Random()
+    return rng
+
+def _conectar(obj):
+    """
+    Estabelece a conexão de um gerenciador chamando seu método 'conectar'.
+    
+    Args:
+        obj: Objeto com o método 'conectar' e o atributo 'conn'
+        
+    Returns:
+        A conexão estabelecida
+        
+    Raises:
+        AttributeError: Se o objeto não possuir o método 'conectar'
+    """
+    try:
+        conectar = obj.conectar
+    except AttributeError:
+        raise AttributeError(f"Objeto {obj.__class__.__name__} não possui método 'conectar'") from None
+    conectar()
+    return obj.conn
+
 def ensure_connection(func):
     """
     Decorator que garante que uma conexão com o banco de dados está estabelecida
@@ -31,11 +70,8 @@ def ensure_connection(func):
     @functools.wraps(func)
     def wrapper(self, *args, **kwargs):
         # Verifica se a conexão existe e está aberta
-        if not hasattr(self, 'conn') or self.conn is None:
-            if hasattr(self, 'conectar'):
-                self.conectar()
-            else:
-                raise AttributeError(f"Objeto {self.__class__.__name__} não possui método 'conectar'")
+        if getattr(self, 'conn', None) is None:
+            _conectar(self)
         
         # Executa a função original
         return func(self, *args, **kwargs)
@@ -56,27 +92,17 @@ def transaction(func):
     @functools.wraps(func)
     def wrapper(self, *args, **kwargs):
         # Garante que uma conexão está estabelecida
-        if not hasattr(self, 'conn') or self.conn is None:
-            if hasattr(self, 'conectar'):
-                self.conectar()
-            else:
-                raise AttributeError(f"Objeto {self.__class__.__name__} não possui método 'conectar'")
+        conn = getattr(self, 'conn', None)
+        if conn is None:
+            conn = _conectar(self)
         
         try:
-            # Executa a função
-            result = func(self, *args, **kwargs)
-            
-            # Faz commit se a conexão estiver ativa
-            if self.conn:
-                self.conn.commit()
-            
-            return result
+            # A conexão como context manager faz commit ao final do bloco
+            # ou rollback se uma exceção for levantada
+            with conn:
+                return func(self, *args, **kwargs)
             
         except Exception as e:
-            # Faz rollback em caso de erro
-            if hasattr(self, 'conn') and self.conn:
-                self.conn.rollback()
-            
             # Registra o erro
             logger.error(f"Erro na transação em {func.__name__}: {e}")
             
@@ -85,14 +111,39 @@ def transaction(func):
     
     return wrapper
 
-def retry_on_db_locked(max_retries=3, delay_seconds=2):
+# Códigos primários de bloqueio; o código estendido (ex: SQLITE_BUSY_SNAPSHOT)
+# é reduzido ao primário pelos 8 bits menos significativos
+_CODIGOS_BLOQUEIO = frozenset((getattr(sqlite3, 'SQLITE_BUSY', 5), getattr(sqlite3, 'SQLITE_LOCKED', 6)))
+
+def _banco_bloqueado(erro):
+    """
+    Indica se um erro do SQLite corresponde a banco ocupado ou bloqueado.
+    
+    Args:
+        erro: Exceção sqlite3.OperationalError
+        
+    Returns:
+        True se o erro for SQLITE_BUSY/SQLITE_LOCKED (ou variantes estendidas)
+    """
+    # Python 3.11+ expõe o código de erro do SQLite nas instâncias das exceções
+    codigo = getattr(erro, 'sqlite_errorcode', None)
+    if codigo is not None:
+        return (codigo & 0xFF) in _CODIGOS_BLOQUEIO
+    return "database is locked" in str(erro)
+
+def retry_on_db_locked(max_retries=8, base_ms=1, cap_ms=100):
     """
     Decorator para tentar novamente operações de banco de dados quando
     o banco está bloqueado (erro 'database is locked').
     
+    Contenções curtas são absorvidas pelo busy_timeout do próprio SQLite;
+    entre as tentativas feitas aqui é usado backoff exponencial com jitter
+    completo: espera aleatória entre 0 e min(cap_ms, base_ms * 2^tentativa).
+    
     Args:
         max_retries: Número máximo de tentativas
-        delay_seconds: Tempo de espera entre tentativas
+        base_ms: Espera base do backoff em milissegundos
+        cap_ms: Espera máxima entre tentativas em milissegundos
         
     Returns:
         Decorator configurado
@@ -107,10 +158,11 @@ def retry_on_db_locked(max_retries=3, delay_seconds=2):
                 try:
                     return func(*args, **kwargs)
                 except sqlite3.OperationalError as e:
-                    if "database is locked" in str(e) and attempts < max_retries - 1:
+                    if _banco_bloqueado(e) and attempts < max_retries - 1:
                         attempts += 1
-                        logger.warning(f"Banco bloqueado. Tentativa {attempts} de {max_retries}. Aguardando {delay_seconds}s...")
-                        time.sleep(delay_seconds)
+                        delay = _rng().random() * min(cap_ms, base_ms * (1 << attempts)) / 1000.0
+                        logger.warning(f"Banco bloqueado. Tentativa {attempts} de {max_retries}. Aguardando {delay:.3f}s...")
+                        time.sleep(delay)
                         last_error = e
                     else:
                         raise
@@ -128,13 +180,116 @@ def retry_on_db_locked(max_retries=3, delay_seconds=2):
     
     return decorator
 
-def optimize_lote_size(data_size_bytes=None):
+@functools.lru_cache(maxsize=256)
+def _registrar_tamanho_lote(tamanho_lote, total_registros):
+    """
+    Registra o tamanho de lote escolhido uma única vez por combinação,
+    evitando inundar o log em chamadas repetidas.
+    
+    Args:
+        tamanho_lote: Tamanho de lote escolhido
+        total_registros: Quantidade de registros da chamada
+    """
+    logger.debug(f"Tamanho de lote otimizado: {tamanho_lote} para {total_registros} registros")
+
+def _faixas_lote(lote_maximo):
+    """
+    Retorna as faixas de tamanho de lote em potências de 2 até o máximo,
+    incluindo o próprio máximo como última faixa.
+    
+    Args:
+        lote_maximo: Maior tamanho de lote permitido
+        
+    Returns:
+        Lista crescente de tamanhos de lote
+    """
+    faixas = [1 << i for i in range(lote_maximo.bit_length()) if (1 << i) < lote_maximo]
+    faixas.append(lote_maximo)
+    return faixas
+
+def _carga_dominante(conn, nomes, total):
+    """
+    Indica se uma inserção é grande em relação à tabela dos índices, ou seja,
+    se a tabela está vazia ou tem menos linhas do que os registros a inserir.
+    Só nesse caso recriar os índices ao final custa menos do que mantê-los.
+    
+    Args:
+        conn: Conexão SQLite
+        nomes: Nomes dos índices candidatos à remoção
+        total: Quantidade de registros a inserir
+        
+    Returns:
+        True se os índices devem ser removidos durante a inserção
+    """
+    tabelas = conn.execute(
+        f"SELECT DISTINCT tbl_name FROM sqlite_master WHERE type = 'index' AND name IN ({','.join('?' * len(nomes))})",
+        tuple(nomes)
+    ).fetchall()
+    
+    for (tabela,) in tabelas:
+        # MAX(rowid) estima as linhas pela busca na árvore, sem varrer a tabela;
+        # após exclusões superestima, o que só torna a remoção mais rara
+        linhas = conn.execute(f'SELECT MAX(rowid) FROM "{tabela}"').fetchone()[0] or 0
+        if linhas >= total:
+            return False
+    
+    return bool(tabelas)
+
+def _remover_indices(conn, nomes):
+    """
+    Remove índices secundários, guardando seus comandos de criação.
+    
+    Args:
+        conn: Conexão SQLite
+        nomes: Nomes dos índices a remover
+        
+    Returns:
+        Lista de comandos CREATE INDEX dos índices removidos
+    """
+    marcadores = ",".join("?" * len(nomes))
+    comandos = conn.execute(
+        f"SELECT name, sql FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL AND name IN ({marcadores})",
+        tuple(nomes)
+    ).fetchall()
+    
+    with conn:
+        for nome, _ in comandos:
+            conn.execute(f'DROP INDEX IF EXISTS "{nome}"')
+    
+    if comandos:
+        logger.info(f"Índices removidos durante a inserção em massa: {', '.join(nome for nome, _ in comandos)}")
+    return [sql for _, sql in comandos]
+
+def _recriar_indices(conn, comandos):
+    """
+    Recria índices removidos por _remover_indices.
+    
+    Args:
+        conn: Conexão SQLite
+        comandos: Comandos CREATE INDEX a executar
+    """
+    with conn:
+        for sql in comandos:
+            conn.execute(sql)
+    logger.info(f"{len(comandos)} índices recriados após a inserção em massa")
+
+def optimize_lote_size(data_size_bytes=None, cols_per_row=None, drop_indexes=None):
     """
     Decorator que otimiza o tamanho do lote para operações em lote
     com base no tamanho dos dados ou configuração.
     
+    O tamanho escolhido é a maior faixa (potência de 2, ou o máximo permitido)
+    que não excede o número de registros. O máximo respeita o lote grande da
+    configuração, o limite em bytes por lote e, quando cols_per_row é informado,
+    o limite de parâmetros por comando do SQLite.
+    
     Args:
         data_size_bytes: Tamanho aproximado em bytes de cada registro (opcional)
+        cols_per_row: Número de colunas inseridas por registro (opcional)
+        drop_indexes: Índices secundários removidos durante inserções grandes
+                      (acima de db_limite_remover_indices registros e maiores que
+                      a tabela já existente, ex: carga inicial) e recriados ao
+                      final, mesmo em caso de erro (opcional)
         
     Returns:
         Decorator configurado
@@ -142,37 +297,45 @@ def optimize_lote_size(data_size_bytes=None):
     def decorator(func):
         @functools.wraps(func)
         def wrapper(self, registros, *args, **kwargs):
-            # Obter tamanhos de lote da configuração
-            lote_pequeno = config.get("db_lote_size_pequeno", 1000)
-            lote_medio = config.get("db_lote_size_medio", 5000)
+            # Obter limites da configuração
             lote_grande = config.get("db_lote_size_grande", 10000)
             max_lote_bytes = config.get("db_tamanho_maximo_lote_bytes", 1048576)  # 1MB
             
-            # Determinar tamanho apropriado de lote
-            if len(registros) <= lote_pequeno:
-                # Para poucos registros, usa o lote pequeno
-                tamanho_lote = lote_pequeno
-            elif data_size_bytes is not None:
-                # Se conhecemos o tamanho aproximado dos registros, otimizamos
-                total_bytes = len(registros) * data_size_bytes
-                # Calcula o tamanho do lote para não exceder max_lote_bytes
-                records_per_batch = max(1, min(lote_grande, max_lote_bytes // data_size_bytes))
-                tamanho_lote = records_per_batch
-            elif len(registros) <= lote_medio * 10:
-                # Para quantidades médias, usa o lote médio
-                tamanho_lote = lote_medio
-            else:
-                # Para grandes volumes, usa o lote grande
-                tamanho_lote = lote_grande
+            # Determinar o maior lote permitido
+            lote_maximo = lote_grande
+            if data_size_bytes is not None:
+                lote_maximo = min(lote_maximo, max_lote_bytes // data_size_bytes)
+            if cols_per_row is not None:
+                lote_maximo = min(lote_maximo, MAX_VARIAVEIS_SQLITE // cols_per_row)
+            lote_maximo = max(1, lote_maximo)
+            
+            # Maior faixa que não excede a quantidade de registros
+            total = len(registros)
+            faixas = _faixas_lote(lote_maximo)
+            tamanho_lote = next((f for f in reversed(faixas) if f <= total), 1)
             
             # Registra o tamanho do lote usado
-            logger.debug(f"Tamanho de lote otimizado: {tamanho_lote} para {len(registros)} registros")
+            _registrar_tamanho_lote(tamanho_lote, total)
             
             # Adiciona o tamanho do lote aos kwargs
             kwargs['tamanho_lote'] = tamanho_lote
             
-            # Chama a função original
-            return func(self, registros, *args, **kwargs)
+            # Em inserções grandes em relação à tabela, atualizar os índices linha
+            # a linha custa mais do que recriá-los ao final em uma única passada
+            # ordenada. Em cargas incrementais sobre uma tabela populada, recriar
+            # os índices sobre a tabela inteira seria mais caro e os deixaria
+            # ausentes para os leitores durante toda a inserção
+            indices_removidos = []
+            if (drop_indexes and total > config.get("db_limite_remover_indices", 10000)
+                    and _carga_dominante(self.conn, drop_indexes, total)):
+                indices_removidos = _remover_indices(self.conn, drop_indexes)
+            
+            try:
+                # Chama a função original
+                return func(self, registros, *args, **kwargs)
+            finally:
+                if indices_removidos:
+                    _recriar_indices(self.conn, indices_removidos)
         
         return wrapper
     
@@ -191,41 +354,35 @@ def log_execution_time(func):
     """
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
-        start_time = time.time()
+        inicio = time.perf_counter_ns()
         
         try:
             # Executa a função
-            result = func(*args, **kwargs)
+            return func(*args, **kwargs)
             
-            # Calcula o tempo
-            end_time = time.time()
-            execution_time = end_time - start_time
-            
-            # Registra o tempo
-            logger.debug(f"Tempo de execução de {func.__name__}: {execution_time:.2f}s")
+        finally:
+            # Um único cálculo de tempo cobre sucesso e erro
+            execution_time = (time.perf_counter_ns() - inicio) / 1e9
             
             # Se a execução foi muito lenta, registra um aviso
             if execution_time > 1.0:  # Threshold arbitrário de 1 segundo
-                logger.warning(f"Operação lenta: {func.__name__} ({execution_time:.2f}s)")
-            
-            return result
-            
-        except Exception as e:
-            # Em caso de erro, ainda calculamos o tempo até o erro
-            end_time = time.time()
-            execution_time = end_time - start_time
-            
-            logger.error(f"Erro em {func.__name__} após {execution_time:.2f}s: {e}")
-            raise
+                logger.warning("Operação lenta: %s (%.2fs)", func.__name__, execution_time)
+            elif logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Tempo de execução de %s: %.2fs", func.__name__, execution_time)
     
     return wrapper
 
 def prepared_statement(sql, bind_args=None):
     """
-    Decorator para reutilizar prepared statements.
+    Decorator que executa uma query fixa e entrega o cursor resultante à função.
+    
+    O sqlite3 não expõe uma API de prepare, mas mantém internamente um cache de
+    statements compilados por conexão (ver cached_statements em conectar_banco);
+    reutilizar sempre o mesmo texto SQL é o que garante o reaproveitamento.
+    A função decorada recebe o cursor como primeiro argumento após self.
     
     Args:
-        sql: Query SQL a ser preparada
+        sql: Query SQL a ser executada
         bind_args: Função para extrair os argumentos da bind dos args/kwargs da função
         
     Returns:
@@ -236,40 +393,21 @@ def prepared_statement(sql, bind_args=None):
         bind_args = lambda *args, **kwargs: args[0] if args else tuple()
     
     def decorator(func):
-        # Atributos para armazenar o statement preparado
-        # Serão definidos na primeira chamada
-        stmt_name = f"_stmt_{func.__name__}"
-        stmt_initialized = f"_stmt_{func.__name__}_initialized"
-        
         @functools.wraps(func)
         def wrapper(self, *args, **kwargs):
-            # Verifica se o statement já está preparado
-            if not hasattr(self, stmt_initialized) or not getattr(self, stmt_initialized):
-                # Prepara o statement
-                if hasattr(self, 'cursor') and self.cursor:
-                    # setattr(self, stmt_name, self.cursor.prepare(sql))
-                    setattr(self, stmt_initialized, True)
-                else:
-                    # Se não temos cursor, apenas executamos normalmente
-                    return func(self, *args, **kwargs)
-            
-            # Extrai os argumentos para bind
-            bind_values = bind_args(*args, **kwargs)
+            conn = getattr(self, 'conn', None)
+            if conn is None:
+                conn = _conectar(self)
             
             try:
-                # Na verdade, SQLite não tem verdadeiro prepared statements como PostgreSQL ou MySQL
-                # Então aqui apenas executamos a query com os argumentos
-                self.cursor.execute(sql, bind_values)
-                
-                # Processa o resultado conforme a função original
-                return func(self, *args, **kwargs)
-                
+                cur = conn.execute(sql, bind_args(*args, **kwargs))
             except Exception as e:
-                logger.error(f"Erro ao executar prepared statement: {e}")
-                # Em caso de erro, resetamos o flag para recriar o statement
-                setattr(self, stmt_initialized, False)
+                logger.error(f"Erro ao executar prepared statement em {func.__name__}: {e}")
                 raise
+            
+            # Processa o resultado conforme a função original
+            return func(self, cur, *args, **kwargs)
         
         return wrapper
     
-    return decorator
\ No newline at end of file
+    return decorator
@@ -11,12 +11,20 @@ from contextlib import contextmanager
 from db_managers.cotacoes import CotacoesManager
 from db_managers.arquivos import ArquivosProcessadosManager
 from db_managers.eventos import EventosCorporativosManager
+from fii_utils.db_utils import conexao_banco
+
+# Workers padrão para o processamento paralelo (parse) dos arquivos, calculado
+# uma única vez. As escritas não são paralelizadas: com WAL o SQLite admite
+# vários leitores mas apenas um escritor, e workers extras só disputariam o lock.
+_DEFAULT_WORKERS_READ = max(1, (os.cpu_count() or 1) // 2)
 
 
 @contextmanager
 def gerenciador_contexto(gerenciador):
     """
     Context manager para garantir que a conexão com o banco seja fechada corretamente.
+    Todos os gerenciadores definem 'conn' no __init__ e os métodos 'conectar'
+    e 'fechar_conexao', dispensando verificações com hasattr.
     
     Args:
         gerenciador: Uma instância de gerenciador de banco de dados
@@ -26,13 +34,12 @@ def gerenciador_contexto(gerenciador):
     """
     try:
         # Garantir que o gerenciador está conectado
-        if hasattr(gerenciador, 'conectar') and gerenciador.conn is None:
+        if gerenciador.conn is None:
             gerenciador.conectar()
         yield gerenciador
     finally:
         # Garantir que a conexão é fechada após o uso
-        if hasattr(gerenciador, 'fechar_conexao'):
-            gerenciador.fechar_conexao()
+        gerenciador.fechar_conexao()
 
 
 def exibir_estatisticas(cotacoes_manager: Optional[CotacoesManager] = None, 
@@ -82,18 +89,9 @@ def exibir_estatisticas(cotacoes_manager: Optional[CotacoesManager] = None,
         # Obtém estatísticas de cotações
         stats = cotacoes_manager.obter_estatisticas()
         
-        # Obtém lista de arquivos processados
-        arquivos = arquivos_manager.listar_arquivos_processados()
-        
-        # Agrupa por tipo
-        stats_tipo = {}
-        for arquivo in arquivos:
-            tipo = arquivo['tipo']
-            if tipo not in stats_tipo:
-                stats_tipo[tipo] = {'count': 0, 'registros': 0}
-            
-            stats_tipo[tipo]['count'] += 1
-            stats_tipo[tipo]['registros'] += arquivo['registros_adicionados']
+        # Agrupa arquivos processados por tipo (agregação feita no banco)
+        stats_tipo = arquivos_manager.estatisticas_por_tipo()
+        total_arquivos = sum(info['count'] for info in stats_tipo.values())
         
         # Exibe as estatísticas
         print("\n" + "="*50)
@@ -110,23 +108,17 @@ def exibir_estatisticas(cotacoes_manager: Optional[CotacoesManager] = None,
         # Adiciona estatísticas de eventos se o gerenciador foi fornecido
         eventos_stats = {}
         if eventos_manager:
-            eventos = eventos_manager.listar_eventos()
-            eventos_por_tipo = {}
-            
-            for e in eventos:
-                tipo = e['evento']
-                if tipo not in eventos_por_tipo:
-                    eventos_por_tipo[tipo] = 0
-                eventos_por_tipo[tipo] += 1
+            eventos_por_tipo = eventos_manager.contagem_por_tipo()
+            total_eventos = sum(eventos_por_tipo.values())
             
             print("\nEventos corporativos:")
-            print(f"- Total de eventos: {len(eventos)}")
+            print(f"- Total de eventos: {total_eventos}")
             
             for tipo, count in eventos_por_tipo.items():
                 print(f"- {tipo}: {count} eventos")
                 
             eventos_stats = {
-                'total': len(eventos),
+                'total': total_eventos,
                 'por_tipo': eventos_por_tipo
             }
         
@@ -137,7 +129,7 @@ def exibir_estatisticas(cotacoes_manager: Optional[CotacoesManager] = None,
             result = {
                 'cotacoes': stats,
                 'arquivos': {
-                    'total': len(arquivos),
+                    'total': total_arquivos,
                     'por_tipo': stats_tipo
                 }
             }
@@ -168,7 +160,9 @@ def verificar_conectar_gerenciadores(db_path: str, logger: logging.Logger,
         include_cotacoes: Se deve incluir o gerenciador de cotações
         include_arquivos: Se deve incluir o gerenciador de arquivos
         include_eventos: Se deve incluir o gerenciador de eventos
-        num_workers: Número de workers para processamento paralelo
+        num_workers: Número de workers para processamento paralelo dos arquivos
+                     (padrão: metade dos núcleos). As inserções no banco
+                     continuam em uma única conexão escritora.
         
     Returns:
         Tupla de gerenciadores conectados (na ordem: cotacoes, arquivos, eventos)
@@ -181,7 +175,7 @@ def verificar_conectar_gerenciadores(db_path: str, logger: logging.Logger,
     
     # Determina número de workers se não foi especificado
     if num_workers is None:
-        num_workers = max(1, os.cpu_count() // 2)
+        num_workers = _DEFAULT_WORKERS_READ
     
     # Instancia e conecta os gerenciadores solicitados
     cotacoes_manager = None
@@ -207,14 +201,7 @@ def verificar_conectar_gerenciadores(db_path: str, logger: logging.Logger,
         # Em caso de erro, fecha conexões que foram abertas
         logger.error(f"Erro ao conectar gerenciadores: {e}")
         
-        if cotacoes_manager and hasattr(cotacoes_manager, 'fechar_conexao'):
-            cotacoes_manager.fechar_conexao()
-            
-        if arquivos_manager and hasattr(arquivos_manager, 'fechar_conexao'):
-            arquivos_manager.fechar_conexao()
-            
-        if eventos_manager and hasattr(eventos_manager, 'fechar_conexao'):
-            eventos_manager.fechar_conexao()
+        fechar_gerenciadores(cotacoes_manager, arquivos_manager, eventos_manager)
             
         return (None, None, None)
 
@@ -231,14 +218,9 @@ def fechar_gerenciadores(cotacoes_manager: Optional[CotacoesManager] = None,
         eventos_manager: Instância do EventosCorporativosManager
     """
     # Fecha as conexões em ordem reversa para evitar problemas
-    if eventos_manager and hasattr(eventos_manager, 'fechar_conexao'):
-        eventos_manager.fechar_conexao()
-        
-    if arquivos_manager and hasattr(arquivos_manager, 'fechar_conexao'):
-        arquivos_manager.fechar_conexao()
-        
-    if cotacoes_manager and hasattr(cotacoes_manager, 'fechar_conexao'):
-        cotacoes_manager.fechar_conexao()
+    for manager in (eventos_manager, arquivos_manager, cotacoes_manager):
+        if manager is not None:
+            manager.fechar_conexao()
 
 
 def criar_tabelas_banco(db_path: str, logger: logging.Logger) -> bool:
@@ -252,25 +234,22 @@ def criar_tabelas_banco(db_path: str, logger: logging.Logger) -> bool:
     Returns:
         bool: True se as tabelas foram criadas com sucesso, False caso contrário
     """
-    # Instancia gerenciadores
-    cotacoes_manager, arquivos_manager, eventos_manager = verificar_conectar_gerenciadores(
-        db_path, logger, include_cotacoes=True, include_arquivos=True, include_eventos=True
+    # Os gerenciadores são usados apenas pelo DDL; todas as tabelas são
+    # criadas em uma única conexão e transação (um único fsync)
+    gerenciadores = (
+        CotacoesManager(db_path),
+        ArquivosProcessadosManager(db_path),
+        EventosCorporativosManager(db_path),
     )
     
-    if not cotacoes_manager or not arquivos_manager or not eventos_manager:
-        logger.error("Não foi possível conectar aos gerenciadores para criar tabelas")
-        return False
-    
     try:
-        # Cria as tabelas
-        with gerenciador_contexto(cotacoes_manager) as cm:
-            cm.criar_tabela()
-            
-        with gerenciador_contexto(arquivos_manager) as am:
-            am.criar_tabela()
+        with conexao_banco(db_path) as conn:
+            cursor = conn.execute("BEGIN IMMEDIATE")
             
-        with gerenciador_contexto(eventos_manager) as em:
-            em.criar_tabela()
+            for gerenciador in gerenciadores:
+                gerenciador.criar_tabela(cursor=cursor)
+                
+            conn.commit()
         
         logger.info("Tabelas criadas com sucesso")
         return True
@@ -278,7 +257,3 @@ def criar_tabelas_banco(db_path: str, logger: logging.Logger) -> bool:
     except Exception as e:
         logger.error(f"Erro ao criar tabelas: {e}")
         return False
-        
-    finally:
-        # Fecha conexões
-        fechar_gerenciadores(cotacoes_manager, arquivos_manager, eventos_manager)
\ No newline at end of file
@@ -2,28 +2,71 @@ import os
 import sqlite3
 import hashlib
 import logging
-from typing import Tuple, Generator
+import atexit
+import functools
+import itertools
+import threading
+import weakref
+from typing import Any, Dict, List, Sequence, Tuple, Generator, Union
 import time
 from contextlib import contextmanager
 
+# Tamanho do bloco de leitura usado no cálculo de hash (1 MiB)
+TAMANHO_BLOCO_HASH = 1 << 20
+
+# Número máximo de conexões ociosas mantidas por banco em cada thread
+TAMANHO_MAXIMO_POOL = 4
+
+# Pool de conexões usado por conexao_banco. Conexões SQLite só podem ser usadas
+# pela thread que as criou, então cada thread mantém seu próprio pool.
+_pool_local = threading.local()
+
+
+class _PoolConexoes(dict):
+    """
+    Pool de conexões ociosas de uma thread: {caminho absoluto do banco: lista de conexões}.
+    Subclasse de dict para admitir referências fracas; comparada por identidade
+    para poder fazer parte de um WeakSet.
+    """
+    __hash__ = object.__hash__
+    __eq__ = object.__eq__
+
+
+# Pools de todas as threads, para fechar_pool_conexoes. As referências são fracas:
+# quando uma thread termina, seu pool e as conexões nele são liberados (e fechados)
+# junto com ela, sem esperar o fim do processo.
+_pools_threads: 'weakref.WeakSet[_PoolConexoes]' = weakref.WeakSet()
+_pools_threads_lock = threading.Lock()
+
+# Limite de parâmetros por comando do SQLite (SQLITE_MAX_VARIABLE_NUMBER):
+# 32766 a partir da versão 3.32.0, 999 nas versões anteriores
+MAX_VARIAVEIS_SQLITE = 32766 if sqlite3.sqlite_version_info >= (3, 32, 0) else 999
+
 def calcular_hash_arquivo(caminho_arquivo: str) -> str:
     """
     Calcula o hash MD5 de um arquivo.
     
+    O algoritmo é mantido em MD5 porque os hashes já registrados na tabela
+    arquivos_processados são comparados com este valor para detectar mudanças.
+    
     Args:
         caminho_arquivo: Caminho completo para o arquivo
             
     Returns:
         String com o hash MD5 hexadecimal
     """
-    # Usa o algoritmo MD5 para calcular o hash
-    hash_md5 = hashlib.md5()
-    
     try:
-        with open(caminho_arquivo, 'rb') as arquivo:
-            # Lê o arquivo em blocos para não carregar tudo na memória
-            for bloco in iter(lambda: arquivo.read(4096), b''):
-                hash_md5.update(bloco)
+        with open(caminho_arquivo, 'rb', buffering=0) as arquivo:
+            # Python 3.11+: leitura em blocos feita em C, liberando o GIL
+            if hasattr(hashlib, 'file_digest'):
+                return hashlib.file_digest(arquivo, 'md5').hexdigest()
+            
+            # Lê o arquivo em blocos de 1 MiB reutilizando o mesmo buffer
+            hash_md5 = hashlib.md5()
+            buffer = bytearray(TAMANHO_BLOCO_HASH)
+            visao = memoryview(buffer)
+            for lidos in iter(lambda: arquivo.readinto(buffer), 0):
+                hash_md5.update(visao[:lidos])
                 
         return hash_md5.hexdigest()
     except Exception as e:
@@ -31,49 +74,144 @@ def calcular_hash_arquivo(caminho_arquivo: str) -> str:
         logger.error(f"Erro ao calcular hash do arquivo {caminho_arquivo}: {e}")
         return ""
 
+# PRAGMAs que valem apenas para a conexão e precisam ser reaplicados a cada nova conexão
+PRAGMAS_CONEXAO = """
+PRAGMA synchronous = NORMAL;        -- Modificado de OFF para NORMAL para mais segurança
+PRAGMA cache_size = 100000;         -- Cerca de 100MB de cache
+PRAGMA temp_store = MEMORY;
+PRAGMA busy_timeout = 30000;        -- 30 segundos; retry_on_db_locked só atua se este prazo se esgotar
+PRAGMA mmap_size = 268435456;       -- 256MB mapeados em memória para leituras
+PRAGMA wal_autocheckpoint = 10000;  -- Evita checkpoints no meio de inserções em lote
+"""
+
 def otimizar_conexao_sqlite(cursor: sqlite3.Cursor) -> None:
     """
     Aplica otimizações de performance para conexão SQLite.
     
+    PRAGMAs persistidos no arquivo (journal_mode e page_size) só são emitidos
+    quando necessário; page_size só tem efeito antes da criação da primeira tabela.
+    Os demais valem apenas para a conexão e são sempre aplicados.
+    
     Args:
         cursor: Cursor SQLite ativo
     """
-    cursor.execute("PRAGMA synchronous = NORMAL")  # Modificado de OFF para NORMAL para mais segurança
-    cursor.execute("PRAGMA journal_mode = WAL")    # Modificado de MEMORY para WAL (Write-Ahead Logging) para reduzir bloqueios
-    cursor.execute("PRAGMA cache_size = 100000")  # Cerca de 100MB de cache
-    cursor.execute("PRAGMA temp_store = MEMORY")
-    cursor.execute("PRAGMA busy_timeout = 30000")  # 30 segundos de timeout para esperar bloqueios
-    cursor.execute("PRAGMA page_size = 4096")
+    # page_size precisa ser definido antes de qualquer escrita (e antes do WAL)
+    if cursor.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()[0] == 0:
+        cursor.execute("PRAGMA page_size = 4096")
+    
+    # O modo WAL é persistido no arquivo; evita reconfigurá-lo a cada conexão
+    if cursor.execute("PRAGMA journal_mode").fetchone()[0].lower() != 'wal':
+        cursor.execute("PRAGMA journal_mode = WAL")    # Modificado de MEMORY para WAL (Write-Ahead Logging) para reduzir bloqueios
+    
+    # PRAGMAs da conexão aplicados em uma única chamada
+    cursor.executescript(PRAGMAS_CONEXAO)
     
     logger = logging.getLogger('FIIDatabase')
     logger.info("Aplicadas otimizações de PRAGMA para SQLite")
 
+def _pool_da_thread() -> Dict[str, List[sqlite3.Connection]]:
+    """
+    Retorna o pool de conexões ociosas da thread atual.
+    
+    Returns:
+        Dicionário {caminho absoluto do banco: lista de conexões ociosas}
+    """
+    pool = getattr(_pool_local, 'conexoes', None)
+    if pool is None:
+        pool = _pool_local.conexoes = _PoolConexoes()
+        with _pools_threads_lock:
+            _pools_threads.add(pool)
+    return pool
+
+
+def _devolver_conexao_pool(chave: str, conn: sqlite3.Connection) -> None:
+    """
+    Devolve uma conexão ao pool, descartando transações pendentes.
+    Se a conexão estiver inutilizável ou o pool estiver cheio, ela é fechada.
+    
+    Args:
+        chave: Caminho absoluto do banco
+        conn: Conexão a devolver
+    """
+    ociosas = _pool_da_thread().setdefault(chave, [])
+    
+    try:
+        conn.rollback()
+    except sqlite3.Error:
+        # Conexão fechada ou inválida: não volta para o pool
+        manter_no_pool = False
+    else:
+        manter_no_pool = len(ociosas) < TAMANHO_MAXIMO_POOL
+    
+    if manter_no_pool:
+        ociosas.append(conn)
+        return
+    
+    try:
+        conn.close()
+    except sqlite3.Error:
+        pass
+
+
+def fechar_pool_conexoes() -> None:
+    """
+    Fecha todas as conexões mantidas pelo pool de conexao_banco.
+    Registrada com atexit para liberar os arquivos do banco ao final do processo.
+    """
+    with _pools_threads_lock:
+        pools = list(_pools_threads)
+    
+    for pool in pools:
+        conexoes = [conn for ociosas in list(pool.values()) for conn in ociosas]
+        pool.clear()
+        
+        for conn in conexoes:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                # Conexões criadas em outras threads não podem ser fechadas daqui
+                pass
+
+
+atexit.register(fechar_pool_conexoes)
+
+
 @contextmanager
-def conexao_banco(arquivo_db: str) -> Generator[Tuple[sqlite3.Connection, sqlite3.Cursor], None, None]:
+def conexao_banco(arquivo_db: str) -> Generator[sqlite3.Connection, None, None]:
     """
     Context manager para gerenciar conexões de banco de dados.
-    Garante que a conexão seja fechada corretamente após o uso.
+    
+    As conexões são reaproveitadas a partir de um pool por thread, evitando
+    reabrir o arquivo e reaplicar os PRAGMAs a cada uso. Ao final do bloco,
+    transações não confirmadas são desfeitas e a conexão volta ao pool.
     
     Args:
         arquivo_db: Caminho para o arquivo de banco de dados SQLite
     
     Yields:
-        Tupla (conexão, cursor) para uso no bloco with
+        Conexão para uso no bloco with (use conn.execute diretamente)
     
     Example:
         ```python
-        with conexao_banco('fundos_imobiliarios.db') as (conn, cursor):
-            cursor.execute("SELECT * FROM cotacoes")
-            rows = cursor.fetchall()
-        # Conexão é fechada automaticamente após o bloco with
+        with conexao_banco('fundos_imobiliarios.db') as conn:
+            rows = conn.execute("SELECT * FROM cotacoes").fetchall()
+        # Conexão é devolvida ao pool automaticamente após o bloco with
         ```
     """
-    conn, cursor = conectar_banco(arquivo_db)
+    chave = os.path.abspath(arquivo_db)
+    ociosas = _pool_da_thread().get(chave)
+    
+    if ociosas:
+        conn = ociosas.pop()
+    else:
+        conn, cursor = conectar_banco(arquivo_db)
+        cursor.close()
+    
     try:
-        yield conn, cursor
+        yield conn
     finally:
-        if conn:
-            conn.close()
+        _devolver_conexao_pool(chave, conn)
+
 
 def conectar_banco(arquivo_db: str) -> Tuple[sqlite3.Connection, sqlite3.Cursor]:
     """
@@ -98,7 +236,7 @@ def conectar_banco(arquivo_db: str) -> Tuple[sqlite3.Connection, sqlite3.Cursor]
         
         while tentativa < max_tentativas:
             try:
-                conn = sqlite3.connect(arquivo_db, timeout=120.0)  # Aumentado o timeout para 120 segundos
+                conn = sqlite3.connect(arquivo_db, timeout=120.0, cached_statements=256)  # Timeout de 120 segundos; cache maior de statements compilados
                 cursor = conn.cursor()
                 otimizar_conexao_sqlite(cursor)
                 
@@ -118,4 +256,89 @@ def conectar_banco(arquivo_db: str) -> Tuple[sqlite3.Connection, sqlite3.Cursor]
         logger.error(f"Erro ao conectar ao banco de dados: {e}")
         if 'conn' in locals() and conn:
             conn.close()
-        raise
\ No newline at end of file
+        raise
+
+
+@functools.lru_cache(maxsize=512)
+def placeholders(colunas: int, linhas: int) -> str:
+    """
+    Gera o trecho de parâmetros da cláusula VALUES, ex: "(?,?),(?,?)".
+    
+    Args:
+        colunas: Número de colunas por linha
+        linhas: Número de linhas
+        
+    Returns:
+        Trecho SQL com os marcadores de parâmetros
+    """
+    grupo = "(" + ",".join("?" * colunas) + ")"
+    return ",".join([grupo] * linhas)
+
+
+# Trechos de VALUES pré-calculados na carga do módulo para as faixas de lote
+# (potências de 2 e o máximo por comando, ver optimize_lote_size) das tabelas
+# inseridas em massa
+COLUNAS_INSERCAO_EM_MASSA = (9,)  # cotacoes
+_PLACEHOLDER_CACHE: Dict[Tuple[int, int], str] = {}
+for _colunas in COLUNAS_INSERCAO_EM_MASSA:
+    _maximo = MAX_VARIAVEIS_SQLITE // _colunas
+    for _linhas in [1 << i for i in range(_maximo.bit_length())] + [_maximo]:
+        _PLACEHOLDER_CACHE[(_colunas, _linhas)] = placeholders(_colunas, _linhas)
+del _colunas, _maximo, _linhas
+
+
+@functools.lru_cache(maxsize=16)
+def _sql_insercao_multipla(sql_prefixo: str, colunas: int, linhas: int) -> str:
+    """
+    Monta um INSERT com várias linhas na cláusula VALUES.
+    O texto é mantido em cache para que o SQLite reaproveite o statement compilado.
+    
+    Args:
+        sql_prefixo: Início do comando, ex: "INSERT OR IGNORE INTO tabela (a, b)"
+        colunas: Número de colunas por linha
+        linhas: Número de linhas na cláusula VALUES
+        
+    Returns:
+        Comando SQL completo
+    """
+    valores = _PLACEHOLDER_CACHE.get((colunas, linhas)) or placeholders(colunas, linhas)
+    return f"{sql_prefixo} VALUES {valores}"
+
+
+def inserir_multiplas_linhas(executor: Union[sqlite3.Connection, sqlite3.Cursor],
+                             sql_prefixo: str, colunas: int,
+                             registros: Sequence[Sequence[Any]]) -> int:
+    """
+    Insere registros usando INSERT com múltiplas linhas em VALUES, o que reduz
+    drasticamente o número de comandos executados em relação ao executemany.
+    Não faz commit; a transação fica a cargo do chamador.
+    
+    Args:
+        executor: Conexão ou cursor SQLite
+        sql_prefixo: Início do comando, ex: "INSERT OR IGNORE INTO tabela (a, b)"
+        colunas: Número de colunas por registro
+        registros: Registros a inserir (cada um com `colunas` valores)
+        
+    Returns:
+        Número de registros enviados ao banco
+    """
+    total = len(registros)
+    if total == 0:
+        return 0
+    
+    # Quantidade de linhas por comando respeitando o limite de parâmetros do SQLite
+    por_comando = max(1, min(total, MAX_VARIAVEIS_SQLITE // colunas))
+    completos = total - total % por_comando
+    
+    if completos:
+        sql = _sql_insercao_multipla(sql_prefixo, colunas, por_comando)
+        for i in range(0, completos, por_comando):
+            executor.execute(sql, list(itertools.chain.from_iterable(registros[i:i + por_comando])))
+    
+    # Registros restantes em um único comando menor
+    resto = registros[completos:]
+    if resto:
+        sql = _sql_insercao_multipla(sql_prefixo, colunas, len(resto))
+        executor.execute(sql, list(itertools.chain.from_iterable(resto)))
+    
+    return total
@@ -5,78 +5,158 @@ Centraliza funções relacionadas ao download de arquivos históricos.
 
 import os
 import logging
-import calendar
 import datetime
-import traceback
+from urllib.parse import urlparse
 from typing import List, Tuple, Dict, Optional, Any
 
 # Importações de outros módulos do sistema
-from fii_utils.downloader import (
-    verificar_arquivo_disponivel, baixar_com_fallback, 
-    baixar_arquivos_diarios as baixar_arquivos_diarios_original,
-    baixar_arquivos_mensais as baixar_arquivos_mensais_original,
-    baixar_arquivos_anuais as baixar_arquivos_anuais_original
-)
+from fii_utils.downloader import baixar_probe_or_fetch, verificar_arquivo_disponivel, fixar_endereco_host
+from fii_utils.async_downloader import baixar_concorrente, filtrar_disponiveis
+from fii_utils.availability_cache import get_availability_cache
+from fii_utils.calendar_manager import get_calendar_manager
 from fii_utils.zip_utils import (
     verificar_extrair_zips_pendentes,
     obter_arquivos_processados_do_banco
 )
 
+# Logger do módulo, obtido uma única vez
+_LOG = logging.getLogger('FIIDatabase')
 
-def baixar_arquivo_diario(dia: str, mes: str, ano: str, config: Dict, force: bool = False) -> Tuple[bool, Optional[str], Optional[str]]:
+
+# Separador de caminhos, resolvido uma única vez
+_SEP = os.sep
+
+
+def _paths(config: Dict, tipo: str, chave: str) -> Tuple[str, str]:
     """
-    Baixa um arquivo diário para uma data específica.
+    Monta os caminhos do ZIP e do TXT de um arquivo COTAHIST em data_dir.
+    
+    Args:
+        config: Configuração (usa "data_dir")
+        tipo: Prefixo do período ("D", "M" ou "A")
+        chave: Data no formato do nome do arquivo (ex: "01022024")
+        
+    Returns:
+        Tupla (caminho_zip, caminho_txt)
+    """
+    base = f"{config['data_dir']}{_SEP}COTAHIST_{tipo}{chave}"
+    return base + ".ZIP", base + ".TXT"
+
+
+def _snapshot_data_dir(config: Dict) -> frozenset:
+    """
+    Retorna os nomes dos arquivos do diretório de dados, lidos uma única vez.
+    
+    O snapshot fica guardado na própria configuração da execução, evitando
+    um stat() por arquivo ao verificar milhares de datas.
+    
+    Args:
+        config: Configuração (usa "data_dir")
+        
+    Returns:
+        frozenset com os nomes dos arquivos em data_dir
+    """
+    snapshot = config.get("_data_dir_snapshot")
+    if snapshot is None:
+        try:
+            with os.scandir(config["data_dir"]) as entradas:
+                snapshot = frozenset(entrada.name for entrada in entradas)
+        except FileNotFoundError:
+            snapshot = frozenset()
+        config["_data_dir_snapshot"] = snapshot
+    return snapshot
+
+
+def _registrar_no_snapshot(config: Dict, caminho: str) -> None:
+    """
+    Acrescenta ao snapshot de data_dir um arquivo baixado nesta execução.
     
     Args:
-        dia: Dia (string de 2 dígitos)
-        mes: Mês (string de 2 dígitos)
-        ano: Ano (string de 4 dígitos)
+        config: Configuração
+        caminho: Caminho do arquivo criado
+    """
+    snapshot = config.get("_data_dir_snapshot")
+    if snapshot is not None:
+        config["_data_dir_snapshot"] = snapshot | {os.path.basename(caminho)}
+
+
+# Especificação de cada período: (prefixo do arquivo, chave no nome, descrição, data para exibição)
+_SPEC = {
+    "daily": ("D", "{dia}{mes}{ano}", "diário", "{dia}/{mes}/{ano}"),
+    "monthly": ("M", "{mes}{ano}", "mensal", "{mes}/{ano}"),
+    "yearly": ("A", "{ano}", "anual", "{ano}"),
+}
+
+
+def _build_key(periodo: str, **params: str) -> Tuple[str, str]:
+    """
+    Monta o prefixo e a chave do nome do arquivo de um período.
+    
+    Args:
+        periodo: Tipo de período ("daily", "monthly" ou "yearly")
+        **params: Parâmetros do período (dia, mes, ano)
+        
+    Returns:
+        Tupla (prefixo, chave), ex: ("D", "01022024")
+    """
+    prefixo, modelo = _SPEC[periodo][:2]
+    return prefixo, modelo.format(**params)
+
+
+def _baixar_generic(periodo: str, params: Dict[str, str], config: Dict, force: bool = False) -> Tuple[bool, Optional[str], Optional[str]]:
+    """
+    Baixa o arquivo de um período qualquer, conforme _SPEC.
+    
+    Args:
+        periodo: Tipo de período ("daily", "monthly" ou "yearly")
+        params: Parâmetros específicos para o período (dia, mes, ano)
         config: Configuração
         force: Se deve forçar o download mesmo se já existir
         
     Returns:
         Tupla (sucesso, zip_path, txt_path)
     """
-    logger = logging.getLogger('FIIDatabase')
-    logger.info(f"Tentando baixar arquivo diário para {dia}/{mes}/{ano}")
+    prefixo, chave = _build_key(periodo, **params)
+    descricao = _SPEC[periodo][2]
+    data = _SPEC[periodo][3].format(**params)
+    
+    _LOG.info("Tentando baixar arquivo %s para %s", descricao, data)
     
     try:
         # Verificar se o arquivo já existe localmente
-        arquivo_zip = os.path.join(config["data_dir"], f"COTAHIST_D{dia}{mes}{ano}.ZIP")
-        arquivo_txt = os.path.join(config["data_dir"], f"COTAHIST_D{dia}{mes}{ano}.TXT")
-        
-        if os.path.exists(arquivo_txt) and not force:
-            logger.info(f"Arquivo diário para {dia}/{mes}/{ano} já existe localmente. Pulando download.")
+        if f"COTAHIST_{prefixo}{chave}.TXT" in _snapshot_data_dir(config) and not force:
+            arquivo_zip, arquivo_txt = _paths(config, prefixo, chave)
+            _LOG.info("Arquivo %s para %s já existe localmente. Pulando download.", descricao, data)
             return True, arquivo_zip, arquivo_txt
         
-        # Verificar se está disponível no servidor
-        disponivel, _ = verificar_arquivo_disponivel("daily", dia, mes, ano, config)
+        # Uma única requisição: baixa o arquivo ou detecta que não está disponível
+        _LOG.info("Baixando arquivo %s para %s...", descricao, data)
+        status, zip_path, txt_path = baixar_probe_or_fetch(
+            periodo, params.get("dia"), params.get("mes"), params["ano"], force
+        )
         
-        if disponivel:
-            logger.info(f"Baixando arquivo diário para {dia}/{mes}/{ano}...")
-            status, zip_path, txt_path = baixar_com_fallback(dia, mes, ano, config, force)
-            
-            if status == "success" and txt_path:
-                logger.info(f"Download do arquivo diário para {dia}/{mes}/{ano} concluído com sucesso.")
-                return True, zip_path, txt_path
-            else:
-                logger.error(f"Falha ao baixar arquivo diário para {dia}/{mes}/{ano}.")
-                return False, None, None
+        if status in ("success", "exists") and txt_path:
+            _registrar_no_snapshot(config, txt_path)
+            _LOG.info("Download do arquivo %s para %s concluído com sucesso.", descricao, data)
+            return True, zip_path, txt_path
+        elif status == "not_available":
+            _LOG.info("Arquivo %s para %s não disponível no servidor.", descricao, data)
+            return False, None, None
         else:
-            logger.info(f"Arquivo diário para {dia}/{mes}/{ano} não disponível no servidor.")
+            _LOG.error("Falha ao baixar arquivo %s para %s.", descricao, data)
             return False, None, None
             
-    except Exception as e:
-        logger.error(f"Erro ao baixar arquivo diário para {dia}/{mes}/{ano}: {e}")
-        logger.error(traceback.format_exc())
+    except Exception:
+        _LOG.exception("Erro ao baixar arquivo %s para %s", descricao, data)
         return False, None, None
 
 
-def baixar_arquivo_mensal(mes: str, ano: str, config: Dict, force: bool = False) -> Tuple[bool, Optional[str], Optional[str]]:
+def baixar_arquivo_diario(dia: str, mes: str, ano: str, config: Dict, force: bool = False) -> Tuple[bool, Optional[str], Optional[str]]:
     """
-    Baixa um arquivo mensal para um mês e ano específicos.
+    Baixa um arquivo diário para uma data específica.
     
     Args:
+        dia: Dia (string de 2 dígitos)
         mes: Mês (string de 2 dígitos)
         ano: Ano (string de 4 dígitos)
         config: Configuração
@@ -85,42 +165,23 @@ def baixar_arquivo_mensal(mes: str, ano: str, config: Dict, force: bool = False)
     Returns:
         Tupla (sucesso, zip_path, txt_path)
     """
-    logger = logging.getLogger('FIIDatabase')
-    logger.info(f"Tentando baixar arquivo mensal para {mes}/{ano}")
+    return _baixar_generic("daily", {"dia": dia, "mes": mes, "ano": ano}, config, force)
+
+
+def baixar_arquivo_mensal(mes: str, ano: str, config: Dict, force: bool = False) -> Tuple[bool, Optional[str], Optional[str]]:
+    """
+    Baixa um arquivo mensal para um mês e ano específicos.
     
-    try:
-        # Verificar se o arquivo já existe localmente
-        arquivo_zip = os.path.join(config["data_dir"], f"COTAHIST_M{mes}{ano}.ZIP")
-        arquivo_txt = os.path.join(config["data_dir"], f"COTAHIST_M{mes}{ano}.TXT")
-        
-        if os.path.exists(arquivo_txt) and not force:
-            logger.info(f"Arquivo mensal para {mes}/{ano} já existe localmente. Pulando download.")
-            return True, arquivo_zip, arquivo_txt
-        
-        # Verificar se está disponível no servidor
-        disponivel, _ = verificar_arquivo_disponivel("monthly", None, mes, ano, config)
+    Args:
+        mes: Mês (string de 2 dígitos)
+        ano: Ano (string de 4 dígitos)
+        config: Configuração
+        force: Se deve forçar o download mesmo se já existir
         
-        if disponivel:
-            # Determinar o último dia do mês para o download
-            ultimo_dia = str(calendar.monthrange(int(ano), int(mes))[1]).zfill(2)
-            
-            logger.info(f"Baixando arquivo mensal para {mes}/{ano}...")
-            status, zip_path, txt_path = baixar_com_fallback(ultimo_dia, mes, ano, config, force)
-            
-            if status == "success" and txt_path:
-                logger.info(f"Download do arquivo mensal para {mes}/{ano} concluído com sucesso.")
-                return True, zip_path, txt_path
-            else:
-                logger.error(f"Falha ao baixar arquivo mensal para {mes}/{ano}.")
-                return False, None, None
-        else:
-            logger.info(f"Arquivo mensal para {mes}/{ano} não disponível no servidor.")
-            return False, None, None
-            
-    except Exception as e:
-        logger.error(f"Erro ao baixar arquivo mensal para {mes}/{ano}: {e}")
-        logger.error(traceback.format_exc())
-        return False, None, None
+    Returns:
+        Tupla (sucesso, zip_path, txt_path)
+    """
+    return _baixar_generic("monthly", {"mes": mes, "ano": ano}, config, force)
 
 
 def baixar_arquivo_anual(ano: str, config: Dict, force: bool = False) -> Tuple[bool, Optional[str], Optional[str]]:
@@ -135,39 +196,7 @@ def baixar_arquivo_anual(ano: str, config: Dict, force: bool = False) -> Tuple[b
     Returns:
         Tupla (sucesso, zip_path, txt_path)
     """
-    logger = logging.getLogger('FIIDatabase')
-    logger.info(f"Tentando baixar arquivo anual para {ano}")
-    
-    try:
-        # Verificar se o arquivo já existe localmente
-        arquivo_zip = os.path.join(config["data_dir"], f"COTAHIST_A{ano}.ZIP")
-        arquivo_txt = os.path.join(config["data_dir"], f"COTAHIST_A{ano}.TXT")
-        
-        if os.path.exists(arquivo_txt) and not force:
-            logger.info(f"Arquivo anual para {ano} já existe localmente. Pulando download.")
-            return True, arquivo_zip, arquivo_txt
-        
-        # Verificar se está disponível no servidor
-        disponivel, _ = verificar_arquivo_disponivel("yearly", None, None, ano, config)
-        
-        if disponivel:
-            logger.info(f"Baixando arquivo anual para {ano}...")
-            status, zip_path, txt_path = baixar_com_fallback("31", "12", ano, config, force)
-            
-            if status == "success" and txt_path:
-                logger.info(f"Download do arquivo anual para {ano} concluído com sucesso.")
-                return True, zip_path, txt_path
-            else:
-                logger.error(f"Falha ao baixar arquivo anual para {ano}.")
-                return False, None, None
-        else:
-            logger.info(f"Arquivo anual para {ano} não disponível no servidor.")
-            return False, None, None
-            
-    except Exception as e:
-        logger.error(f"Erro ao baixar arquivo anual para {ano}: {e}")
-        logger.error(traceback.format_exc())
-        return False, None, None
+    return _baixar_generic("yearly", {"ano": ano}, config, force)
 
 
 def baixar_arquivo(periodo: str, params: Dict[str, str], config: Dict, force: bool = False) -> Tuple[bool, Optional[str], Optional[str]]:
@@ -183,19 +212,92 @@ def baixar_arquivo(periodo: str, params: Dict[str, str], config: Dict, force: bo
     Returns:
         Tupla (sucesso, zip_path, txt_path)
     """
-    if periodo == "daily":
-        return baixar_arquivo_diario(params["dia"], params["mes"], params["ano"], config, force)
-    elif periodo == "monthly":
-        return baixar_arquivo_mensal(params["mes"], params["ano"], config, force)
-    elif periodo == "yearly":
-        return baixar_arquivo_anual(params["ano"], config, force)
-    else:
+    if periodo not in _SPEC:
         raise ValueError(f"Período inválido: {periodo}")
+    
+    return _baixar_generic(periodo, params, config, force)
+
+
+def _baixar_periodos(tarefas: List[Tuple[str, Dict[str, str]]], config: Dict, force: bool) -> List[bool]:
+    """
+    Baixa concorrentemente uma lista de arquivos de qualquer período.
+    
+    Args:
+        tarefas: Lista de tuplas (periodo, params) como em baixar_arquivo
+        config: Configuração (usa "concurrent_downloads" e "wait_between_downloads")
+        force: Se deve forçar o download mesmo se já existir
+        
+    Returns:
+        Lista de indicadores de sucesso, na ordem das tarefas
+    """
+    # Ler data_dir uma vez antes de distribuir as tarefas entre as threads
+    _snapshot_data_dir(config)
+    
+    resultados = baixar_concorrente(
+        baixar_arquivo,
+        [(periodo, params, config, force) for periodo, params in tarefas],
+        limite=config.get("concurrent_downloads", 1),
+        intervalo=tuple(config.get("wait_between_downloads", (3.0, 7.0)))
+    )
+    return [sucesso for sucesso, _, _ in resultados]
+
+
+def _verificar_disponivel(periodo: str, dia: Optional[str], mes: Optional[str], ano: str, force: bool = False) -> bool:
+    """
+    Versão de verificar_arquivo_disponivel que consulta antes o cache em disco:
+    arquivos de períodos antigos já verificados como não disponíveis são
+    lembrados entre execuções. Dentro de uma execução, as respostas definitivas
+    do servidor já são lembradas pelo próprio downloader.
+    
+    Args:
+        periodo: Tipo de período ("daily", "monthly" ou "yearly")
+        dia: Dia (string de 2 dígitos, ou None)
+        mes: Mês (string de 2 dígitos, ou None)
+        ano: Ano (string de 4 dígitos)
+        force: Se deve ignorar o cache e consultar o servidor
+        
+    Returns:
+        bool: True se o arquivo está disponível no servidor
+    """
+    cache_disco = get_availability_cache()
+    
+    if force:
+        cache_disco.invalidar(periodo, dia, mes, ano)
+    elif cache_disco.nao_disponivel(periodo, dia, mes, ano):
+        return False
+    
+    disponivel, _ = verificar_arquivo_disponivel(periodo, dia, mes, ano)
+    
+    # Só respostas definitivas do servidor (existe, ou 404/410) vão para o cache em
+    # disco; falhas transitórias (rede, 429, 5xx) não podem marcar a data como ausente
+    if disponivel is not None:
+        cache_disco.registrar(periodo, dia, mes, ano, disponivel)
+    
+    return bool(disponivel)
+
+
+def _diario_disponivel(dia: str, mes: str, ano: str, config: Dict) -> bool:
+    """
+    Indica se o arquivo diário de uma data já existe localmente ou está no servidor.
+    
+    Args:
+        dia: Dia (string de 2 dígitos)
+        mes: Mês (string de 2 dígitos)
+        ano: Ano (string de 4 dígitos)
+        config: Configuração
+        
+    Returns:
+        bool: True se o arquivo pode ser usado ou baixado
+    """
+    if f"COTAHIST_D{dia}{mes}{ano}.TXT" in _snapshot_data_dir(config):
+        return True
+    
+    return _verificar_disponivel("daily", dia, mes, ano)
 
 
 def baixar_arquivos_diarios(data_inicio: datetime.datetime, data_fim: datetime.datetime, config: Dict, force: bool = False) -> List[Tuple[str, str, str]]:
     """
-    Wrapper para a função original baixar_arquivos_diarios.
+    Baixa os arquivos diários dos dias úteis de um período, com downloads concorrentes.
     
     Args:
         data_inicio: Data inicial
@@ -206,15 +308,24 @@ def baixar_arquivos_diarios(data_inicio: datetime.datetime, data_fim: datetime.d
     Returns:
         Lista de tuplas (dia, mes, ano) baixados com sucesso
     """
-    logger = logging.getLogger('FIIDatabase')
-    logger.info(f"Baixando arquivos diários de {data_inicio.strftime('%d/%m/%Y')} a {data_fim.strftime('%d/%m/%Y')}")
+    if _LOG.isEnabledFor(logging.INFO):
+        _LOG.info("Baixando arquivos diários de %s a %s", data_inicio.strftime('%d/%m/%Y'), data_fim.strftime('%d/%m/%Y'))
+    
+    # Dias de pregão do período; fins de semana e feriados não geram requisições
+    datas = [
+        (f"{d.day:02d}", f"{d.month:02d}", str(d.year))
+        for d in get_calendar_manager().get_trading_days(data_inicio, data_fim)
+    ]
+    
+    tarefas = [("daily", {"dia": dia, "mes": mes, "ano": ano}) for dia, mes, ano in datas]
+    sucessos = _baixar_periodos(tarefas, config, force)
     
-    return baixar_arquivos_diarios_original(data_inicio, data_fim, config, force)
+    return [data for data, sucesso in zip(datas, sucessos) if sucesso]
 
 
 def baixar_arquivos_mensais(mes_inicio: int, ano_inicio: int, mes_fim: int, ano_fim: int, config: Dict, force: bool = False) -> List[Tuple[str, str]]:
     """
-    Wrapper para a função original baixar_arquivos_mensais.
+    Baixa os arquivos mensais de um período, com downloads concorrentes.
     
     Args:
         mes_inicio: Mês inicial (1-12)
@@ -227,15 +338,27 @@ def baixar_arquivos_mensais(mes_inicio: int, ano_inicio: int, mes_fim: int, ano_
     Returns:
         Lista de tuplas (mes, ano) baixados com sucesso
     """
-    logger = logging.getLogger('FIIDatabase')
-    logger.info(f"Baixando arquivos mensais de {mes_inicio}/{ano_inicio} a {mes_fim}/{ano_fim}")
+    _LOG.info("Baixando arquivos mensais de %s/%s a %s/%s", mes_inicio, ano_inicio, mes_fim, ano_fim)
     
-    return baixar_arquivos_mensais_original(mes_inicio, ano_inicio, mes_fim, ano_fim, config, force)
+    # Meses do período
+    meses = []
+    ano_atual, mes_atual = ano_inicio, mes_inicio
+    while (ano_atual, mes_atual) <= (ano_fim, mes_fim):
+        meses.append((f"{mes_atual:02d}", f"{ano_atual}"))
+        mes_atual += 1
+        if mes_atual > 12:
+            mes_atual = 1
+            ano_atual += 1
+    
+    tarefas = [("monthly", {"mes": mes, "ano": ano}) for mes, ano in meses]
+    sucessos = _baixar_periodos(tarefas, config, force)
+    
+    return [mes_ano for mes_ano, sucesso in zip(meses, sucessos) if sucesso]
 
 
 def baixar_arquivos_anuais(ano_inicio: int, ano_fim: int, config: Dict, force: bool = False) -> List[str]:
     """
-    Wrapper para a função original baixar_arquivos_anuais.
+    Baixa os arquivos anuais de um período, com downloads concorrentes.
     
     Args:
         ano_inicio: Ano inicial
@@ -246,10 +369,26 @@ def baixar_arquivos_anuais(ano_inicio: int, ano_fim: int, config: Dict, force: b
     Returns:
         Lista de anos baixados com sucesso
     """
-    logger = logging.getLogger('FIIDatabase')
-    logger.info(f"Baixando arquivos anuais de {ano_inicio} a {ano_fim}")
+    _LOG.info("Baixando arquivos anuais de %s a %s", ano_inicio, ano_fim)
+    
+    anos = [str(ano) for ano in range(ano_inicio, ano_fim + 1)]
     
-    return baixar_arquivos_anuais_original(ano_inicio, ano_fim, config, force)
+    tarefas = [("yearly", {"ano": ano}) for ano in anos]
+    sucessos = _baixar_periodos(tarefas, config, force)
+    
+    return [ano for ano, sucesso in zip(anos, sucessos) if sucesso]
+
+
+def _prewarm_dns(config: Dict) -> None:
+    """
+    Resolve o host da B3 uma única vez antes de uma série de requisições.
+    
+    Args:
+        config: Configuração (usa "base_url"; o IP é guardado em "_b3_ip")
+    """
+    hostname = urlparse(config["base_url"]).hostname
+    if hostname and "_b3_ip" not in config:
+        config["_b3_ip"] = fixar_endereco_host(hostname)
 
 
 def baixar_arquivos_auto(args: Any, config: Dict, db_path: str, logger: logging.Logger) -> bool:
@@ -266,29 +405,45 @@ def baixar_arquivos_auto(args: Any, config: Dict, db_path: str, logger: logging.
         bool: True se bem-sucedido, False caso contrário
     """
     from db_managers.arquivos import ArquivosProcessadosManager
-    from fii_utils.downloader import determinar_arquivos_para_baixar, baixar_multiplos_arquivos
+    from fii_utils.downloader import determinar_arquivos_para_baixar
     
     try:
         # Instanciar gerenciador de arquivos para verificar o último processado
         arquivos_manager = ArquivosProcessadosManager(db_path)
         
         try:
-            # Determinar quais arquivos baixar
+            # Uma única conexão para toda a função, fechada apenas no finally
             arquivos_manager.conectar()
-            datas = determinar_arquivos_para_baixar(arquivos_manager)
-            arquivos_manager.fechar_conexao()
+            
+            # Determinar quais arquivos baixar
+            datas = determinar_arquivos_para_baixar(arquivos_manager, verificar_disponibilidade=False)
             
             # Se não houver datas para baixar, retorna sucesso
             if not datas:
                 logger.info("Nenhuma data para baixar automaticamente")
                 return True
             
+            # Resolver o host uma vez para todas as verificações e downloads
+            _prewarm_dns(config)
+            
+            # Verificar a disponibilidade de todas as datas em paralelo antes de baixar
+            disponiveis = filtrar_disponiveis(
+                [(dia, mes, ano, config) for dia, mes, ano in datas], _diario_disponivel,
+                limite=config.get("concurrent_downloads", 1)
+            )
+            if len(disponiveis) < len(datas):
+                logger.info("%d arquivos ainda não disponíveis no servidor", len(datas) - len(disponiveis))
+            
             # Baixar os arquivos
-            logger.info(f"Baixando automaticamente {len(datas)} arquivos")
-            sucessos, falhas, nao_disponiveis, arquivos_txt = baixar_multiplos_arquivos(datas, False)
+            logger.info("Baixando automaticamente %d arquivos", len(disponiveis))
+            tarefas = [("daily", {"dia": dia, "mes": mes, "ano": ano}) for dia, mes, ano, _ in disponiveis]
+            sucessos = sum(_baixar_periodos(tarefas, config, False))
+            
+            # Descartar o snapshot de data_dir: a extração pendente cria novos arquivos
+            config.pop("_data_dir_snapshot", None)
             
             # Verificar e extrair ZIPs pendentes após os downloads
-            arquivos_processados = obter_arquivos_processados_do_banco(db_path, logger)
+            arquivos_processados = obter_arquivos_processados_do_banco(db_path, logger, manager=arquivos_manager)
             verificar_extrair_zips_pendentes(config["data_dir"], logger, arquivos_processados, config)
             
             # Retorna sucesso se pelo menos um arquivo foi baixado
@@ -296,10 +451,8 @@ def baixar_arquivos_auto(args: Any, config: Dict, db_path: str, logger: logging.
             
         finally:
             # Garantir que a conexão é fechada
-            if hasattr(arquivos_manager, 'fechar_conexao'):
-                arquivos_manager.fechar_conexao()
+            arquivos_manager.fechar_conexao()
                 
-    except Exception as e:
-        logger.error(f"Erro ao baixar arquivos automaticamente: {e}")
-        logger.error(traceback.format_exc())
+    except Exception:
+        logger.exception("Erro ao baixar arquivos automaticamente")
         return False
\ No newline at end of file
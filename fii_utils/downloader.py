@@ -7,19 +7,25 @@ Responsável por baixar e extrair arquivos de cotações da B3 automaticamente.
 """
 
 import os
+import io
 import time
-import random
+import struct
 import logging
 import hashlib
 import ssl
 import socket
-import subprocess
 import zipfile
 import json
 import datetime
-import calendar
-from urllib.parse import urlparse
+import queue
+import threading
+import http.client
+import atexit
+import logging.handlers
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse, urljoin
 from fii_utils.zip_utils import extrair_zip
+from fii_utils.async_downloader import baixar_concorrente, filtrar_disponiveis, registrar_resposta_http, LIMITE_SONDAGENS
 
 # Importação do sistema unificado de logging
 from fii_utils.logging_manager import get_logger
@@ -35,6 +41,299 @@ PERIOD_TYPES = {
     "yearly": "A"
 }
 
+# Formatadores do nome do arquivo de cada período (ver gerar_nome_arquivo)
+_FMT = {
+    "daily": "COTAHIST_D{dia}{mes}{ano}.ZIP".format,
+    "monthly": "COTAHIST_M{mes}{ano}.ZIP".format,
+    "yearly": "COTAHIST_A{ano}.ZIP".format
+}
+
+# Campos exigidos por período e a mensagem de erro quando faltam
+_CAMPOS_OBRIGATORIOS = {
+    "daily": (("dia", "mes", "ano"), "Dia, mês e ano são obrigatórios para arquivos diários"),
+    "monthly": (("mes", "ano"), "Mês e ano são obrigatórios para arquivos mensais"),
+    "yearly": (("ano",), "Ano é obrigatório para arquivos anuais")
+}
+
+# Nome de cada período nas mensagens de log
+_ROTULOS_PERIODO = {
+    "daily": "diário",
+    "monthly": "mensal",
+    "yearly": "anual"
+}
+
+# Gerenciadores de configuração e de calendário, obtidos uma única vez
+_CFG = get_config_manager()
+_CAL = get_calendar_manager()
+
+# Tamanho dos blocos lidos da rede e quantos podem aguardar gravação em disco
+TAMANHO_BLOCO_DOWNLOAD = 1 << 20
+BLOCOS_PENDENTES_GRAVACAO = 8
+
+# ZIPs de até este tamanho são extraídos de uma cópia em memória feita durante
+# o download, sem reler o arquivo do disco; os maiores (ex: anuais) são lidos do disco
+LIMITE_EXTRACAO_MEMORIA = 64 * 1024 * 1024
+
+# Endereços IP resolvidos antecipadamente por host (ver fixar_endereco_host)
+_ENDERECOS_FIXOS = {}
+
+def fixar_endereco_host(hostname):
+    """
+    Resolve o host uma única vez e passa a usar o IP obtido nas novas conexões,
+    evitando uma consulta DNS a cada conexão. O TLS continua usando o nome do
+    host (SNI e validação do certificado). Se uma conexão ao IP fixado falhar,
+    o host é resolvido novamente (ver _ConexaoHTTPSFixada).
+    
+    Args:
+        hostname: Nome do host
+        
+    Returns:
+        str: Endereço IP resolvido, ou None se a resolução falhar
+    """
+    try:
+        endereco = socket.getaddrinfo(hostname, None, type=socket.SOCK_STREAM)[0][4][0]
+    except (socket.gaierror, IndexError) as e:
+        _LOG.warning(f"Não foi possível resolver {hostname} antecipadamente: {e}")
+        return None
+    
+    _ENDERECOS_FIXOS[hostname] = endereco
+    _LOG.debug(f"Host {hostname} fixado em {endereco}")
+    return endereco
+
+class _ConexaoHTTPSFixada(http.client.HTTPSConnection):
+    """
+    Conexão HTTPS que se conecta ao IP fixado por fixar_endereco_host, quando
+    houver, mantendo o nome do host no SNI e na validação do certificado.
+    """
+    
+    def __init__(self, host, timeout=10, context=None):
+        super().__init__(host, timeout=timeout, context=context)
+        self._contexto_ssl = context or ssl.create_default_context()
+    
+    def connect(self):
+        endereco = _ENDERECOS_FIXOS.get(self.host)
+        if endereco is None:
+            return super().connect()
+        
+        try:
+            sock = socket.create_connection((endereco, self.port), self.timeout, self.source_address)
+        except OSError as e:
+            # O IP fixado pode ter deixado de atender: resolve o host novamente
+            _LOG.warning(f"Falha ao conectar a {self.host} em {endereco} ({e}). Resolvendo o host novamente")
+            _ENDERECOS_FIXOS.pop(self.host, None)
+            endereco = fixar_endereco_host(self.host) or self.host
+            sock = socket.create_connection((endereco, self.port), self.timeout, self.source_address)
+        
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.sock = self._contexto_ssl.wrap_socket(sock, server_hostname=self.host)
+
+class SessaoHTTP:
+    """
+    Sessão HTTP com conexões persistentes (keep-alive) reaproveitadas entre
+    requisições ao mesmo host, evitando um novo handshake TCP+TLS por arquivo.
+    
+    Cada thread mantém suas próprias conexões, pois http.client não é thread-safe.
+    """
+    
+    MAX_REDIRECIONAMENTOS = 5
+    
+    def __init__(self, contexto_ssl=None, timeout=10):
+        self._local = threading.local()
+        self._contexto_ssl = contexto_ssl
+        self.timeout = timeout
+    
+    def _conexoes(self):
+        """
+        Retorna o dicionário {(esquema, host): conexão} da thread atual.
+        """
+        conexoes = getattr(self._local, 'conexoes', None)
+        if conexoes is None:
+            conexoes = self._local.conexoes = {}
+        return conexoes
+    
+    def _conexao(self, esquema, host):
+        """
+        Retorna a conexão persistente para o host, abrindo-a se necessário.
+        """
+        conexoes = self._conexoes()
+        conn = conexoes.get((esquema, host))
+        if conn is None:
+            if esquema == 'https':
+                # Conecta direto ao IP já resolvido; o nome do host segue no Host e no SNI
+                conn = _ConexaoHTTPSFixada(host, timeout=self.timeout, context=self._contexto_ssl)
+            else:
+                conn = http.client.HTTPConnection(host, timeout=self.timeout)
+            conexoes[(esquema, host)] = conn
+        return conn
+    
+    def _descartar(self, esquema, host):
+        """
+        Fecha e remove a conexão do host na thread atual.
+        """
+        conn = self._conexoes().pop((esquema, host), None)
+        if conn is not None:
+            conn.close()
+    
+    def requisitar(self, metodo, url, headers=None):
+        """
+        Executa uma requisição seguindo redirecionamentos.
+        O corpo da resposta deve ser lido por completo (ou a resposta fechada)
+        antes da próxima requisição na mesma thread.
+        
+        Args:
+            metodo: Método HTTP ('GET', 'HEAD', ...)
+            url: URL completa
+            headers: Cabeçalhos adicionais (opcional)
+            
+        Returns:
+            http.client.HTTPResponse: Resposta final, com o atributo
+            certificado_servidor (certificado DER do servidor em HTTPS, ou None)
+        """
+        headers = headers or {}
+        
+        for _ in range(self.MAX_REDIRECIONAMENTOS + 1):
+            partes = urlparse(url)
+            caminho = partes.path or '/'
+            if partes.query:
+                caminho += '?' + partes.query
+            
+            try:
+                conn = self._conexao(partes.scheme, partes.netloc)
+                conn.request(metodo, caminho, headers=headers)
+                sock = conn.sock
+                resp = conn.getresponse()
+            except ssl.SSLCertVerificationError:
+                self._descartar(partes.scheme, partes.netloc)
+                raise
+            except (http.client.HTTPException, OSError):
+                # O servidor pode ter encerrado a conexão ociosa; tenta uma vez com uma nova
+                self._descartar(partes.scheme, partes.netloc)
+                conn = self._conexao(partes.scheme, partes.netloc)
+                conn.request(metodo, caminho, headers=headers)
+                sock = conn.sock
+                resp = conn.getresponse()
+            
+            location = resp.getheader('Location')
+            if resp.status in (301, 302, 303, 307, 308) and location:
+                resp.read()
+                url = urljoin(url, location)
+                if resp.status == 303:
+                    metodo = 'GET'
+                continue
+            
+            if resp.will_close:
+                # A conexão será encerrada pelo servidor após esta resposta
+                self._conexoes().pop((partes.scheme, partes.netloc), None)
+            
+            # Certificado apresentado na própria conexão, para conferir a impressão digital
+            resp.certificado_servidor = sock.getpeercert(binary_form=True) if isinstance(sock, ssl.SSLSocket) else None
+            
+            # Respostas 429 reduzem o ritmo dos downloads em andamento
+            registrar_resposta_http(resp.status, resp.getheader('Retry-After'))
+            
+            return resp
+        
+        raise http.client.HTTPException(f"Excesso de redirecionamentos para {url}")
+    
+    def descartar(self, url):
+        """
+        Fecha a conexão da thread atual com o host da URL, por exemplo quando
+        uma resposta foi abandonada sem ler o corpo.
+        
+        Args:
+            url: URL cujo host terá a conexão descartada
+        """
+        partes = urlparse(url)
+        self._descartar(partes.scheme, partes.netloc)
+    
+    def fechar(self):
+        """
+        Fecha as conexões mantidas pela thread atual.
+        """
+        conexoes = self._conexoes()
+        for conn in conexoes.values():
+            conn.close()
+        conexoes.clear()
+
+_SESSOES = {}
+_SESSOES_LOCK = threading.Lock()
+
+def obter_sessao_http(verificar_certificado=False, cafile=None):
+    """
+    Retorna uma sessão HTTP compartilhada pelo módulo, criando-a na primeira chamada.
+    
+    As verificações de disponibilidade não validam o certificado, como o
+    'curl -k' usado anteriormente; os downloads usam a sessão com validação.
+    
+    Args:
+        verificar_certificado: Se a sessão deve validar o certificado do servidor
+        cafile: Certificado confiável em PEM (opcional); como o '--cacert' do curl,
+                aceita o próprio certificado do servidor como âncora de confiança
+        
+    Returns:
+        SessaoHTTP: Sessão compartilhada
+    """
+    chave = (verificar_certificado, cafile)
+    sessao = _SESSOES.get(chave)
+    if sessao is None:
+        with _SESSOES_LOCK:
+            sessao = _SESSOES.get(chave)
+            if sessao is None:
+                contexto = ssl.create_default_context(cafile=cafile)
+                if cafile:
+                    contexto.verify_flags |= ssl.VERIFY_X509_PARTIAL_CHAIN
+                if not verificar_certificado:
+                    contexto.check_hostname = False
+                    contexto.verify_mode = ssl.CERT_NONE
+                sessao = _SESSOES[chave] = SessaoHTTP(contexto_ssl=contexto, timeout=60)
+    return sessao
+
+# Fila única por onde os loggers de download entregam registros aos handlers
+# de arquivo, drenada por uma thread de fundo (ver setup_logging)
+_FILA_LOG = queue.Queue(-1)
+_OUVINTE_LOG = None
+
+def _enfileirar_handlers_arquivo(*loggers):
+    """
+    Substitui os handlers de arquivo dos loggers por um QueueHandler, de modo
+    que a gravação em disco ocorra em uma thread de fundo e não bloqueie os
+    downloads. Os handlers de console continuam síncronos.
+    
+    Args:
+        *loggers: Loggers cujos handlers de arquivo serão enfileirados
+    """
+    global _OUVINTE_LOG
+    
+    handlers_arquivo = []
+    for logger in loggers:
+        arquivos = [h for h in logger.handlers if isinstance(h, logging.FileHandler)]
+        if not arquivos:
+            continue
+        
+        for handler in arquivos:
+            logger.removeHandler(handler)
+        handlers_arquivo.extend(arquivos)
+        logger.addHandler(logging.handlers.QueueHandler(_FILA_LOG))
+    
+    if not handlers_arquivo:
+        return
+    
+    if _OUVINTE_LOG is not None:
+        _OUVINTE_LOG.stop()
+        handlers_arquivo = list(_OUVINTE_LOG.handlers) + handlers_arquivo
+    
+    _OUVINTE_LOG = logging.handlers.QueueListener(_FILA_LOG, *handlers_arquivo, respect_handler_level=True)
+    _OUVINTE_LOG.start()
+
+def _parar_ouvinte_log():
+    """
+    Drena a fila de logging e encerra a thread de gravação ao final do processo.
+    """
+    if _OUVINTE_LOG is not None:
+        _OUVINTE_LOG.stop()
+
+atexit.register(_parar_ouvinte_log)
+
 def setup_logging():
     """
     Configura o sistema de logging para o módulo de download.
@@ -44,9 +343,8 @@ def setup_logging():
         Tuple de loggers (logger, security_logger)
     """
     # Obter configuração do gerenciador centralizado
-    config_manager = get_config_manager()
-    log_level_str = config_manager.get("log_level", "INFO")
-    log_dir = config_manager.get("log_dir")
+    log_level_str = _CFG.get("log_level", "INFO")
+    log_dir = _CFG.get("log_dir")
     
     # Determinar o nível de logging
     log_level = getattr(logging, log_level_str)
@@ -68,8 +366,39 @@ def setup_logging():
         level=logging.INFO
     )
     
+    _enfileirar_handlers_arquivo(logger, security_logger)
+    
     return logger, security_logger
 
+# Loggers do módulo, configurados na importação
+_LOG, _SEC = setup_logging()
+
+# Valores de configuração usados a cada download (ver reload_config)
+_BASE_URL = None
+_UA = None
+_CERT_DIR = None
+_DATA_DIR = None
+_LOG_DIR = None
+_MAX_RETRIES = None
+_BACKOFF_FACTOR = None
+
+def reload_config():
+    """
+    Atualiza os valores de configuração guardados pelo módulo. Deve ser chamada
+    após alterar a configuração em tempo de execução (ex: em testes).
+    """
+    global _BASE_URL, _UA, _CERT_DIR, _DATA_DIR, _LOG_DIR, _MAX_RETRIES, _BACKOFF_FACTOR
+    
+    _BASE_URL = _CFG.get("base_url")
+    _UA = _CFG.get("user_agent")
+    _CERT_DIR = _CFG.get("cert_dir")
+    _DATA_DIR = _CFG.get("data_dir")
+    _LOG_DIR = _CFG.get("log_dir")
+    _MAX_RETRIES = _CFG.get("max_retries")
+    _BACKOFF_FACTOR = _CFG.get("backoff_factor")
+
+reload_config()
+
 def corrigir_permissoes_diretorio(diretorio, permissoes):
     """
     Corrige as permissões de um diretório para um valor mais seguro.
@@ -81,25 +410,36 @@ def corrigir_permissoes_diretorio(diretorio, permissoes):
     Returns:
         bool: True se as permissões foram corrigidas, False caso contrário
     """
-    logger = get_logger('b3_security')
-    
     if not os.path.exists(diretorio):
         return False
     
     if os.name != 'posix':
-        logger.warning(f"Correção de permissões não suportada em sistemas não-POSIX")
+        _SEC.warning(f"Correção de permissões não suportada em sistemas não-POSIX")
         return False
     
     try:
         # Converter string de permissões (como "750") para octal
         perm_octal = int(permissoes, 8)
         os.chmod(diretorio, perm_octal)
-        logger.info(f"Permissões do diretório {diretorio} corrigidas para {permissoes}")
+        _SEC.info(f"Permissões do diretório {diretorio} corrigidas para {permissoes}")
         return True
     except Exception as e:
-        logger.error(f"Erro ao corrigir permissões do diretório {diretorio}: {e}")
+        _SEC.error(f"Erro ao corrigir permissões do diretório {diretorio}: {e}")
         return False
 
+# Contexto TLS das consultas de impressão digital, mantido entre chamadas para
+# preservar o cache de sessões do OpenSSL (sem validação, como antes)
+_SSL_CTX = ssl.create_default_context()
+_SSL_CTX.check_hostname = False
+_SSL_CTX.verify_mode = ssl.CERT_NONE
+
+# Última sessão TLS por (host, porta), reapresentada na conexão seguinte
+_SESSOES_TLS = {}
+
+# Certificados já vistos: impressão digital -> DER, e impressão digital -> PEM salvo
+_CERTIFICADOS_DER = {}
+_CERT_CACHE = {}
+
 def obter_impressao_digital_certificado(hostname, port=443):
     """
     Obtém a impressão digital SHA-256 do certificado do servidor.
@@ -111,20 +451,65 @@ def obter_impressao_digital_certificado(hostname, port=443):
     Returns:
         str: Impressão digital do certificado
     """
-    context = ssl.create_default_context()
-    context.check_hostname = False
-    context.verify_mode = ssl.CERT_NONE
-    
     try:
         with socket.create_connection((hostname, port), timeout=10) as sock:
-            with context.wrap_socket(sock, server_hostname=hostname) as ssock:
+            # Reapresentar a sessão TLS anterior permite ao servidor retomar o handshake
+            sessao_tls = _SESSOES_TLS.get((hostname, port))
+            with _SSL_CTX.wrap_socket(sock, server_hostname=hostname, session=sessao_tls) as ssock:
                 cert = ssock.getpeercert(binary_form=True)
-                return hashlib.sha256(cert).hexdigest()
+                if ssock.session is not None:
+                    _SESSOES_TLS[(hostname, port)] = ssock.session
+                impressao_digital = hashlib.sha256(cert).hexdigest()
+                _CERTIFICADOS_DER[impressao_digital] = cert
+                return impressao_digital
     except Exception as e:
-        logger = get_logger('b3_downloader')
-        logger.error(f"Erro ao obter impressão digital: {e}")
+        _LOG.error(f"Erro ao obter impressão digital: {e}")
         raise
 
+# Arquivo fingerprint_history.csv, mantido aberto para acréscimos durante todo
+# o processo, e a última impressão digital registrada (ver _abrir_historico_fp)
+_FP_FH = None
+_LAST_FP = None
+_FP_LOCK = threading.Lock()
+
+def _abrir_historico_fp():
+    """
+    Abre o arquivo de histórico de impressões digitais para acréscimos e lê a
+    última impressão digital já registrada. Deve ser chamada com _FP_LOCK adquirido.
+    
+    Returns:
+        Arquivo aberto, ou None se não puder ser aberto
+    """
+    global _FP_FH, _LAST_FP
+    
+    if _FP_FH is not None:
+        return _FP_FH
+    
+    history_file = os.path.join(_LOG_DIR, "fingerprint_history.csv")
+    
+    try:
+        novo = not os.path.exists(history_file)
+        if not novo:
+            # Apenas o final do arquivo é necessário para obter a última entrada
+            with open(history_file, 'rb') as f:
+                f.seek(max(0, os.path.getsize(history_file) - 4096))
+                linhas = f.read().decode('utf-8', 'replace').splitlines()
+            for line in reversed(linhas):
+                parts = line.strip().split(',')
+                if len(parts) >= 2 and parts[1] != "fingerprint":
+                    _LAST_FP = parts[1]
+                    break
+        
+        _FP_FH = open(history_file, 'a', buffering=1 << 16)
+        if novo:
+            _FP_FH.write("timestamp,fingerprint\n")
+    except Exception as e:
+        _SEC.error(f"Erro ao abrir histórico de fingerprints: {e}")
+        return None
+    
+    atexit.register(_FP_FH.close)
+    return _FP_FH
+
 def registrar_impressao_digital(impressao_digital):
     """
     Registra a impressão digital do certificado para monitoramento.
@@ -135,94 +520,73 @@ def registrar_impressao_digital(impressao_digital):
     Returns:
         bool: True se o registro foi bem-sucedido
     """
-    # Obter loggers
-    security_logger = get_logger('b3_security')
+    global _LAST_FP
     
-    # Obter configuração
-    config_manager = get_config_manager()
-    log_dir = config_manager.get("log_dir")
-    
-    history_file = os.path.join(log_dir, "fingerprint_history.csv")
     now = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     
-    if not os.path.exists(history_file):
-        with open(history_file, 'w') as f:
-            f.write("timestamp,fingerprint\n")
-    
-    with open(history_file, 'a') as f:
-        f.write(f"{now},{impressao_digital}\n")
-    
-    fingerprints = []
-    try:
-        with open(history_file, 'r') as f:
-            next(f)
-            for line in f:
-                if line.strip():
-                    parts = line.strip().split(',')
-                    if len(parts) >= 2:
-                        fingerprints.append(parts[1])
-    except Exception as e:
-        security_logger.error(f"Erro ao ler histórico de fingerprints: {e}")
-    
-    if len(fingerprints) > 1 and fingerprints[-1] != fingerprints[-2]:
-        security_logger.warning("ALERTA: Mudança na impressão digital do certificado detectada!")
-        security_logger.warning(f"Anterior: {fingerprints[-2]}")
-        security_logger.warning(f"Atual: {fingerprints[-1]}")
+    with _FP_LOCK:
+        fh = _abrir_historico_fp()
+        if fh is not None:
+            fh.write(f"{now},{impressao_digital}\n")
+        anterior = _LAST_FP
+        _LAST_FP = impressao_digital
+    
+    if anterior is not None and impressao_digital != anterior:
+        _SEC.warning("ALERTA: Mudança na impressão digital do certificado detectada!")
+        _SEC.warning(f"Anterior: {anterior}")
+        _SEC.warning(f"Atual: {impressao_digital}")
         
         # Verificar se é uma mudança conhecida (por exemplo, renovação planejada)
-        known_transitions_file = os.path.join(log_dir, "known_fingerprint_changes.json")
+        known_transitions_file = os.path.join(_LOG_DIR, "known_fingerprint_changes.json")
         if os.path.exists(known_transitions_file):
             try:
                 with open(known_transitions_file, 'r') as f:
                     known_transitions = json.load(f)
                 
-                transition = f"{fingerprints[-2]}:{fingerprints[-1]}"
+                transition = f"{anterior}:{impressao_digital}"
                 if transition in known_transitions:
-                    security_logger.info(f"Esta é uma mudança de certificado conhecida: {known_transitions[transition]}")
+                    _SEC.info(f"Esta é uma mudança de certificado conhecida: {known_transitions[transition]}")
                     return True
             except Exception as e:
-                security_logger.error(f"Erro ao verificar transições conhecidas: {e}")
+                _SEC.error(f"Erro ao verificar transições conhecidas: {e}")
         
-        security_logger.warning("Continuando com alerta de segurança. Verifique manualmente o certificado.")
+        _SEC.warning("Continuando com alerta de segurança. Verifique manualmente o certificado.")
     
     return True
 
-def verificar_seguranca_ambiente():
+# Resultado da verificação do ambiente, guardado após a primeira execução
+_ENV_OK = None
+
+def verificar_seguranca_ambiente(force=False):
     """
     Verifica se o ambiente atende aos requisitos mínimos de segurança.
+    O resultado é guardado e reaproveitado nas chamadas seguintes do processo.
+    
+    Args:
+        force: Se deve refazer a verificação mesmo com um resultado guardado
     
     Returns:
         bool: True se o ambiente atende aos requisitos, False caso contrário
     """
-    # Obter loggers
-    security_logger = get_logger('b3_security')
+    global _ENV_OK
+    
+    if _ENV_OK is not None and not force:
+        return _ENV_OK
     
     # Obter configuração
-    config_manager = get_config_manager()
-    config = config_manager.get_config()
+    config = _CFG.get_config()
     
-    security_logger.info("=== Verificação de Segurança do Ambiente ===")
+    _SEC.info("=== Verificação de Segurança do Ambiente ===")
     
     verificacoes = []
     problemas_corrigiveis = []
     
-    # Verificar se o curl está atualizado
-    try:
-        result = subprocess.run(['curl', '--version'], capture_output=True, text=True)
-        versao = result.stdout.split()[1] if result.stdout else "desconhecida"
-        verificacoes.append(("Versão do curl", versao, True))
-    except:
-        verificacoes.append(("curl instalado", "Não", False))
-    
-    # Verificar OpenSSL
-    try:
-        result = subprocess.run(['openssl', 'version'], capture_output=True, text=True)
-        versao = result.stdout.split()[1] if result.stdout else "desconhecida"
-        verificacoes.append(("Versão do OpenSSL", versao, True))
-    except:
-        verificacoes.append(("OpenSSL instalado", "Não", False))
+    # Verificar a biblioteca OpenSSL usada pelo módulo ssl (a mesma dos downloads)
+    partes = ssl.OPENSSL_VERSION.split()
+    versao = partes[1] if len(partes) > 1 else "desconhecida"
+    verificacoes.append(("Versão do OpenSSL", versao, True))
     
-    # Verificar permissões dos diretórios
+    # Verificar permissões e capacidade de escrita dos diretórios
     for dir_name, dir_path in [
         ("Certificados", config["cert_dir"]),
         ("Logs", config["log_dir"]),
@@ -232,144 +596,159 @@ def verificar_seguranca_ambiente():
         if os.path.exists(dir_path):
             try:
                 if os.name == 'posix':
-                    mode = oct(os.stat(dir_path).st_mode)[-3:]
-                    seguro = int(mode[1]) < 6 and int(mode[2]) < 6
+                    # Inseguro se o grupo ou os demais usuários podem ler e gravar (rw)
+                    bits = os.stat(dir_path).st_mode & 0o777
+                    seguro = (bits & 0o060) != 0o060 and (bits & 0o006) != 0o006
+                    mode = f"{bits:03o}"
                     verificacoes.append((f"Permissões do diretório {dir_name}", mode, seguro))
                     
                     if not seguro:
                         problemas_corrigiveis.append((dir_path, f"{dir_name} tem permissões inseguras {mode}", 
                                                     f"Ajuste para {config['secure_permissions']} (chmod {config['secure_permissions']} {dir_path})"))
             except Exception as e:
-                security_logger.error(f"Erro ao verificar permissões de {dir_path}: {e}")
-    
-    # Verificar capacidade de criar arquivos nos diretórios
-    for dir_name, dir_path in [
-        ("Certificados", config["cert_dir"]),
-        ("Logs", config["log_dir"]),
-        ("Dados", config["data_dir"])
-    ]:
-        test_file = os.path.join(dir_path, f"test_{int(time.time())}.tmp")
-        try:
-            with open(test_file, 'w') as f:
-                f.write("test")
-            os.remove(test_file)
-            verificacoes.append((f"Permissão de escrita em {dir_name}", "Sim", True))
-        except:
-            verificacoes.append((f"Permissão de escrita em {dir_name}", "Não", False))
+                _SEC.error(f"Erro ao verificar permissões de {dir_path}: {e}")
+        
+        # Consulta a permissão de escrita sem criar arquivos de teste
+        gravavel = os.access(dir_path, os.W_OK | os.X_OK)
+        verificacoes.append((f"Permissão de escrita em {dir_name}", "Sim" if gravavel else "Não", gravavel))
     
     # Exibir resultados
     for desc, valor, ok in verificacoes:
         status = "✓" if ok else "✗"
-        security_logger.info(f"{status} {desc}: {valor}")
+        _SEC.info(f"{status} {desc}: {valor}")
     
     # Tentar corrigir problemas se configurado
     if problemas_corrigiveis and config["fix_permissions"]:
-        security_logger.info("Tentando corrigir problemas de permissões...")
+        _SEC.info("Tentando corrigir problemas de permissões...")
         for dir_path, problema, solucao in problemas_corrigiveis:
             corrigir_permissoes_diretorio(dir_path, config["secure_permissions"])
     
     # Registrar problemas e sugestões
     problemas_criticos = [desc for desc, _, ok in verificacoes if not ok]
     if problemas_criticos:
-        security_logger.error(f"Problemas críticos encontrados: {', '.join(problemas_criticos)}")
+        _SEC.error(f"Problemas críticos encontrados: {', '.join(problemas_criticos)}")
     
     if problemas_corrigiveis and not config["fix_permissions"]:
-        security_logger.warning("Problemas corrigíveis encontrados:")
+        _SEC.warning("Problemas corrigíveis encontrados:")
         for _, problema, solucao in problemas_corrigiveis:
-            security_logger.warning(f"  - {problema}")
-            security_logger.warning(f"    Solução: {solucao}")
-        security_logger.warning("Para corrigir automaticamente, execute com o parâmetro --fix-permissions ou")
-        security_logger.warning("defina 'fix_permissions': true no arquivo config.json")
+            _SEC.warning(f"  - {problema}")
+            _SEC.warning(f"    Solução: {solucao}")
+        _SEC.warning("Para corrigir automaticamente, execute com o parâmetro --fix-permissions ou")
+        _SEC.warning("defina 'fix_permissions': true no arquivo config.json")
     
-    return all(ok for _, _, ok in verificacoes)
+    _ENV_OK = all(ok for _, _, ok in verificacoes)
+    return _ENV_OK
 
 def limpar_certificados_antigos():
     """
     Remove certificados mais antigos que X dias.
     """
-    # Obter loggers
-    security_logger = get_logger('b3_security')
-    
-    # Obter configuração
-    config_manager = get_config_manager()
-    cert_dir = config_manager.get("cert_dir")
-    dias = config_manager.get("cert_rotation_days", 7)
+    dias = _CFG.get("cert_rotation_days", 7)
     
-    if not os.path.exists(cert_dir):
+    if not os.path.exists(_CERT_DIR):
         return
     
-    now = time.time()
+    limite = time.time() - dias * 86400
     count = 0
     
-    security_logger.info(f"Iniciando limpeza de certificados com mais de {dias} dias...")
+    _SEC.info(f"Iniciando limpeza de certificados com mais de {dias} dias...")
     
-    for arquivo in os.listdir(cert_dir):
-        if arquivo.startswith("b3_cert_") and arquivo.endswith(".pem"):
-            caminho = os.path.join(cert_dir, arquivo)
-            if os.path.isfile(caminho):
-                if os.stat(caminho).st_mtime < now - dias * 86400:
-                    try:
-                        os.remove(caminho)
-                        count += 1
-                    except Exception as e:
-                        logger = get_logger('b3_downloader')
-                        logger.error(f"Erro ao remover certificado antigo {arquivo}: {e}")
+    # scandir já traz o tipo de cada entrada, evitando um stat extra por arquivo
+    with os.scandir(_CERT_DIR) as entradas:
+        for entrada in entradas:
+            arquivo = entrada.name
+            if not (arquivo.startswith("b3_cert_") and arquivo.endswith(".pem")):
+                continue
+            try:
+                if entrada.is_file() and entrada.stat().st_mtime < limite:
+                    os.remove(entrada.path)
+                    count += 1
+            except Exception as e:
+                _LOG.error(f"Erro ao remover certificado antigo {arquivo}: {e}")
     
-    security_logger.info(f"Limpeza concluída. {count} certificados antigos removidos.")
+    _SEC.info(f"Limpeza concluída. {count} certificados antigos removidos.")
+
+# Respostas definitivas (200/404/410) das verificações HEAD: url -> (instante, existe)
+_CACHE_VERIFICACOES = {}
+_CACHE_VERIFICACOES_LOCK = threading.Lock()
+_CACHE_VERIFICACOES_TTL = 300  # segundos
+_CACHE_VERIFICACOES_MAX = 4096
+
+def _lembrar_verificacao(url, existe):
+    """
+    Guarda o resultado de uma verificação HEAD definitiva.
+    
+    Args:
+        url: URL verificada
+        existe: Se o servidor informou que o arquivo existe
+    """
+    agora = time.monotonic()
+    with _CACHE_VERIFICACOES_LOCK:
+        if len(_CACHE_VERIFICACOES) >= _CACHE_VERIFICACOES_MAX:
+            # Descarta as entradas expiradas; se ainda estiver cheio, recomeça
+            for chave in [c for c, (t, _) in _CACHE_VERIFICACOES.items() if agora - t >= _CACHE_VERIFICACOES_TTL]:
+                del _CACHE_VERIFICACOES[chave]
+            if len(_CACHE_VERIFICACOES) >= _CACHE_VERIFICACOES_MAX:
+                _CACHE_VERIFICACOES.clear()
+        _CACHE_VERIFICACOES[url] = (agora, existe)
 
-def verificar_arquivo_existe(url):
+def verificar_arquivo_existe(url, sessao=None):
     """
-    Verifica se um arquivo existe no servidor.
+    Verifica se um arquivo existe no servidor. Respostas 200/404/410 são lembradas
+    por alguns minutos, evitando repetir a mesma verificação (ex: o arquivo
+    mensal sondado para cada dia do mês).
     
     Args:
         url: URL do arquivo
+        sessao: SessaoHTTP a reutilizar (padrão: sessão compartilhada sem validação de certificado)
         
     Returns:
-        bool: True se o arquivo existe, False caso contrário
+        True se o arquivo existe, False se o servidor informou que não existe
+        (404/410) e None se não foi possível determinar (erro de rede, 429,
+        5xx etc.); None é falso em testes booleanos
     """
-    # Obter logger
-    logger = get_logger('b3_downloader')
-    
-    # Obter configuração
-    config_manager = get_config_manager()
-    user_agent = config_manager.get("user_agent")
+    with _CACHE_VERIFICACOES_LOCK:
+        item = _CACHE_VERIFICACOES.get(url)
+    if item is not None and time.monotonic() - item[0] < _CACHE_VERIFICACOES_TTL:
+        _LOG.debug(f"Verificação de {url} obtida do cache")
+        return item[1]
     
     try:
-        # Comando curl para verificar se o arquivo existe
-        curl_command = [
-            'curl',
-            '--head',  # Apenas cabeçalhos HTTP
-            '-L',      # Seguir redirecionamentos
-            '-k',      # Ignorar verificação SSL
-            '-A', user_agent,
-            url
-        ]
-        
-        logger.debug(f"Verificando existência de {url}")
-        process = subprocess.run(curl_command, timeout=10, capture_output=True, text=True)
-        
-        # Procurar por código de status HTTP
-        if "HTTP/" in process.stdout:
-            status_line = [line for line in process.stdout.split('\n') if line.startswith("HTTP/")][-1]
-            status_code = int(status_line.split()[1]) if status_line else 0
-            logger.debug(f"Código de status HTTP: {status_code}")
-            
-            # 200 OK = arquivo existe, 404 Not Found = arquivo não existe
+        # Requisição HEAD em conexão persistente compartilhada entre verificações
+        _LOG.debug(f"Verificando existência de {url}")
+        sessao = sessao or obter_sessao_http()
+        resp = sessao.requisitar('HEAD', url, headers={'User-Agent': _UA})
+        resp.read()
+        status_code = resp.status
+        
+        if status_code in (405, 501):
+            # Servidor não aceita HEAD: pedir apenas o primeiro byte do arquivo
+            resp = sessao.requisitar('GET', url, headers={'User-Agent': _UA, 'Range': 'bytes=0-0'})
+            status_code = resp.status
             if status_code == 200:
-                logger.info(f"Arquivo encontrado: {url}")
-                return True
-            elif status_code == 404:
-                logger.info(f"Arquivo não encontrado: {url}")
-                return False
+                # O Range foi ignorado; descartar a conexão em vez de ler o arquivo inteiro
+                resp.close()
+                sessao.descartar(url)
             else:
-                logger.warning(f"Código de status HTTP inesperado: {status_code}")
-                return False
-        else:
-            logger.warning("Não foi possível determinar o status HTTP")
+                resp.read()
+        
+        _LOG.debug(f"Código de status HTTP: {status_code}")
+        
+        # 200 OK / 206 Partial Content = arquivo existe, 404 Not Found = arquivo não existe
+        if status_code in (200, 206):
+            _LOG.info(f"Arquivo encontrado: {url}")
+            _lembrar_verificacao(url, True)
+            return True
+        elif status_code in (404, 410):
+            _LOG.info(f"Arquivo não encontrado: {url}")
+            _lembrar_verificacao(url, False)
             return False
+        else:
+            _LOG.warning(f"Código de status HTTP inesperado: {status_code}")
+            return None
     except Exception as e:
-        logger.error(f"Erro ao verificar existência do arquivo: {e}")
-        return False
+        _LOG.error(f"Erro ao verificar existência do arquivo: {e}")
+        return None
 
 def gerar_nome_arquivo(periodo, dia=None, mes=None, ano=None):
     """
@@ -384,28 +763,19 @@ def gerar_nome_arquivo(periodo, dia=None, mes=None, ano=None):
     Returns:
         string: Nome do arquivo no formato esperado pela B3
     """
-    periodo_codigo = PERIOD_TYPES.get(periodo)
-    
-    if not periodo_codigo:
-        raise ValueError(f"Período inválido: {periodo}")
-    
-    if periodo == "daily" and (not dia or not mes or not ano):
-        raise ValueError("Dia, mês e ano são obrigatórios para arquivos diários")
-    
-    if periodo == "monthly" and (not mes or not ano):
-        raise ValueError("Mês e ano são obrigatórios para arquivos mensais")
+    try:
+        fmt = _FMT[periodo]
+    except KeyError:
+        raise ValueError(f"Período inválido: {periodo}") from None
     
-    if periodo == "yearly" and not ano:
-        raise ValueError("Ano é obrigatório para arquivos anuais")
+    campos, mensagem = _CAMPOS_OBRIGATORIOS[periodo]
+    valores = {"dia": dia, "mes": mes, "ano": ano}
+    if not all(valores[campo] for campo in campos):
+        raise ValueError(mensagem)
     
-    if periodo == "daily":
-        return f"COTAHIST_D{dia}{mes}{ano}.ZIP"
-    elif periodo == "monthly":
-        return f"COTAHIST_M{mes}{ano}.ZIP"
-    else:  # yearly
-        return f"COTAHIST_A{ano}.ZIP"
+    return fmt(**valores)
 
-def verificar_arquivo_disponivel(periodo, dia, mes, ano):
+def verificar_arquivo_disponivel(periodo, dia, mes, ano, sessao=None):
     """
     Verifica se um arquivo específico está disponível para download.
     
@@ -414,33 +784,28 @@ def verificar_arquivo_disponivel(periodo, dia, mes, ano):
         dia: Dia (string de 2 dígitos)
         mes: Mês (string de 2 dígitos)
         ano: Ano (string de 4 dígitos)
+        sessao: SessaoHTTP a reutilizar entre verificações (opcional)
         
     Returns:
-        tuple: (bool, string) - (disponível, nome do arquivo)
+        tuple: (disponível, nome do arquivo), onde disponível é True, False
+        (não existe no servidor) ou None (não determinado; ver verificar_arquivo_existe)
     """
-    # Obter logger
-    logger = get_logger('b3_downloader')
-    
-    # Obter configuração
-    config_manager = get_config_manager()
-    base_url = config_manager.get("base_url")
-    
     try:
         # Gerar nome do arquivo
         filename = gerar_nome_arquivo(periodo, dia, mes, ano)
-        url = f"{base_url}{filename}"
+        url = f"{_BASE_URL}{filename}"
         
         # Verificar se o arquivo existe
-        disponivel = verificar_arquivo_existe(url)
+        disponivel = verificar_arquivo_existe(url, sessao)
         
         return disponivel, filename
     except Exception as e:
-        logger.error(f"Erro ao verificar disponibilidade do arquivo: {e}")
-        return False, None
+        _LOG.error(f"Erro ao verificar disponibilidade do arquivo: {e}")
+        return None, None
 
 def baixar_certificado(hostname, cert_path):
     """
-    Baixa o certificado SSL do servidor com tratamento de espaços no caminho.
+    Baixa o certificado SSL do servidor e o salva em PEM.
     
     Args:
         hostname: Nome do host
@@ -449,180 +814,288 @@ def baixar_certificado(hostname, cert_path):
     Returns:
         bool: True se o certificado foi baixado com sucesso, False caso contrário
     """
-    # Obter logger
-    logger = get_logger('b3_downloader')
-    
     try:
         # Criar diretório se não existir
         os.makedirs(os.path.dirname(cert_path), exist_ok=True)
         
-        # Em ambientes WSL, os caminhos com espaços podem causar problemas
-        # Vamos usar um caminho temporário sem espaços, e depois copiar
-        temp_cert_path = f"/tmp/b3_cert_{int(time.time())}.pem"
+        _LOG.debug(f"Obtendo certificado de {hostname}:443")
+        cert_pem = ssl.get_server_certificate((hostname, 443), timeout=30)
         
-        openssl_cmd = f"openssl s_client -showcerts -connect {hostname}:443 </dev/null 2>/dev/null | openssl x509 -outform PEM > {temp_cert_path}"
-        logger.debug(f"Executando comando OpenSSL: {openssl_cmd}")
-        subprocess.run(openssl_cmd, shell=True, check=True)
-        
-        # Verificar se o certificado foi criado
-        if os.path.exists(temp_cert_path) and os.path.getsize(temp_cert_path) > 0:
-            # Copiar para o destino final
-            with open(temp_cert_path, 'rb') as src, open(cert_path, 'wb') as dst:
-                dst.write(src.read())
-                
-            # Remover arquivo temporário
-            os.remove(temp_cert_path)
+        if cert_pem:
+            with open(cert_path, 'w') as f:
+                f.write(cert_pem)
             
-            logger.info(f"Certificado salvo em: {cert_path}")
+            _LOG.info(f"Certificado salvo em: {cert_path}")
             return True
         else:
-            logger.error("Falha ao gerar certificado SSL")
+            _LOG.error("Falha ao gerar certificado SSL")
             return False
     except Exception as e:
-        logger.error(f"Erro ao baixar certificado: {e}")
+        _LOG.error(f"Erro ao baixar certificado: {e}")
         return False
 
-def baixar_arquivo_b3(filename, output_path, impressao_digital=None):
+def salvar_certificado_pem(cert_der, cert_path):
     """
-    Baixa arquivo da B3 usando curl com verificação de impressão digital.
+    Salva em PEM um certificado obtido em DER, sem processos externos.
     
     Args:
-        filename: Nome do arquivo para baixar
-        output_path: Caminho onde salvar o arquivo
-        impressao_digital: Impressão digital do certificado esperado (opcional)
+        cert_der: Certificado em formato DER
+        cert_path: Caminho para salvar o certificado
         
     Returns:
-        bool: True se o download foi bem-sucedido, False caso contrário
+        bool: True se o certificado foi salvo com sucesso, False caso contrário
     """
-    # Obter loggers
-    logger = get_logger('b3_downloader')
-    security_logger = get_logger('b3_security')
-    
-    # Obter configuração
-    config_manager = get_config_manager()
-    config = config_manager.get_config()
+    try:
+        os.makedirs(os.path.dirname(cert_path), exist_ok=True)
+        with open(cert_path, 'w') as f:
+            f.write(ssl.DER_cert_to_PEM_cert(cert_der))
+        _LOG.info(f"Certificado salvo em: {cert_path}")
+        return True
+    except Exception as e:
+        _LOG.error(f"Erro ao salvar certificado: {e}")
+        return False
+
+def ler_nomes_zip(caminho):
+    """
+    Lista os arquivos de um ZIP lendo apenas o final do arquivo (EOCD) e o
+    diretório central, validando a estrutura sem percorrer o conteúdo.
     
-    base_url = config["base_url"]
-    cert_dir = config["cert_dir"]
+    Args:
+        caminho: Caminho do arquivo ZIP
+        
+    Returns:
+        list: Nomes dos arquivos contidos no ZIP
+        
+    Raises:
+        zipfile.BadZipFile: Se o arquivo não tiver uma estrutura ZIP válida
+    """
+    with open(caminho, 'rb') as f:
+        tamanho = f.seek(0, os.SEEK_END)
+        
+        # O registro EOCD (22 bytes) fica no fim, seguido de um comentário de até 64KB
+        inicio_cauda = max(0, tamanho - (22 + 65535))
+        f.seek(inicio_cauda)
+        cauda = f.read()
+        
+        pos = cauda.rfind(b'PK\x05\x06')
+        if pos < 0 or len(cauda) - pos < 22:
+            raise zipfile.BadZipFile("Registro de fim do diretório central não encontrado")
+        
+        _, _, _, _, total, tamanho_cd, _, _ = struct.unpack('<4s4H2LH', cauda[pos:pos + 22])
+        if total == 0xFFFF or tamanho_cd == 0xFFFFFFFF:
+            # ZIP64: delega ao zipfile
+            with zipfile.ZipFile(caminho) as zip_ref:
+                return zip_ref.namelist()
+        
+        inicio_cd = inicio_cauda + pos - tamanho_cd
+        if inicio_cd < 0:
+            raise zipfile.BadZipFile("Diretório central fora dos limites do arquivo")
+        if inicio_cd >= inicio_cauda:
+            cd = cauda[inicio_cd - inicio_cauda:pos]
+        else:
+            f.seek(inicio_cd)
+            cd = f.read(tamanho_cd)
+    
+    nomes = []
+    i = 0
+    for _ in range(total):
+        cabecalho = cd[i:i + zipfile.sizeCentralDir]
+        if len(cabecalho) < zipfile.sizeCentralDir or cabecalho[:4] != zipfile.stringCentralDir:
+            raise zipfile.BadZipFile("Diretório central corrompido")
+        
+        campos = struct.unpack(zipfile.structCentralDir, cabecalho)
+        n_nome, n_extra, n_comentario = campos[12], campos[13], campos[14]
+        nome = cd[i + zipfile.sizeCentralDir:i + zipfile.sizeCentralDir + n_nome]
+        nomes.append(nome.decode('utf-8' if campos[5] & 0x800 else 'cp437'))
+        i += zipfile.sizeCentralDir + n_nome + n_extra + n_comentario
     
-    url = f"{base_url}{filename}"
-    hostname = urlparse(base_url).netloc
+    return nomes
+
+def _sessao_com_certificado(hostname, impressao_digital=None):
+    """
+    Prepara a sessão HTTP de download, verificando o servidor com o certificado
+    correspondente à impressão digital (obtida agora se não for fornecida).
     
+    Args:
+        hostname: Nome do host
+        impressao_digital: Impressão digital do certificado esperado (opcional)
+        
+    Returns:
+        tuple: (sessao, impressao_digital), com impressao_digital None se não
+               pôde ser obtida
+    """
     # Se não foi fornecida uma impressão digital, vamos obtê-la agora
     if impressao_digital is None:
         try:
             impressao_digital = obter_impressao_digital_certificado(hostname)
             registrar_impressao_digital(impressao_digital)
-            logger.info(f"Impressão digital obtida: {impressao_digital}")
+            _LOG.info(f"Impressão digital obtida: {impressao_digital}")
         except Exception as e:
-            logger.error(f"Erro ao obter impressão digital: {e}")
-            logger.warning("Continuando sem verificação de impressão digital...")
+            _LOG.error(f"Erro ao obter impressão digital: {e}")
+            _LOG.warning("Continuando sem verificação de impressão digital...")
     
-    # Verificar se a impressão digital atual corresponde à esperada
-    if impressao_digital:
-        try:
-            impressao_digital_atual = obter_impressao_digital_certificado(hostname)
-            
-            if impressao_digital_atual != impressao_digital:
-                security_logger.error(f"ALERTA DE SEGURANÇA: A impressão digital do certificado mudou!")
-                security_logger.error(f"Esperada: {impressao_digital}")
-                security_logger.error(f"Atual: {impressao_digital_atual}")
-                
-                # Registrar a mudança de impressão digital
-                registrar_impressao_digital(impressao_digital_atual)
-                security_logger.warning("Continuando com alerta de segurança. Verifique manualmente o certificado.")
-                
-                # Atualizar a impressão digital
-                impressao_digital = impressao_digital_atual
-        except Exception as e:
-            logger.error(f"Erro ao verificar impressão digital atual: {e}")
-    
-    # Criar diretório para certificados
-    os.makedirs(cert_dir, exist_ok=True)
-    
-    # Nome do arquivo de certificado baseado no timestamp
-    timestamp = int(time.time())
-    cert_path = os.path.join(cert_dir, f"b3_cert_{timestamp}.pem")
-    
-    # Baixar certificado do servidor
-    cert_baixado = baixar_certificado(hostname, cert_path)
-    
-    # Pequeno atraso antes do download
-    time.sleep(random.uniform(1.0, 3.0))
-    
-    # Construir comando curl
-    curl_command = [
-        'curl',
-        '--retry', str(config["max_retries"]),
-        '--retry-delay', '2',
-        '-L',
-        '-A', config["user_agent"],
-        '-H', 'Accept: text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-        '-H', 'Accept-Language: pt-BR,pt;q=0.9,en-US;q=0.8,en;q=0.7',
-        '-H', f'Referer: https://{hostname}/',
-        url,
-        '-o', output_path
-    ]
+    # Reutilizar o certificado já salvo enquanto a impressão digital não mudar
+    cert_path = _CERT_CACHE.get(impressao_digital) if impressao_digital else None
+    cert_baixado = bool(cert_path) and os.path.exists(cert_path)
     
-    # Adicionar verbose se configurado
-    if config["enable_curl_verbose"]:
-        curl_command.append('-v')
+    if not cert_baixado:
+        # Criar diretório para certificados
+        os.makedirs(_CERT_DIR, exist_ok=True)
+        
+        # Nome do arquivo de certificado baseado no timestamp
+        timestamp = int(time.time())
+        cert_path = os.path.join(_CERT_DIR, f"b3_cert_{timestamp}.pem")
+        
+        # Gravar o certificado já recebido na consulta da impressão digital;
+        # só o baixa do servidor se ele não estiver disponível
+        cert_der = _CERTIFICADOS_DER.get(impressao_digital)
+        if cert_der:
+            cert_baixado = salvar_certificado_pem(cert_der, cert_path)
+        else:
+            cert_baixado = baixar_certificado(hostname, cert_path)
+        
+        if cert_baixado and impressao_digital:
+            _CERT_CACHE[impressao_digital] = cert_path
+    else:
+        _LOG.debug(f"Reutilizando certificado em cache: {cert_path}")
     
     # Verificar se temos um certificado válido
     if cert_baixado and os.path.exists(cert_path) and os.path.getsize(cert_path) > 100:
-        curl_command.extend(['--cacert', cert_path])
-        logger.info("Usando certificado baixado para verificação SSL")
+        sessao = obter_sessao_http(verificar_certificado=True, cafile=cert_path)
+        _LOG.info("Usando certificado baixado para verificação SSL")
     else:
-        logger.warning("Usando curl com -k (inseguro) porque não conseguimos obter um certificado válido")
-        curl_command.append('-k')
+        _LOG.warning("Baixando sem verificação de certificado (inseguro) porque não conseguimos obter um certificado válido")
+        sessao = obter_sessao_http(verificar_certificado=False)
     
-    # Executar curl
-    try:
-        logger.info(f"Baixando {filename}...")
-        logger.debug(f"Comando curl: {' '.join(curl_command)}")
+    return sessao, impressao_digital
+
+def _impressao_digital_confere(resp, impressao_digital, filename):
+    """
+    Confere a impressão digital do certificado da conexão que recebeu a resposta.
+    Em caso de divergência, a resposta é fechada e a nova impressão digital registrada.
+    
+    Args:
+        resp: Resposta de SessaoHTTP.requisitar
+        impressao_digital: Impressão digital esperada (None dispensa a verificação)
+        filename: Nome do arquivo, para as mensagens de log
         
-        process = subprocess.run(curl_command, timeout=60, capture_output=True)
+    Returns:
+        bool: False se a impressão digital mudou, True caso contrário
+    """
+    if impressao_digital and resp.certificado_servidor:
+        impressao_digital_atual = hashlib.sha256(resp.certificado_servidor).hexdigest()
+        if impressao_digital_atual != impressao_digital:
+            resp.close()
+            _SEC.error(f"ALERTA DE SEGURANÇA: A impressão digital do certificado mudou!")
+            _SEC.error(f"Esperada: {impressao_digital}")
+            _SEC.error(f"Atual: {impressao_digital_atual}")
+            registrar_impressao_digital(impressao_digital_atual)
+            _SEC.error(f"Download de {filename} abortado. Verifique manualmente o certificado.")
+            return False
+    
+    return True
+
+def baixar_arquivo_b3(filename, output_path, impressao_digital=None, memoria=None):
+    """
+    Baixa arquivo da B3 em conexão persistente, com verificação de impressão digital.
+    
+    Args:
+        filename: Nome do arquivo para baixar
+        output_path: Caminho onde salvar o arquivo
+        impressao_digital: Impressão digital do certificado esperado (opcional)
+        memoria: Buffer que recebe uma cópia do arquivo, se couber em
+                 LIMITE_EXTRACAO_MEMORIA (opcional; ver gravar_resposta)
         
-        if process.returncode == 0:
-            logger.info(f"Download de {filename} concluído com sucesso")
+    Returns:
+        bool: True se o download foi bem-sucedido, False caso contrário
+    """
+    url = f"{_BASE_URL}{filename}"
+    hostname = urlparse(_BASE_URL).netloc
+    
+    sessao, impressao_digital = _sessao_com_certificado(hostname, impressao_digital)
+    
+    headers = {
+        'User-Agent': _UA,
+        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+        'Accept-Language': 'pt-BR,pt;q=0.9,en-US;q=0.8,en;q=0.7',
+        'Referer': f'https://{hostname}/',
+    }
+    
+    # Baixar em conexão persistente, com novas tentativas em falhas de rede
+    max_retries = _MAX_RETRIES
+    for tentativa in range(max_retries + 1):
+        try:
+            _LOG.info(f"Baixando {filename}...")
+            resp = sessao.requisitar('GET', url, headers=headers)
             
-            # Verificações adicionais no arquivo baixado
-            if os.path.exists(output_path):
-                file_size = os.path.getsize(output_path)
-                logger.info(f"Tamanho do arquivo baixado: {file_size} bytes")
-                
-                if file_size < 100:
-                    logger.warning(f"ALERTA: Arquivo baixado é muito pequeno ({file_size} bytes). Verifique o conteúdo.")
-                
-                # Verificar se é um arquivo ZIP válido
-                if output_path.lower().endswith('.zip'):
-                    try:
-                        with zipfile.ZipFile(output_path, 'r') as zip_ref:
-                            file_list = zip_ref.namelist()
-                            logger.info(f"Arquivos no ZIP: {', '.join(file_list)}")
-                            if not file_list:
-                                logger.warning("O arquivo ZIP está vazio!")
-                                return False
-                    except zipfile.BadZipFile:
-                        logger.error("O arquivo baixado não é um ZIP válido!")
-                        return False
-                    except Exception as e:
-                        logger.error(f"Erro ao verificar o arquivo ZIP: {e}")
-                        return False
+            if resp.status != 200:
+                resp.close()
+                _LOG.error(f"Código de status HTTP inesperado ao baixar {filename}: {resp.status}")
+                return False
             
-            return True
-        else:
-            logger.error(f"Curl falhou com código: {process.returncode}")
-            if process.stderr:
-                logger.error(f"Erro: {process.stderr.decode()}")
-            return False
+            # Conferir a impressão digital do certificado da conexão usada no download
+            if not _impressao_digital_confere(resp, impressao_digital, filename):
+                return False
             
-    except subprocess.TimeoutExpired:
-        logger.error("Timeout ao executar curl.")
-        return False
-    except Exception as e:
-        logger.error(f"Erro ao usar curl: {e}")
-        return False
+            if memoria is not None:
+                # Descartar a cópia de uma tentativa anterior interrompida
+                memoria.seek(0)
+                memoria.truncate()
+            
+            file_size = gravar_resposta(resp, output_path, memoria=memoria)
+            break
+        except (http.client.HTTPException, OSError) as e:
+            if tentativa == max_retries:
+                _LOG.error(f"Erro ao baixar {filename}: {e}")
+                return False
+            espera = _BACKOFF_FACTOR ** (tentativa + 1)
+            _LOG.warning(f"Falha ao baixar {filename} (tentativa {tentativa+1}/{max_retries+1}): {e}. Nova tentativa em {espera:.1f}s")
+            time.sleep(espera)
+    
+    _LOG.info(f"Download de {filename} concluído com sucesso")
+    
+    # Verificações adicionais no arquivo baixado
+    _LOG.info(f"Tamanho do arquivo baixado: {file_size} bytes")
+    
+    if file_size < 100:
+        _LOG.warning(f"ALERTA: Arquivo baixado é muito pequeno ({file_size} bytes). Verifique o conteúdo.")
+    
+    # Verificar se é um arquivo ZIP válido
+    if output_path.lower().endswith('.zip'):
+        try:
+            file_list = ler_nomes_zip(output_path)
+            _LOG.info(f"Arquivos no ZIP: {', '.join(file_list)}")
+            if not file_list:
+                _LOG.warning("O arquivo ZIP está vazio!")
+                return False
+        except zipfile.BadZipFile:
+            _LOG.error("O arquivo baixado não é um ZIP válido!")
+            return False
+        except Exception as e:
+            _LOG.error(f"Erro ao verificar o arquivo ZIP: {e}")
+            return False
+    
+    return True
+
+# Executor das verificações de baixar_com_fallback, mantido entre chamadas para
+# que as conexões keep-alive (uma por thread) sejam reaproveitadas. É separado
+# do executor de async_downloader, em cujas threads baixar_com_fallback executa
+_EXECUTOR_SONDAGENS = None
+_EXECUTOR_SONDAGENS_LOCK = threading.Lock()
+
+def _obter_executor_sondagens():
+    """
+    Retorna o executor compartilhado das verificações de disponibilidade, criando-o no primeiro uso.
+    
+    Returns:
+        ThreadPoolExecutor: Executor das verificações
+    """
+    global _EXECUTOR_SONDAGENS
+    
+    with _EXECUTOR_SONDAGENS_LOCK:
+        if _EXECUTOR_SONDAGENS is None:
+            _EXECUTOR_SONDAGENS = ThreadPoolExecutor(max_workers=LIMITE_SONDAGENS, thread_name_prefix='b3_sondagem')
+        return _EXECUTOR_SONDAGENS
 
 def baixar_com_fallback(dia, mes, ano, force=False):
     """
@@ -638,149 +1111,303 @@ def baixar_com_fallback(dia, mes, ano, force=False):
     Returns:
         tuple: (status, zip_path, txt_path)
     """
-    # Obter logger
-    logger = get_logger('b3_downloader')
+    # Uma única sessão keep-alive para as verificações diária, mensal e anual
+    sessao = obter_sessao_http()
     
-    # Obter configuração
-    config_manager = get_config_manager()
-    data_dir = config_manager.get("data_dir")
+    # Formatos na ordem de preferência: diário, mensal e anual
+    tentativas = (("daily", dia, mes, ano), ("monthly", None, mes, ano), ("yearly", None, None, ano))
+    sondagens = None
+    
+    for periodo, d, m, a in tentativas:
+        rotulo = _ROTULOS_PERIODO[periodo]
+        try:
+            filename = gerar_nome_arquivo(periodo, d, m, a)
+            zip_path = os.path.join(_DATA_DIR, filename)
+            txt_path = zip_path.replace('.ZIP', '.TXT')
+            
+            # Verificar se o arquivo já existe e se não estamos forçando o download
+            if os.path.exists(txt_path) and not force:
+                _LOG.info(f"Arquivo {rotulo} {filename} já existe. Use --force para baixar novamente.")
+                return "exists", zip_path, txt_path
+            
+            if sondagens is None:
+                # Verificar a disponibilidade dos três formatos de uma vez, em paralelo
+                executor = _obter_executor_sondagens()
+                sondagens = {
+                    p: executor.submit(verificar_arquivo_disponivel, p, sd, sm, sa, sessao=sessao)
+                    for p, sd, sm, sa in tentativas
+                }
+            
+            disponivel, _ = sondagens[periodo].result()
+            if not disponivel:
+                _LOG.info(f"Arquivo {rotulo} {filename} não disponível")
+                continue
+            
+            memoria = io.BytesIO()
+            if not baixar_arquivo_b3(filename, zip_path, memoria=memoria):
+                _LOG.error(f"Falha ao baixar arquivo {rotulo} {filename}")
+                break
+            
+            # Extrair da cópia em memória quando houver, sem reler o ZIP do disco
+            extracted_files = extrair_zip(zip_path, _DATA_DIR, arquivo_memoria=memoria if memoria.tell() else None)
+            if not extracted_files:
+                _LOG.error(f"Falha ao extrair arquivo {rotulo} {filename}")
+                return "extract_error", zip_path, None
+            
+            # Encontrar o arquivo TXT
+            txt_path = next((f for f in extracted_files if f.upper().endswith('.TXT')), txt_path)
+            
+            _LOG.info(f"Arquivo {rotulo} {filename} baixado e extraído com sucesso")
+            return "success", zip_path, txt_path
+        except Exception as e:
+            _LOG.error(f"Erro ao tentar baixar arquivo {rotulo}: {e}")
+            break
+    
+    return "not_available", None, None
+
+# Fila única de gravação em disco, atendida por uma thread compartilhada por
+# todos os downloads (ver gravar_resposta)
+_FILA_GRAVACAO = queue.Queue()
+_GRAVADOR = None
+_GRAVADOR_LOCK = threading.Lock()
+
+def _executar_gravacoes():
+    """
+    Laço da thread de gravação: executa em ordem os blocos enfileirados por
+    todos os downloads em andamento. Cada item é (arquivo, bloco, estado);
+    bloco None sinaliza o fim do arquivo daquele download.
+    """
+    while True:
+        f, bloco, estado = _FILA_GRAVACAO.get()
+        if bloco is None:
+            estado['concluido'].set()
+            continue
+        try:
+            if not estado['erros']:
+                f.write(bloco)
+        except Exception as e:
+            estado['erros'].append(e)
+        finally:
+            estado['vagas'].release()
+
+def _iniciar_gravador():
+    """
+    Inicia a thread de gravação compartilhada, se ainda não estiver rodando.
+    """
+    global _GRAVADOR
+    
+    with _GRAVADOR_LOCK:
+        if _GRAVADOR is None or not _GRAVADOR.is_alive():
+            _GRAVADOR = threading.Thread(target=_executar_gravacoes, name='b3_gravador', daemon=True)
+            _GRAVADOR.start()
+
+def gravar_resposta(resp, caminho, modo='wb', memoria=None):
+    """
+    Grava o corpo de uma resposta HTTP em disco, sobrepondo rede e escrita.
+    
+    Os blocos recebidos são enviados à thread de gravação compartilhada por
+    todos os downloads, enquanto a thread atual continua recebendo da rede.
+    Cada download pode ter no máximo BLOCOS_PENDENTES_GRAVACAO blocos na fila,
+    o que impede acumular o arquivo em memória quando o disco é mais lento
+    que a conexão.
+    
+    Args:
+        resp: Resposta HTTP com o método read()
+        caminho: Caminho do arquivo de destino
+        modo: Modo de abertura do arquivo ('wb' ou 'ab' para continuar um download)
+        memoria: Buffer que também recebe os blocos, para uso posterior sem
+                 reler o arquivo (opcional). Só é preenchido quando o arquivo
+                 é gravado por inteiro e o Content-Length não passa de
+                 LIMITE_EXTRACAO_MEMORIA; caso contrário fica vazio
+        
+    Returns:
+        int: Número de bytes gravados
+    """
+    if memoria is not None and (modo != 'wb' or resp.length is None or resp.length > LIMITE_EXTRACAO_MEMORIA):
+        memoria = None
+    
+    _iniciar_gravador()
+    
+    estado = {
+        'erros': [],
+        'vagas': threading.Semaphore(BLOCOS_PENDENTES_GRAVACAO),
+        'concluido': threading.Event()
+    }
+    
+    total = 0
+    with open(caminho, modo) as f:
+        try:
+            while not estado['erros']:
+                bloco = resp.read(TAMANHO_BLOCO_DOWNLOAD)
+                if not bloco:
+                    break
+                estado['vagas'].acquire()
+                _FILA_GRAVACAO.put((f, bloco, estado))
+                if memoria is not None:
+                    memoria.write(bloco)
+                total += len(bloco)
+        finally:
+            _FILA_GRAVACAO.put((f, None, estado))
+            estado['concluido'].wait()
+    
+    if estado['erros']:
+        raise estado['erros'][0]
+    
+    return total
+
+def baixar_probe_or_fetch(periodo, dia, mes, ano, force=False, impressao_digital=None):
+    """
+    Baixa um arquivo com uma única requisição GET, sem verificação prévia.
+    Respostas 404/410 indicam arquivo não disponível e o corpo não é lido.
+    
+    Args:
+        periodo: Tipo de período ('daily', 'monthly', 'yearly')
+        dia: Dia (string de 2 dígitos, apenas para período diário)
+        mes: Mês (string de 2 dígitos, para períodos diário e mensal)
+        ano: Ano (string de 4 dígitos)
+        force: Se deve forçar o download mesmo se o arquivo já existir
+        impressao_digital: Impressão digital do certificado esperado (opcional)
+        
+    Returns:
+        tuple: (status, zip_path, txt_path), com status 'success', 'exists',
+               'not_available', 'download_error' ou 'extract_error'
+    """
+    filename = gerar_nome_arquivo(periodo, dia, mes, ano)
+    zip_path = os.path.join(_DATA_DIR, filename)
+    txt_path = zip_path.replace('.ZIP', '.TXT')
+    
+    # Verificar se o arquivo já existe e se não estamos forçando o download
+    if os.path.exists(txt_path) and not force:
+        _LOG.info(f"Arquivo {filename} já existe. Use --force para baixar novamente.")
+        return "exists", zip_path, txt_path
+    
+    url = f"{_BASE_URL}{filename}"
+    hostname = urlparse(_BASE_URL).netloc
+    headers = {
+        'User-Agent': _UA,
+        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+        'Accept-Language': 'pt-BR,pt;q=0.9,en-US;q=0.8,en;q=0.7',
+        'Referer': f"https://{hostname}/",
+    }
+    
+    # Downloads interrompidos ficam em .part e são continuados a partir do último byte
+    part_path = zip_path + '.part'
+    ja_baixado = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+    if ja_baixado:
+        headers['Range'] = f"bytes={ja_baixado}-"
+    
+    # Cópia em memória do ZIP para a extração (ver gravar_resposta)
+    memoria = io.BytesIO()
     
-    # Primeiro tenta baixar arquivo diário
     try:
-        filename_daily = gerar_nome_arquivo("daily", dia, mes, ano)
-        zip_path = os.path.join(data_dir, filename_daily)
-        txt_path = zip_path.replace('.ZIP', '.TXT')
-        
-        # Verificar se o arquivo já existe e se não estamos forçando o download
-        if os.path.exists(txt_path) and not force:
-            logger.info(f"Arquivo diário {filename_daily} já existe. Use --force para baixar novamente.")
-            return "exists", zip_path, txt_path
-        
-        # Verificar se arquivo está disponível
-        disponivel, _ = verificar_arquivo_disponivel("daily", dia, mes, ano)
-        
-        if disponivel:
-            # Baixar arquivo
-            if baixar_arquivo_b3(filename_daily, zip_path):
-                # Extrair arquivo
-                extracted_files = extrair_zip(zip_path, data_dir)
-                if extracted_files:
-                    # Encontrar o arquivo TXT
-                    for ext_file in extracted_files:
-                        if ext_file.upper().endswith('.TXT'):
-                            txt_path = ext_file
-                            break
-                    
-                    logger.info(f"Arquivo diário {filename_daily} baixado e extraído com sucesso")
-                    return "success", zip_path, txt_path
-                else:
-                    logger.error(f"Falha ao extrair arquivo diário {filename_daily}")
-                    return "extract_error", zip_path, None
+        # Mesma verificação de certificado e impressão digital de baixar_arquivo_b3
+        sessao, impressao_digital = _sessao_com_certificado(hostname, impressao_digital)
+        resp = sessao.requisitar('GET', url, headers=headers)
+        
+        if not _impressao_digital_confere(resp, impressao_digital, filename):
+            return "download_error", None, None
+        
+        if resp.status in (404, 410):
+            resp.close()
+            _LOG.info(f"Arquivo {filename} não disponível")
+            return "not_available", None, None
+        
+        if resp.status == 416 and ja_baixado:
+            # O arquivo parcial já contém o arquivo completo
+            resp.close()
+            _LOG.info(f"Download de {filename} já estava completo ({ja_baixado} bytes)")
+        elif resp.status in (200, 206):
+            # 206: o servidor continua do byte pedido; 200: envia o arquivo inteiro
+            modo = 'ab' if resp.status == 206 else 'wb'
+            if modo == 'ab':
+                _LOG.info(f"Continuando download de {filename} a partir de {ja_baixado} bytes...")
             else:
-                logger.error(f"Falha ao baixar arquivo diário {filename_daily}")
-        else:
-            logger.info(f"Arquivo diário {filename_daily} não disponível")
+                _LOG.info(f"Baixando {filename}...")
             
-            # Se o arquivo diário não está disponível, tenta baixar o mensal
-            try:
-                filename_monthly = gerar_nome_arquivo("monthly", None, mes, ano)
-                zip_path = os.path.join(data_dir, filename_monthly)
-                txt_path = zip_path.replace('.ZIP', '.TXT')
-                
-                # Verificar se o arquivo já existe e se não estamos forçando o download
-                if os.path.exists(txt_path) and not force:
-                    logger.info(f"Arquivo mensal {filename_monthly} já existe. Use --force para baixar novamente.")
-                    return "exists", zip_path, txt_path
-                
-                # Verificar se arquivo está disponível
-                disponivel, _ = verificar_arquivo_disponivel("monthly", None, mes, ano)
+            # Gravar o corpo em blocos de 1MB, com a escrita em disco em paralelo à recepção
+            os.makedirs(_DATA_DIR, exist_ok=True)
+            tamanho = gravar_resposta(resp, part_path, modo, memoria=memoria)
+            _LOG.info(f"Download de {filename} concluído com sucesso ({tamanho} bytes recebidos)")
+        else:
+            resp.close()
+            _LOG.error(f"Código de status HTTP inesperado ao baixar {filename}: {resp.status}")
+            return "download_error", None, None
+        
+        os.replace(part_path, zip_path)
+        
+        # Verificar se é um arquivo ZIP válido e não vazio
+        if not ler_nomes_zip(zip_path):
+            _LOG.warning("O arquivo ZIP está vazio!")
+            return "download_error", None, None
                 
-                if disponivel:
-                    # Baixar arquivo
-                    if baixar_arquivo_b3(filename_monthly, zip_path):
-                        # Extrair arquivo
-                        extracted_files = extrair_zip(zip_path, data_dir)
-                        if extracted_files:
-                            # Encontrar o arquivo TXT
-                            for ext_file in extracted_files:
-                                if ext_file.upper().endswith('.TXT'):
-                                    txt_path = ext_file
-                                    break
-                            
-                            logger.info(f"Arquivo mensal {filename_monthly} baixado e extraído com sucesso")
-                            return "success", zip_path, txt_path
-                        else:
-                            logger.error(f"Falha ao extrair arquivo mensal {filename_monthly}")
-                            return "extract_error", zip_path, None
-                    else:
-                        logger.error(f"Falha ao baixar arquivo mensal {filename_monthly}")
-                else:
-                    logger.info(f"Arquivo mensal {filename_monthly} não disponível")
-                    
-                    # Se o arquivo mensal não está disponível, tenta baixar o anual
-                    try:
-                        filename_yearly = gerar_nome_arquivo("yearly", None, None, ano)
-                        zip_path = os.path.join(data_dir, filename_yearly)
-                        txt_path = zip_path.replace('.ZIP', '.TXT')
-                        
-                        # Verificar se o arquivo já existe e se não estamos forçando o download
-                        if os.path.exists(txt_path) and not force:
-                            logger.info(f"Arquivo anual {filename_yearly} já existe. Use --force para baixar novamente.")
-                            return "exists", zip_path, txt_path
-                        
-                        # Verificar se arquivo está disponível
-                        disponivel, _ = verificar_arquivo_disponivel("yearly", None, None, ano)
-                        
-                        if disponivel:
-                            # Baixar arquivo
-                            if baixar_arquivo_b3(filename_yearly, zip_path):
-                                # Extrair arquivo
-                                extracted_files = extrair_zip(zip_path, data_dir)
-                                if extracted_files:
-                                    # Encontrar o arquivo TXT
-                                    for ext_file in extracted_files:
-                                        if ext_file.upper().endswith('.TXT'):
-                                            txt_path = ext_file
-                                            break
-                                    
-                                    logger.info(f"Arquivo anual {filename_yearly} baixado e extraído com sucesso")
-                                    return "success", zip_path, txt_path
-                                else:
-                                    logger.error(f"Falha ao extrair arquivo anual {filename_yearly}")
-                                    return "extract_error", zip_path, None
-                            else:
-                                logger.error(f"Falha ao baixar arquivo anual {filename_yearly}")
-                        else:
-                            logger.info(f"Arquivo anual {filename_yearly} não disponível")
-                    except Exception as e:
-                        logger.error(f"Erro ao tentar baixar arquivo anual: {e}")
-            except Exception as e:
-                logger.error(f"Erro ao tentar baixar arquivo mensal: {e}")
+    except zipfile.BadZipFile:
+        _LOG.error(f"O arquivo baixado {filename} não é um ZIP válido!")
+        os.remove(zip_path)
+        return "download_error", None, None
     except Exception as e:
-        logger.error(f"Erro ao tentar baixar arquivo: {e}")
+        # O arquivo .part é mantido para continuar o download na próxima tentativa
+        _LOG.error(f"Erro ao baixar {filename}: {e}")
+        return "download_error", None, None
+    
+    # Extrair arquivo, da cópia em memória quando houver
+    extracted_files = extrair_zip(zip_path, _DATA_DIR, arquivo_memoria=memoria if memoria.tell() else None)
+    if not extracted_files:
+        _LOG.error(f"Falha ao extrair arquivo {filename}")
+        return "extract_error", zip_path, None
+    
+    for ext_file in extracted_files:
+        if ext_file.upper().endswith('.TXT'):
+            txt_path = ext_file
+            break
+    
+    _LOG.info(f"Arquivo {filename} baixado e extraído com sucesso")
+    return "success", zip_path, txt_path
+
+def _arquivo_diario_disponivel(dia, mes, ano):
+    """
+    Indica se o arquivo diário de uma data está disponível no servidor.
     
-    return "not_available", None, None
+    Args:
+        dia: Dia (string de 2 dígitos)
+        mes: Mês (string de 2 dígitos)
+        ano: Ano (string de 4 dígitos)
+        
+    Returns:
+        bool: True se o arquivo está disponível
+    """
+    disponivel, _ = verificar_arquivo_disponivel("daily", dia, mes, ano)
+    return bool(disponivel)
 
-def determinar_arquivos_para_baixar(arquivos_manager):
+def _partes_data(data):
+    """
+    Separa uma data em dia, mês e ano no formato usado nos nomes dos arquivos.
+    Formatação direta é bem mais barata que strftime, que interpreta o
+    formato a cada chamada.
+    
+    Args:
+        data: Data (datetime.date)
+        
+    Returns:
+        tuple: (dia, mes, ano) como strings de 2, 2 e 4 dígitos
+    """
+    return f"{data.day:02d}", f"{data.month:02d}", str(data.year)
+
+def determinar_arquivos_para_baixar(arquivos_manager, verificar_disponibilidade=True):
     """
     Determina quais arquivos precisam ser baixados com base no último arquivo processado.
     
     Args:
         arquivos_manager: Instância do ArquivosProcessadosManager
+        verificar_disponibilidade: Se deve consultar o servidor para cada dia de pregão;
+                                   com False, a verificação fica a cargo do chamador
         
     Returns:
         list: Lista de tuplas (dia, mes, ano) para baixar
     """
-    # Obter logger
-    logger = get_logger('b3_downloader')
-    
-    # Obter configuração
-    config_manager = get_config_manager()
-    
-    # Obter gerenciador de calendário
-    calendar_manager = get_calendar_manager()
-    
     try:
+        # Data atual, calculada uma única vez
+        hoje = datetime.datetime.now().date()
+        
         # Listar arquivos já processados para encontrar o mais recente
         arquivos = arquivos_manager.listar_arquivos_processados()
         
@@ -788,101 +1415,121 @@ def determinar_arquivos_para_baixar(arquivos_manager):
         arquivos_diarios = [a for a in arquivos if a['tipo'] == 'diario']
         
         if not arquivos_diarios:
-            logger.warning("Nenhum arquivo diário encontrado no banco. Considerando baixar apenas o dia atual ou anterior.")
-            
-            # Determinar data atual
-            hoje = datetime.datetime.now().date()
+            _LOG.warning("Nenhum arquivo diário encontrado no banco. Considerando baixar apenas o dia atual ou anterior.")
             
             # Verificar se a data atual é dia útil
-            if calendar_manager.is_trading_day(hoje):
+            if _CAL.is_trading_day(hoje):
                 # Verificar se o arquivo já está disponível (nem sempre estará no mesmo dia)
-                dia = hoje.strftime('%d')
-                mes = hoje.strftime('%m')
-                ano = hoje.strftime('%Y')
+                dia, mes, ano = _partes_data(hoje)
                 
                 disponivel, _ = verificar_arquivo_disponivel("daily", dia, mes, ano)
                 
                 if disponivel:
-                    logger.info(f"Arquivo diário para {dia}/{mes}/{ano} disponível para download")
+                    _LOG.info("Arquivo diário para %s/%s/%s disponível para download", dia, mes, ano)
                     return [(dia, mes, ano)]
                 else:
-                    logger.info(f"Arquivo diário para {dia}/{mes}/{ano} ainda não disponível")
+                    _LOG.info("Arquivo diário para %s/%s/%s ainda não disponível", dia, mes, ano)
             
             # Tentar o dia útil anterior
-            dia_anterior = calendar_manager.get_previous_trading_day(hoje)
-            dia = dia_anterior.strftime('%d')
-            mes = dia_anterior.strftime('%m')
-            ano = dia_anterior.strftime('%Y')
+            dia_anterior = _CAL.get_previous_trading_day(hoje)
+            dia, mes, ano = _partes_data(dia_anterior)
             
-            logger.info(f"Tentando baixar o dia útil anterior: {dia}/{mes}/{ano}")
+            _LOG.info("Tentando baixar o dia útil anterior: %s/%s/%s", dia, mes, ano)
             return [(dia, mes, ano)]
         
-        # Ordenar por data (assumindo nome no formato COTAHIST_D[dia][mes][ano].ZIP)
-        # Extrair a data do nome do arquivo e converter para objeto date
-        datas = []
+        # Obter a data mais recente (nome no formato COTAHIST_DDDMMAAAA.ZIP),
+        # comparando chaves AAAAMMDD como texto; só a maior vira uma data
+        ultima_chave = None
         for arquivo in arquivos_diarios:
             nome = arquivo['nome_arquivo']
             if nome.startswith('COTAHIST_D') and nome.endswith('.ZIP'):
-                try:
-                    # Extrair dia, mês e ano do nome
-                    # COTAHIST_DDDMMAAAA.ZIP
-                    #           ^^^^^^^^
-                    data_str = nome[10:18]  # Posições 10-17 (dia, mês, ano)
-                    dia = data_str[0:2]
-                    mes = data_str[2:4]
-                    ano = data_str[4:8]
-                    
-                    data = datetime.date(int(ano), int(mes), int(dia))
-                    datas.append((data, dia, mes, ano))
-                except (ValueError, IndexError) as e:
-                    logger.warning(f"Nome de arquivo {nome} não está no formato esperado: {e}")
+                # Posições 10-17: dia, mês e ano
+                if len(nome) != 22 or not nome[10:18].isdigit():
+                    _LOG.warning("Nome de arquivo %s não está no formato esperado", nome)
+                    continue
+                
+                chave = nome[14:18] + nome[12:14] + nome[10:12]
+                if ultima_chave is None or chave > ultima_chave:
+                    ultima_chave = chave
         
-        if not datas:
-            logger.warning("Não foi possível extrair datas dos nomes dos arquivos")
+        if ultima_chave is None:
+            _LOG.warning("Não foi possível extrair datas dos nomes dos arquivos")
             return []
         
-        # Ordenar por data
-        datas.sort(key=lambda x: x[0])
+        try:
+            ultima_data = datetime.date(int(ultima_chave[0:4]), int(ultima_chave[4:6]), int(ultima_chave[6:8]))
+        except ValueError as e:
+            _LOG.warning("Data inválida no arquivo diário mais recente (%s): %s", ultima_chave, e)
+            return []
         
-        # Obter a data mais recente
-        ultima_data, _, _, _ = datas[-1]
+        # Determinar datas a baixar (dias úteis entre a última data e hoje),
+        # começando no dia seguinte à última data
+        proxima_data = ultima_data + datetime.timedelta(days=1)
         
-        # Determinar datas a baixar (dias úteis entre a última data e hoje)
-        hoje = datetime.datetime.now().date()
+        # Dias de pregão de proxima_data até hoje (fins de semana e feriados são ignorados)
+        candidatos = [_partes_data(d) for d in _CAL.get_trading_days(proxima_data, hoje)]
         
-        # Ajustar última data para o dia seguinte
-        proxima_data = ultima_data + datetime.timedelta(days=1)
+        if not verificar_disponibilidade:
+            return candidatos
         
-        # Lista de datas para baixar
-        datas_para_baixar = []
+        # Verificar a disponibilidade de todos os dias de uma vez, em paralelo
+        disponiveis = set(filtrar_disponiveis(candidatos, _arquivo_diario_disponivel,
+                                              limite=_CFG.get("concurrent_downloads", 1)))
         
-        # Percorrer datas de proxima_data até hoje
-        data_atual = proxima_data
-        while data_atual <= hoje:
-            # Verificar se é dia útil na B3
-            if calendar_manager.is_trading_day(data_atual):
-                dia = data_atual.strftime('%d')
-                mes = data_atual.strftime('%m')
-                ano = data_atual.strftime('%Y')
-                
-                # Verificar se o arquivo está disponível
-                disponivel, _ = verificar_arquivo_disponivel("daily", dia, mes, ano)
-                
-                if disponivel:
-                    logger.info(f"Arquivo diário para {dia}/{mes}/{ano} disponível para download")
-                    datas_para_baixar.append((dia, mes, ano))
-                else:
-                    logger.info(f"Arquivo diário para {dia}/{mes}/{ano} ainda não disponível")
-            
-            # Avançar para o próximo dia
-            data_atual += datetime.timedelta(days=1)
+        datas_para_baixar = []
+        for dia, mes, ano in candidatos:
+            if (dia, mes, ano) in disponiveis:
+                _LOG.info("Arquivo diário para %s/%s/%s disponível para download", dia, mes, ano)
+                datas_para_baixar.append((dia, mes, ano))
+            else:
+                _LOG.info("Arquivo diário para %s/%s/%s ainda não disponível", dia, mes, ano)
         
         return datas_para_baixar
     
     except Exception as e:
-        logger.error(f"Erro ao determinar arquivos para baixar: {e}")
+        _LOG.error("Erro ao determinar arquivos para baixar: %s", e)
         return []
 
+def _baixar_periodos_concorrente(baixar, tarefas):
+    """
+    Executa downloads de períodos com o limite de simultaneidade e os
+    intervalos de espera configurados.
+    
+    Args:
+        baixar: Função que baixa um período e retorna True em caso de sucesso
+        tarefas: Lista de tuplas de argumentos, uma por período
+        
+    Returns:
+        list: Resultado de cada download, na ordem das tarefas
+    """
+    wait_min, wait_max = _CFG.get("wait_between_downloads", [3.0, 7.0])
+    limite = _CFG.get("concurrent_downloads", 1)
+    
+    return baixar_concorrente(baixar, tarefas, limite=limite, intervalo=(wait_min, wait_max))
+
+def _baixar_data(i, total, dia, mes, ano, force):
+    """
+    Baixa o arquivo de uma data para baixar_multiplos_arquivos, convertendo
+    exceções em um status de erro para não interromper os demais downloads.
+    
+    Args:
+        i: Posição da data na lista
+        total: Quantidade total de datas
+        dia: Dia (string de 2 dígitos)
+        mes: Mês (string de 2 dígitos)
+        ano: Ano (string de 4 dígitos)
+        force: Se deve forçar o download mesmo se o arquivo já existir
+        
+    Returns:
+        tuple: (status, zip_path, txt_path)
+    """
+    _LOG.info("Baixando arquivo %d/%d: %s/%s/%s", i+1, total, dia, mes, ano)
+    try:
+        return baixar_com_fallback(dia, mes, ano, force)
+    except Exception as e:
+        _LOG.error("Erro ao baixar %s/%s/%s: %s", dia, mes, ano, e)
+        return "download_error", None, None
+
 def baixar_multiplos_arquivos(datas, force=False):
     """
     Baixa múltiplos arquivos para as datas especificadas.
@@ -894,59 +1541,46 @@ def baixar_multiplos_arquivos(datas, force=False):
     Returns:
         tuple: (sucessos, falhas, nao_disponiveis, arquivos_txt)
     """
-    # Obter logger
-    logger = get_logger('b3_downloader')
-    
-    # Obter configuração
-    config_manager = get_config_manager()
-    
     # Estatísticas
     sucessos = 0
     falhas = 0
     nao_disponiveis = 0
     arquivos_txt = []
     
-    # Obter intervalos de espera
-    wait_min, wait_max = config_manager.get("wait_between_downloads", [3.0, 7.0])
+    # Downloads coordenados por asyncio: até "concurrent_downloads" simultâneos,
+    # com o início de cada download espaçado pelo limitador de taxa
+    total = len(datas)
+    tarefas = [(i, total, dia, mes, ano, force) for i, (dia, mes, ano) in enumerate(datas)]
+    resultados = _baixar_periodos_concorrente(_baixar_data, tarefas)
     
-    for i, (dia, mes, ano) in enumerate(datas):
-        logger.info(f"Baixando arquivo {i+1}/{len(datas)}: {dia}/{mes}/{ano}")
-        
-        status, zip_path, txt_path = baixar_com_fallback(dia, mes, ano, force)
-        
+    for (dia, mes, ano), (status, zip_path, txt_path) in zip(datas, resultados):
         if status == "success":
             sucessos += 1
             if txt_path:
                 arquivos_txt.append(txt_path)
-                logger.info(f"Download completo: {dia}/{mes}/{ano} -> {txt_path}")
+                _LOG.info("Download completo: %s/%s/%s -> %s", dia, mes, ano, txt_path)
             else:
-                logger.warning(f"Download completo, mas arquivo TXT não encontrado: {dia}/{mes}/{ano}")
+                _LOG.warning("Download completo, mas arquivo TXT não encontrado: %s/%s/%s", dia, mes, ano)
         elif status == "exists":
             sucessos += 1
             if txt_path:
                 arquivos_txt.append(txt_path)
-                logger.info(f"Arquivo já existe: {dia}/{mes}/{ano} -> {txt_path}")
+                _LOG.info("Arquivo já existe: %s/%s/%s -> %s", dia, mes, ano, txt_path)
             else:
-                logger.warning(f"Arquivo marcado como existente, mas TXT não encontrado: {dia}/{mes}/{ano}")
+                _LOG.warning("Arquivo marcado como existente, mas TXT não encontrado: %s/%s/%s", dia, mes, ano)
         elif status == "extract_error":
             falhas += 1
-            logger.error(f"Falha ao extrair arquivo: {dia}/{mes}/{ano}")
+            _LOG.error("Falha ao extrair arquivo: %s/%s/%s", dia, mes, ano)
         elif status == "not_available":
             nao_disponiveis += 1
-            logger.warning(f"Arquivo não disponível: {dia}/{mes}/{ano}")
+            _LOG.warning("Arquivo não disponível: %s/%s/%s", dia, mes, ano)
         else:
             falhas += 1
-            logger.error(f"Status desconhecido: {status} para {dia}/{mes}/{ano}")
-        
-        # Esperar entre downloads (exceto no último)
-        if i < len(datas) - 1:
-            wait_time = random.uniform(wait_min, wait_max)
-            logger.debug(f"Aguardando {wait_time:.2f} segundos antes do próximo download...")
-            time.sleep(wait_time)
+            _LOG.error("Status desconhecido: %s para %s/%s/%s", status, dia, mes, ano)
     
     # Resumo final
-    logger.info(f"Resumo do download: {sucessos} sucessos, {falhas} falhas, {nao_disponiveis} não disponíveis")
-    logger.info(f"Arquivos TXT disponíveis: {len(arquivos_txt)}")
+    _LOG.info("Resumo do download: %d sucessos, %d falhas, %d não disponíveis", sucessos, falhas, nao_disponiveis)
+    _LOG.info("Arquivos TXT disponíveis: %d", len(arquivos_txt))
     
     return sucessos, falhas, nao_disponiveis, arquivos_txt
 
@@ -955,53 +1589,59 @@ def baixar_arquivos_diarios(data_inicio, data_fim, force=False):
     Baixa arquivos diários em um período.
     
     Args:
-        data_inicio: Data inicial (datetime.datetime)
-        data_fim: Data final (datetime.datetime)
+        data_inicio: Data inicial (datetime.date ou datetime.datetime)
+        data_fim: Data final (datetime.date ou datetime.datetime)
         force: Se deve forçar o download mesmo se o arquivo já existir
         
     Returns:
         list: Lista de tuplas (dia, mes, ano) baixados com sucesso
     """
-    # Obter logger
-    logger = get_logger('b3_downloader')
-    
-    # Obter configuração
-    config_manager = get_config_manager()
-    
-    # Obter gerenciador de calendário
-    calendar_manager = get_calendar_manager()
+    # Trabalha apenas com datas (sem horário)
+    if isinstance(data_inicio, datetime.datetime):
+        data_inicio = data_inicio.date()
+    if isinstance(data_fim, datetime.datetime):
+        data_fim = data_fim.date()
     
-    # Verifica se as datas são objetos datetime
-    if not isinstance(data_inicio, datetime.datetime):
-        data_inicio = datetime.datetime.combine(data_inicio, datetime.datetime.min.time())
-    if not isinstance(data_fim, datetime.datetime):
-        data_fim = datetime.datetime.combine(data_fim, datetime.datetime.min.time())
+    _LOG.info(f"Preparando download de arquivos diários de {data_inicio:%d/%m/%Y} a {data_fim:%d/%m/%Y}")
     
-    logger.info(f"Preparando download de arquivos diários de {data_inicio.strftime('%d/%m/%Y')} a {data_fim.strftime('%d/%m/%Y')}")
+    # Lista de datas (dia, mes, ano) para baixar: apenas dias úteis na B3
+    datas = [_partes_data(d) for d in _CAL.get_trading_days(data_inicio, data_fim)]
     
-    # Lista de datas (dia, mes, ano) para baixar
-    datas = []
-    
-    # Percorrer datas
-    data_atual = data_inicio
-    while data_atual <= data_fim:
-        # Verificar se é dia útil na B3
-        if calendar_manager.is_trading_day(data_atual):
-            dia = data_atual.strftime('%d')
-            mes = data_atual.strftime('%m')
-            ano = data_atual.strftime('%Y')
-            datas.append((dia, mes, ano))
-        
-        # Avançar para o próximo dia
-        data_atual += datetime.timedelta(days=1)
-    
-    logger.info(f"Serão baixados até {len(datas)} arquivos diários")
+    _LOG.info(f"Serão baixados até {len(datas)} arquivos diários")
     
     # Baixar arquivos
     sucessos, falhas, nao_disponiveis, arquivos_txt = baixar_multiplos_arquivos(datas, force)
     
     return datas
 
+def _baixar_mes(mes, ano, force):
+    """
+    Baixa o arquivo mensal de um mês para baixar_arquivos_mensais.
+    
+    Args:
+        mes: Mês (string de 2 dígitos)
+        ano: Ano (string de 4 dígitos)
+        force: Se deve forçar o download mesmo se o arquivo já existir
+        
+    Returns:
+        bool: True se o arquivo foi baixado ou já existia
+    """
+    try:
+        # Uma única requisição GET, sem verificação prévia: 404 indica arquivo não disponível
+        status, zip_path, txt_path = baixar_probe_or_fetch("monthly", None, mes, ano, force)
+        
+        if status in ["success", "exists"]:
+            return True
+        
+        if status == "not_available":
+            _LOG.warning(f"Arquivo mensal para {mes}/{ano} não disponível")
+        else:
+            _LOG.error(f"Falha ao baixar arquivo mensal para {mes}/{ano}")
+    except Exception as e:
+        _LOG.error(f"Erro ao baixar arquivo mensal para {mes}/{ano}: {e}")
+    
+    return False
+
 def baixar_arquivos_mensais(mes_inicio, ano_inicio, mes_fim, ano_fim, force=False):
     """
     Baixa arquivos mensais em um período.
@@ -1016,51 +1656,48 @@ def baixar_arquivos_mensais(mes_inicio, ano_inicio, mes_fim, ano_fim, force=Fals
     Returns:
         list: Lista de tuplas (mes, ano) baixados com sucesso
     """
-    # Obter logger
-    logger = get_logger('b3_downloader')
-    
-    logger.info(f"Preparando download de arquivos mensais de {mes_inicio:02d}/{ano_inicio} a {mes_fim:02d}/{ano_fim}")
+    _LOG.info(f"Preparando download de arquivos mensais de {mes_inicio:02d}/{ano_inicio} a {mes_fim:02d}/{ano_fim}")
     
-    # Lista de meses (mes, ano) para baixar
-    meses = []
+    # Lista de meses (mes, ano) para baixar, numerando os meses como ano * 12 + (mes - 1)
+    meses = [
+        (f"{indice % 12 + 1:02d}", str(indice // 12))
+        for indice in range(ano_inicio * 12 + mes_inicio - 1, ano_fim * 12 + mes_fim)
+    ]
     
-    # Percorrer meses
-    ano_atual = ano_inicio
-    mes_atual = mes_inicio
+    _LOG.info(f"Serão baixados até {len(meses)} arquivos mensais")
     
-    while ano_atual < ano_fim or (ano_atual == ano_fim and mes_atual <= mes_fim):
-        meses.append((f"{mes_atual:02d}", f"{ano_atual}"))
-        
-        # Avançar para o próximo mês
-        mes_atual += 1
-        if mes_atual > 12:
-            mes_atual = 1
-            ano_atual += 1
-    
-    logger.info(f"Serão baixados até {len(meses)} arquivos mensais")
+    # Baixar os meses em paralelo, como em baixar_multiplos_arquivos
+    resultados = _baixar_periodos_concorrente(_baixar_mes, [(mes, ano, force) for mes, ano in meses])
     
     # Sucessos (lista de tuplas mes, ano)
-    sucessos_meses = []
+    return [mes_ano for mes_ano, ok in zip(meses, resultados) if ok]
+
+def _baixar_ano(ano, force):
+    """
+    Baixa o arquivo anual de um ano para baixar_arquivos_anuais.
     
-    # Baixar arquivos mês a mês
-    for mes, ano in meses:
-        # Obter o último dia do mês para verificar
-        ultimo_dia = str(calendar.monthrange(int(ano), int(mes))[1]).zfill(2)
+    Args:
+        ano: Ano (string de 4 dígitos)
+        force: Se deve forçar o download mesmo se o arquivo já existir
         
-        disponivel, _ = verificar_arquivo_disponivel("monthly", None, mes, ano)
+    Returns:
+        bool: True se o arquivo foi baixado ou já existia
+    """
+    try:
+        # Uma única requisição GET, sem verificação prévia: 404 indica arquivo não disponível
+        status, zip_path, txt_path = baixar_probe_or_fetch("yearly", None, None, ano, force)
         
-        if disponivel:
-            # Baixar o arquivo
-            status, zip_path, txt_path = baixar_com_fallback(ultimo_dia, mes, ano, force)
-            
-            if status in ["success", "exists"]:
-                sucessos_meses.append((mes, ano))
-            else:
-                logger.error(f"Falha ao baixar arquivo mensal para {mes}/{ano}")
+        if status in ["success", "exists"]:
+            return True
+        
+        if status == "not_available":
+            _LOG.warning(f"Arquivo anual para {ano} não disponível")
         else:
-            logger.warning(f"Arquivo mensal para {mes}/{ano} não disponível")
+            _LOG.error(f"Falha ao baixar arquivo anual para {ano}")
+    except Exception as e:
+        _LOG.error(f"Erro ao baixar arquivo anual para {ano}: {e}")
     
-    return sucessos_meses
+    return False
 
 def baixar_arquivos_anuais(ano_inicio, ano_fim, force=False):
     """
@@ -1074,37 +1711,19 @@ def baixar_arquivos_anuais(ano_inicio, ano_fim, force=False):
     Returns:
         list: Lista de anos baixados com sucesso
     """
-    # Obter logger
-    logger = get_logger('b3_downloader')
-    
-    logger.info(f"Preparando download de arquivos anuais de {ano_inicio} a {ano_fim}")
+    _LOG.info(f"Preparando download de arquivos anuais de {ano_inicio} a {ano_fim}")
     
     # Lista de anos para baixar
     anos = list(range(ano_inicio, ano_fim + 1))
     
-    logger.info(f"Serão baixados até {len(anos)} arquivos anuais")
+    _LOG.info(f"Serão baixados até {len(anos)} arquivos anuais")
     
-    # Sucessos (lista de anos)
-    sucessos_anos = []
+    # Baixar os anos em paralelo, como em baixar_multiplos_arquivos
+    anos_str = [str(ano) for ano in anos]
+    resultados = _baixar_periodos_concorrente(_baixar_ano, [(ano, force) for ano in anos_str])
     
-    # Baixar arquivos ano a ano
-    for ano in anos:
-        ano_str = str(ano)
-        
-        disponivel, _ = verificar_arquivo_disponivel("yearly", None, None, ano_str)
-        
-        if disponivel:
-            # Baixar o arquivo
-            status, zip_path, txt_path = baixar_com_fallback("31", "12", ano_str, force)
-            
-            if status in ["success", "exists"]:
-                sucessos_anos.append(ano_str)
-            else:
-                logger.error(f"Falha ao baixar arquivo anual para {ano}")
-        else:
-            logger.warning(f"Arquivo anual para {ano} não disponível")
-    
-    return sucessos_anos
+    # Sucessos (lista de anos)
+    return [ano for ano, ok in zip(anos_str, resultados) if ok]
 
 def inicializar():
     """
@@ -6,6 +6,7 @@ Fornece configuração consistente para todos os loggers do sistema e suporte a
 import logging
 import sys
 import os
+import threading
 from logging.handlers import RotatingFileHandler
 from typing import Optional
 
@@ -27,6 +28,11 @@ class LoggingManager:
     # Dicionário para rastreamento de loggers já configurados
     _loggers = {}
     
+    # Protege a configuração de loggers chamada por várias threads de download.
+    # Reentrante porque setup() registra o evento no logger 'system', que
+    # pode precisar ser configurado na mesma chamada.
+    _lock = threading.RLock()
+    
     @classmethod
     def setup(cls, log_name: str, 
               log_dir: Optional[str] = None, 
@@ -48,10 +54,35 @@ class LoggingManager:
         Returns:
             Logger configurado
         """
-        # Se o logger já foi configurado, retorna a instância
-        if log_name in cls._loggers:
-            return cls._loggers[log_name]
+        # Se o logger já foi configurado, retorna a instância (sem travar)
+        logger = cls._loggers.get(log_name)
+        if logger is not None:
+            return logger
+        
+        with cls._lock:
+            # Outra thread pode ter configurado o logger enquanto esperávamos
+            if log_name in cls._loggers:
+                return cls._loggers[log_name]
+            
+            return cls._setup_locked(log_name, log_dir, console, file, level, format_str)
+    
+    @classmethod
+    def _setup_locked(cls, log_name: str, log_dir: Optional[str], console: bool,
+                      file: bool, level: Optional[int], format_str: Optional[str]) -> logging.Logger:
+        """
+        Cria os handlers de um logger. Deve ser chamada com _lock adquirido.
         
+        Args:
+            log_name: Nome do logger
+            log_dir: Diretório para armazenar os logs
+            console: Se True, adiciona um handler para saída no console
+            file: Se True, adiciona um handler para saída em arquivo
+            level: Nível de logging (se None, usa DEFAULT_LOG_LEVEL)
+            format_str: String de formatação para as mensagens de log
+            
+        Returns:
+            Logger configurado
+        """
         # Usa valores padrão se não especificados
         if log_dir is None:
             log_dir = cls.DEFAULT_LOG_DIR
@@ -64,13 +95,9 @@ class LoggingManager:
         logger = logging.getLogger(log_name)
         logger.setLevel(level)
         
-        # Remove handlers existentes para evitar duplicação
-        # Aqui é onde precisamos fechar os handlers antes de removê-los
-        if logger.handlers:
-            for handler in logger.handlers:
-                # Certifique-se de fechar o handler para liberar os recursos
-                handler.close()
-            logger.handlers.clear()
+        # Remove handlers existentes para evitar duplicação, fechando-os
+        # (e liberando o arquivo) antes de removê-los
+        cls._fechar_handlers(logger)
         
         # Cria um formatador
         formatter = logging.Formatter(format_str)
@@ -141,23 +168,11 @@ class LoggingManager:
             message: Mensagem a ser registrada
             level: Nível de logging para a mensagem
         """
-        # Configura o logger do sistema se ainda não existir
-        if 'system' not in cls._loggers:
-            cls.setup('system', console=False)
-        
-        logger = cls._loggers['system']
+        # Configura o logger do sistema se ainda não existir (setup retorna o já configurado)
+        logger = cls.setup('system', console=False)
         
         # Registra a mensagem no nível apropriado
-        if level == logging.DEBUG:
-            logger.debug(message)
-        elif level == logging.INFO:
-            logger.info(message)
-        elif level == logging.WARNING:
-            logger.warning(message)
-        elif level == logging.ERROR:
-            logger.error(message)
-        elif level == logging.CRITICAL:
-            logger.critical(message)
+        logger.log(level, message)
     
     @classmethod
     def setup_download_logger(cls) -> logging.Logger:
@@ -230,16 +245,32 @@ class LoggingManager:
         Fecha e limpa todos os loggers.
         Útil para testes e para garantir que recursos sejam liberados.
         """
-        for name, logger in cls._loggers.items():
-            if hasattr(logger, 'handlers'):
-                for handler in logger.handlers:
-                    # Certifique-se de fechar o handler para liberar recursos
-                    if hasattr(handler, 'close'):
-                        handler.close()
-                logger.handlers.clear()
+        with cls._lock:
+            for name, logger in cls._loggers.items():
+                cls._fechar_handlers(logger)
+            
+            # Limpa o dicionário de loggers
+            cls._loggers.clear()
+    
+    @staticmethod
+    def _fechar_handlers(logger: logging.Logger) -> None:
+        """
+        Esvazia, fecha e remove todos os handlers de um logger.
         
-        # Limpa o dicionário de loggers
-        cls._loggers.clear()
+        Args:
+            logger: Logger cujos handlers serão removidos
+        """
+        for handler in list(logger.handlers):
+            handler.acquire()
+            try:
+                handler.flush()
+                handler.close()
+                # Garante que um FileHandler não mantenha o arquivo aberto
+                if isinstance(handler, logging.FileHandler):
+                    handler.stream = None
+            finally:
+                handler.release()
+            logger.removeHandler(handler)
 
 
 # Funções de conveniência para facilitar o uso
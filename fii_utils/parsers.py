@@ -3,7 +3,10 @@ import re
 import logging
 import traceback
 import sys
-from datetime import datetime, timedelta
+import calendar
+from datetime import datetime
+from array import array
+from functools import lru_cache
 from typing import Dict, Optional, List, Tuple
 from multiprocessing import current_process
 
@@ -14,11 +17,18 @@ class ArquivoCotacao:
     """
     Classe que representa um arquivo de cotação da B3, identificando seu tipo
     e período de dados com base no nome do arquivo.
+    
+    As instâncias são imutáveis após a criação, o que permite compartilhá-las
+    pelo cache de arquivo_cotacao().
     """
-    # Padrões de regex para os diferentes formatos de arquivo
-    PADRAO_ANUAL = re.compile(r'COTAHIST_A(\d{4})\.(TXT|ZIP)')
-    PADRAO_DIARIO = re.compile(r'COTAHIST_D(\d{2})(\d{2})(\d{4})\.(TXT|ZIP)')
-    PADRAO_MENSAL = re.compile(r'COTAHIST_M(\d{2})(\d{4})\.(TXT|ZIP)')
+    # Padrão de regex único para os formatos de arquivo (anual, diário e mensal),
+    # compilado uma vez na carga da classe; re.ASCII restringe \d aos dígitos 0-9
+    PADRAO_NOME = re.compile(
+        r'COTAHIST_(?:A(?P<ano_a>\d{4})'
+        r'|D(?P<dia_d>\d{2})(?P<mes_d>\d{2})(?P<ano_d>\d{4})'
+        r'|M(?P<mes_m>\d{2})(?P<ano_m>\d{4}))\.(TXT|ZIP)',
+        re.ASCII
+    )
     
     def __init__(self, caminho_arquivo: str):
         self.caminho = caminho_arquivo
@@ -31,120 +41,195 @@ class ArquivoCotacao:
         self.data_fim = None
         self.extensao = os.path.splitext(caminho_arquivo)[1].upper()  # .TXT ou .ZIP
         self._analisar_nome_arquivo()
+        self._congelado = True
+    
+    def __setattr__(self, nome, valor):
+        if getattr(self, '_congelado', False):
+            raise AttributeError(f"ArquivoCotacao é imutável: não é possível alterar '{nome}'")
+        super().__setattr__(nome, valor)
     
     def _analisar_nome_arquivo(self):
         """Analisa o nome do arquivo para determinar seu tipo e período."""
-        # Verifica se é arquivo anual
-        match = self.PADRAO_ANUAL.match(self.nome_arquivo)
-        if match:
-            ano = int(match.group(1))
-            self.tipo = 'anual'
-            self.ano = ano
-            self.data_inicio = datetime(ano, 1, 1)
-            self.data_fim = datetime(ano, 12, 31)
-            return
+        nome = self.nome_arquivo
         
-        # Verifica se é arquivo diário
-        match = self.PADRAO_DIARIO.match(self.nome_arquivo)
-        if match:
-            dia = int(match.group(1))
-            mes = int(match.group(2))
-            ano = int(match.group(3))
-            self.tipo = 'diario'
-            self.dia = dia
-            self.mes = mes
-            self.ano = ano
-            self.data_inicio = self.data_fim = datetime(ano, mes, dia)
-            return
+        # Caminho rápido: o tipo é o caractere após 'COTAHIST_' (A, D ou M) e os
+        # campos têm posições fixas, dispensando as expressões regulares. Como no
+        # padrão regex, só dígitos ASCII são aceitos
+        if nome.startswith('COTAHIST_') and nome.isascii():
+            tipo = nome[9:10]
+            if tipo == 'A' and nome[10:14].isdecimal() and nome[14:18] in ('.TXT', '.ZIP'):
+                self._definir_anual(int(nome[10:14]))
+                return
+            if tipo == 'D' and nome[10:18].isdecimal() and nome[18:22] in ('.TXT', '.ZIP'):
+                self._definir_diario(int(nome[10:12]), int(nome[12:14]), int(nome[14:18]))
+                return
+            if tipo == 'M' and nome[10:16].isdecimal() and nome[16:20] in ('.TXT', '.ZIP'):
+                self._definir_mensal(int(nome[10:12]), int(nome[12:16]))
+                return
         
-        # Verifica se é arquivo mensal
-        match = self.PADRAO_MENSAL.match(self.nome_arquivo)
+        # O padrão regex valida os nomes fora do formato usual, em uma única busca;
+        # o grupo preenchido indica o tipo do arquivo
+        match = self.PADRAO_NOME.match(nome)
         if match:
-            mes = int(match.group(1))
-            ano = int(match.group(2))
-            self.tipo = 'mensal'
-            self.mes = mes
-            self.ano = ano
-            self.data_inicio = datetime(ano, mes, 1)
-            
-            # Determina o último dia do mês
-            if mes == 12:
-                self.data_fim = datetime(ano, 12, 31)
+            if match.group('ano_a') is not None:
+                self._definir_anual(int(match.group('ano_a')))
+            elif match.group('ano_d') is not None:
+                self._definir_diario(int(match.group('dia_d')), int(match.group('mes_d')), int(match.group('ano_d')))
             else:
-                next_month = datetime(ano, mes + 1, 1)
-                self.data_fim = next_month - timedelta(days=1)
+                self._definir_mensal(int(match.group('mes_m')), int(match.group('ano_m')))
             return
         
         # Se não corresponder a nenhum padrão
-        raise ValueError(f"Formato de nome de arquivo não reconhecido: {self.nome_arquivo}")
+        raise ValueError(f"Formato de nome de arquivo não reconhecido: {nome}")
+    
+    def _definir_anual(self, ano: int):
+        """Define o tipo e o período de um arquivo anual."""
+        self.tipo = 'anual'
+        self.ano = ano
+        self.data_inicio = datetime(ano, 1, 1)
+        self.data_fim = datetime(ano, 12, 31)
+    
+    def _definir_diario(self, dia: int, mes: int, ano: int):
+        """Define o tipo e o período de um arquivo diário."""
+        self.tipo = 'diario'
+        self.dia = dia
+        self.mes = mes
+        self.ano = ano
+        self.data_inicio = self.data_fim = datetime(ano, mes, dia)
+    
+    def _definir_mensal(self, mes: int, ano: int):
+        """Define o tipo e o período de um arquivo mensal."""
+        self.tipo = 'mensal'
+        self.mes = mes
+        self.ano = ano
+        self.data_inicio = datetime(ano, mes, 1)
+        
+        # Determina o último dia do mês (considerando anos bissextos)
+        self.data_fim = datetime(ano, mes, calendar.monthrange(ano, mes)[1])
     
     def __str__(self):
         return f"{self.nome_arquivo} ({self.tipo}: {self.data_inicio.strftime('%d/%m/%Y')} a {self.data_fim.strftime('%d/%m/%Y')})"
 
 
+@lru_cache(maxsize=4096)
+def arquivo_cotacao(caminho_arquivo: str) -> ArquivoCotacao:
+    """
+    Retorna o ArquivoCotacao de um caminho, reaproveitando o objeto já criado
+    para o mesmo caminho (ex: em varreduras repetidas do diretório de dados).
+    
+    Args:
+        caminho_arquivo: Caminho completo do arquivo de cotações
+        
+    Returns:
+        Objeto ArquivoCotacao do arquivo
+        
+    Raises:
+        ValueError: Se o nome do arquivo não está em um formato reconhecido
+    """
+    return ArquivoCotacao(caminho_arquivo)
+
+
+# Posições (base 0, fim exclusivo) dos campos usados do registro tipo 01 (cotações),
+# como constantes de módulo para não consultar o dicionário de campos a cada linha
+_TIPO_REGISTRO_INI, _TIPO_REGISTRO_FIM = 0, 2
+_DATA_PREGAO_INI, _DATA_PREGAO_FIM = 2, 10
+_CODBDI_INI, _CODBDI_FIM = 10, 12
+_CODIGO_INI, _CODIGO_FIM = 12, 24
+_ABERTURA_INI, _ABERTURA_FIM = 56, 69
+_MAXIMO_INI, _MAXIMO_FIM = 69, 82
+_MINIMO_INI, _MINIMO_FIM = 82, 95
+_ULTIMO_INI, _ULTIMO_FIM = 108, 121
+_NEGOCIOS_INI, _NEGOCIOS_FIM = 147, 152
+_QUANTIDADE_INI, _QUANTIDADE_FIM = 152, 170
+_VOLUME_INI, _VOLUME_FIM = 170, 188
+
+# Tamanho mínimo de uma linha compatível com o layout
+_TAMANHO_MINIMO_LINHA = 245
+
+# Codificação dos arquivos de cotações históricas da B3 (campos de texto)
+_CODIFICACAO = 'iso-8859-1'
+
+# Tamanho das leituras de trechos de arquivo (ver ler_trecho)
+_BLOCO_LEITURA = 4 * 1024 * 1024
+
+
+def _eh_cotacao_fii(linha: bytes) -> bool:
+    """
+    Verifica se a linha é compatível com o layout, se o código BDI é de fundo
+    imobiliário (12) e se é um registro de cotação (tipo 01). Cada byte é
+    comparado como inteiro ('0' = 48, '1' = 49, '2' = 50), sem criar fatias,
+    e o BDI vem primeiro por rejeitar quase todas as linhas.
+    
+    Args:
+        linha: Linha (bytes) do arquivo de cotações
+        
+    Returns:
+        True se a linha for uma cotação de fundo imobiliário
+    """
+    return (len(linha) >= _TAMANHO_MINIMO_LINHA
+            and linha[10] == 49 and linha[11] == 50
+            and linha[0] == 48 and linha[1] == 49)
+
+
 class CotacaoParser:
     """
     Classe responsável por fazer o parsing de registros de cotação
     do arquivo de cotações históricas da B3.
+    
+    Não guarda estado por instância: as posições dos campos são fixas.
     """
     
-    def __init__(self):
-        # Mapeamento das posições dos campos no registro tipo 01 (cotações)
-        # Os índices são ajustados para base 0 em Python (diferente do layout que começa em 1)
-        self.campos = {
-            'tipo_registro': (0, 2),
-            'data_pregao': (2, 10),
-            'codbdi': (10, 12),
-            'codigo_negociacao': (12, 24),
-            'tipo_mercado': (24, 27),
-            'nome_empresa': (27, 39),
-            'especificacao': (39, 49),
-            'preco_abertura': (56, 69),
-            'preco_maximo': (69, 82),
-            'preco_minimo': (82, 95),
-            'preco_medio': (95, 108),  # Mantemos a referência para o campo, mas não o utilizaremos
-            'preco_ultimo': (108, 121),
-            'preco_melhor_oferta_compra': (121, 134),
-            'preco_melhor_oferta_venda': (134, 147),
-            'numero_negocios': (147, 152),
-            'quantidade_papeis_negociados': (152, 170),
-            'volume_total': (170, 188)
-        }
+    __slots__ = ()
     
-    def parse_linha(self, linha: str) -> Optional[Dict]:
+    # Mapeamento das posições dos campos no registro tipo 01 (cotações)
+    # Os índices são ajustados para base 0 em Python (diferente do layout que começa em 1)
+    campos = {
+        'tipo_registro': (_TIPO_REGISTRO_INI, _TIPO_REGISTRO_FIM),
+        'data_pregao': (_DATA_PREGAO_INI, _DATA_PREGAO_FIM),
+        'codbdi': (_CODBDI_INI, _CODBDI_FIM),
+        'codigo_negociacao': (_CODIGO_INI, _CODIGO_FIM),
+        'tipo_mercado': (24, 27),
+        'nome_empresa': (27, 39),
+        'especificacao': (39, 49),
+        'preco_abertura': (_ABERTURA_INI, _ABERTURA_FIM),
+        'preco_maximo': (_MAXIMO_INI, _MAXIMO_FIM),
+        'preco_minimo': (_MINIMO_INI, _MINIMO_FIM),
+        'preco_medio': (95, 108),  # Mantemos a referência para o campo, mas não o utilizaremos
+        'preco_ultimo': (_ULTIMO_INI, _ULTIMO_FIM),
+        'preco_melhor_oferta_compra': (121, 134),
+        'preco_melhor_oferta_venda': (134, 147),
+        'numero_negocios': (_NEGOCIOS_INI, _NEGOCIOS_FIM),
+        'quantidade_papeis_negociados': (_QUANTIDADE_INI, _QUANTIDADE_FIM),
+        'volume_total': (_VOLUME_INI, _VOLUME_FIM)
+    }
+    
+    def parse_linha(self, linha: bytes) -> Optional[Dict]:
         """
         Analisa uma linha do arquivo e extrai os campos relevantes
         se for um registro do tipo 01 (cotações) e for um fundo imobiliário.
-        """
-        # Verifica se o tamanho da linha é compatível com o layout
-        if len(linha) < 245:
-            return None
         
-        # Verifica se é um registro de cotação (tipo 01)
-        tipo_registro = linha[self.campos['tipo_registro'][0]:self.campos['tipo_registro'][1]].strip()
-        if tipo_registro != '01':
-            return None
-        
-        # Extrai o código BDI para verificar se é fundo imobiliário (12)
-        codbdi = linha[self.campos['codbdi'][0]:self.campos['codbdi'][1]].strip()
-        if codbdi != '12':
+        A linha é mantida como bytes (arquivo lido em modo binário); apenas os
+        campos de texto dos registros aceitos são decodificados.
+        """
+        # Apenas registros tipo 01 (cotações) de fundos imobiliários (BDI 12)
+        if not _eh_cotacao_fii(linha):
             return None
         
-        # Extrai os demais campos relevantes
-        data_str = linha[self.campos['data_pregao'][0]:self.campos['data_pregao'][1]].strip()
-        data = datetime.strptime(data_str, '%Y%m%d').strftime('%Y-%m-%d')
+        # Extrai os demais campos relevantes; a data AAAAMMDD só precisa dos hífens
+        d = _DATA_PREGAO_INI
+        data = (linha[d:d + 4] + b'-' + linha[d + 4:d + 6] + b'-' + linha[d + 6:d + 8]).decode('ascii')
         
-        codigo = linha[self.campos['codigo_negociacao'][0]:self.campos['codigo_negociacao'][1]].strip()
+        codigo = linha[_CODIGO_INI:_CODIGO_FIM].strip().decode(_CODIFICACAO)
         
         # Converte os valores monetários (formato (11)V99 significa 11 dígitos inteiros e 2 decimais)
         try:
-            preco_abertura = self._parse_valor_monetario(linha[self.campos['preco_abertura'][0]:self.campos['preco_abertura'][1]])
-            preco_maximo = self._parse_valor_monetario(linha[self.campos['preco_maximo'][0]:self.campos['preco_maximo'][1]])
-            preco_minimo = self._parse_valor_monetario(linha[self.campos['preco_minimo'][0]:self.campos['preco_minimo'][1]])
-            preco_ultimo = self._parse_valor_monetario(linha[self.campos['preco_ultimo'][0]:self.campos['preco_ultimo'][1]])
-            volume_total = self._parse_valor_monetario(linha[self.campos['volume_total'][0]:self.campos['volume_total'][1]])
-            qtd_negocios = int(linha[self.campos['numero_negocios'][0]:self.campos['numero_negocios'][1]].strip() or '0')
-            qtd_papeis = int(linha[self.campos['quantidade_papeis_negociados'][0]:self.campos['quantidade_papeis_negociados'][1]].strip() or '0')
+            preco_abertura = self._parse_valor_monetario(linha[_ABERTURA_INI:_ABERTURA_FIM])
+            preco_maximo = self._parse_valor_monetario(linha[_MAXIMO_INI:_MAXIMO_FIM])
+            preco_minimo = self._parse_valor_monetario(linha[_MINIMO_INI:_MINIMO_FIM])
+            preco_ultimo = self._parse_valor_monetario(linha[_ULTIMO_INI:_ULTIMO_FIM])
+            volume_total = self._parse_valor_monetario(linha[_VOLUME_INI:_VOLUME_FIM])
+            qtd_negocios = self._parse_inteiro(linha[_NEGOCIOS_INI:_NEGOCIOS_FIM])
+            qtd_papeis = self._parse_inteiro(linha[_QUANTIDADE_INI:_QUANTIDADE_FIM])
         except ValueError as e:
             logger = get_logger('FIIDatabase')
             logger.error(f"Erro ao converter valores para o código {codigo} na data {data}: {e}")
@@ -162,28 +247,112 @@ class CotacaoParser:
             'quantidade': qtd_papeis
         }
     
-    def _parse_valor_monetario(self, valor_str: str) -> float:
+    def parse_linhas(self, linhas: List[bytes]) -> List[Tuple]:
+        """
+        Analisa um lote de linhas e retorna um registro (tupla) por cotação.
+        
+        Args:
+            linhas: Lista de linhas (bytes) do arquivo de cotações
+            
+        Returns:
+            Lista de tuplas (data, codigo, abertura, maxima, minima, fechamento,
+            volume, negocios, quantidade)
+        """
+        return list(zip(*self.parse_colunas(linhas)))
+    
+    def parse_colunas(self, linhas: List[bytes]) -> Tuple:
+        """
+        Analisa um lote de linhas campo a campo: cada campo é extraído de todas
+        as linhas em uma única passada, sem montar um dicionário por registro.
+        
+        Linhas que não são cotações de fundos imobiliários são descartadas. Se
+        algum valor do lote não puder ser convertido diretamente (ex: campo
+        numérico em branco), o lote é analisado linha a linha com parse_linha,
+        que trata esses casos.
+        
+        Os campos numéricos são retornados em arrays de tipo fixo, que ocupam
+        menos memória e são serializados entre processos como blocos de bytes.
+        
+        Args:
+            linhas: Lista de linhas (bytes) do arquivo de cotações
+            
+        Returns:
+            Tupla de colunas (data, codigo, abertura, maxima, minima, fechamento,
+            volume, negocios, quantidade): listas de str para data e codigo,
+            array('d') para os valores monetários e array('q') para negocios
+            e quantidade
+        """
+        # Apenas registros tipo 01 (cotações) de fundos imobiliários (BDI 12)
+        linhas = [l for l in linhas if _eh_cotacao_fii(l)]
+        
+        # Formato (11)V99: o inteiro dividido por 100 é o mesmo float que
+        # _parse_valor_monetario obtém inserindo o ponto decimal
+        d = _DATA_PREGAO_INI
+        try:
+            return (
+                [(l[d:d + 4] + b'-' + l[d + 4:d + 6] + b'-' + l[d + 6:d + 8]).decode('ascii') for l in linhas],
+                [l[_CODIGO_INI:_CODIGO_FIM].strip().decode(_CODIFICACAO) for l in linhas],
+                array('d', [int(l[_ABERTURA_INI:_ABERTURA_FIM]) / 100 for l in linhas]),
+                array('d', [int(l[_MAXIMO_INI:_MAXIMO_FIM]) / 100 for l in linhas]),
+                array('d', [int(l[_MINIMO_INI:_MINIMO_FIM]) / 100 for l in linhas]),
+                array('d', [int(l[_ULTIMO_INI:_ULTIMO_FIM]) / 100 for l in linhas]),
+                array('d', [int(l[_VOLUME_INI:_VOLUME_FIM]) / 100 for l in linhas]),
+                array('q', [int(l[_NEGOCIOS_INI:_NEGOCIOS_FIM]) for l in linhas]),
+                array('q', [int(l[_QUANTIDADE_INI:_QUANTIDADE_FIM]) for l in linhas])
+            )
+        except ValueError:
+            # Algum campo fora do padrão: linha a linha, descartando apenas as linhas inválidas
+            registros = [registro for registro in map(self.parse_linha, linhas) if registro]
+            return (
+                [r['data'] for r in registros],
+                [r['codigo'] for r in registros],
+                array('d', [r['abertura'] for r in registros]),
+                array('d', [r['maxima'] for r in registros]),
+                array('d', [r['minima'] for r in registros]),
+                array('d', [r['fechamento'] for r in registros]),
+                array('d', [r['volume'] for r in registros]),
+                array('q', [r['negocios'] for r in registros]),
+                array('q', [r['quantidade'] for r in registros])
+            )
+    
+    def _parse_valor_monetario(self, valor_str: bytes) -> float:
         """
         Converte o valor monetário do formato da B3 para float.
         O formato (11)V99 significa 11 dígitos inteiros e 2 decimais,
         sem o ponto decimal explícito no arquivo.
-        """
-        valor_str = valor_str.strip()
-        if not valor_str:
-            return 0.0
         
-        # Remove zeros à esquerda
-        valor_str = valor_str.lstrip('0')
-        if not valor_str:
+        A conversão dos dígitos é feita por int() e a divisão por 100 (ambas
+        em C e corretamente arredondadas), sem remover zeros nem montar a
+        string com o ponto decimal.
+        """
+        try:
+            return int(valor_str) / 100
+        except ValueError:
+            # Campo em branco vale zero; qualquer outro conteúdo é inválido
+            if valor_str.strip():
+                raise
             return 0.0
+    
+    def _parse_inteiro(self, valor_str: bytes) -> int:
+        """
+        Converte um campo numérico inteiro (ex: quantidade de negócios) para int.
         
-        # Converte para float, considerando os 2 últimos dígitos como decimais
-        if len(valor_str) == 1:
-            return float(f"0.0{valor_str}")
-        elif len(valor_str) == 2:
-            return float(f"0.{valor_str}")
-        else:
-            return float(f"{valor_str[:-2]}.{valor_str[-2:]}")
+        Os campos têm largura fixa e vêm preenchidos com zeros à esquerda, então
+        int() converte a fatia diretamente; o strip() só é feito para reconhecer
+        um campo em branco, que vale zero.
+        """
+        try:
+            return int(valor_str)
+        except ValueError:
+            if valor_str.strip():
+                raise
+            return 0
+
+
+# Logger do processo atual e o PID para o qual foi configurado (um processo
+# criado por fork herda os valores do processo pai)
+_PROC_LOGGER: Optional[logging.Logger] = None
+_PROC_LOGGER_PID: Optional[int] = None
 
 
 def _configurar_logger_processo() -> logging.Logger:
@@ -192,11 +361,18 @@ def _configurar_logger_processo() -> logging.Logger:
     
     Em um ambiente multiprocesso, cada processo precisa de seu próprio logger
     configurado de forma apropriada para evitar problemas de concorrência.
+    A configuração é feita uma vez por processo; as chamadas seguintes (um
+    worker processa vários chunks) reaproveitam o logger.
     
     Returns:
         logging.Logger: Logger configurado para o processo atual
     """
+    global _PROC_LOGGER, _PROC_LOGGER_PID
+    
     proc_id = current_process().pid
+    if _PROC_LOGGER is not None and _PROC_LOGGER_PID == proc_id:
+        return _PROC_LOGGER
+    
     proc_name = current_process().name
     logger_name = f"FIIChunkProcess-{proc_id}"
     
@@ -211,53 +387,38 @@ def _configurar_logger_processo() -> logging.Logger:
     # Registra o início do trabalho deste processo
     proc_logger.info(f"Processo {proc_name} (PID {proc_id}) iniciado")
     
+    _PROC_LOGGER, _PROC_LOGGER_PID = proc_logger, proc_id
     return proc_logger
 
 
-def processar_chunk(dados_chunk: Tuple[List[str], CotacaoParser]) -> List[Tuple]:
+def processar_chunk(dados_chunk: Tuple[List[bytes], CotacaoParser]) -> Tuple:
     """
     Função auxiliar para processar um chunk de linhas em um processo separado.
     Deve ser definida no escopo global para permitir o uso com ProcessPoolExecutor.
     
     Args:
         dados_chunk: Tupla (linhas, parser) onde:
-            - linhas: Lista de strings contendo as linhas do arquivo a processar
+            - linhas: Lista de linhas (bytes) do arquivo a processar
             - parser: Objeto CotacaoParser para processar as linhas
             
     Returns:
-        Lista de tuplas com os dados dos registros processados
+        Colunas dos registros processados (ver CotacaoParser.parse_colunas), que
+        voltam ao processo principal sem uma tupla por registro, ou tupla vazia
+        em caso de erro
     """
     # Configuração do logger específica para este processo
     proc_logger = _configurar_logger_processo()
     
     linhas, parser = dados_chunk
-    registros = []
     
     try:
         proc_logger.info(f"Iniciando processamento de chunk com {len(linhas)} linhas")
         
-        # Processa as linhas do chunk
-        for i, linha in enumerate(linhas):
-            registro = parser.parse_linha(linha)
-            if registro:
-                registros.append((
-                    registro['data'],
-                    registro['codigo'],
-                    registro['abertura'],
-                    registro['maxima'],
-                    registro['minima'],
-                    registro['fechamento'],
-                    registro['volume'],
-                    registro['negocios'],
-                    registro['quantidade']
-                ))
-            
-            # Log de progresso a cada 10.000 linhas
-            if i > 0 and i % 10000 == 0:
-                proc_logger.info(f"Processadas {i}/{len(linhas)} linhas, encontrados {len(registros)} registros de FIIs")
+        # Processa as linhas do chunk campo a campo
+        colunas = parser.parse_colunas(linhas)
         
-        proc_logger.info(f"Processamento de chunk concluído. Extraídos {len(registros)} registros de FIIs")
-        return registros
+        proc_logger.info(f"Processamento de chunk concluído. Extraídos {len(colunas[0])} registros de FIIs")
+        return colunas
         
     except Exception as e:
         # Captura e registra qualquer exceção para evitar falhas silenciosas
@@ -273,6 +434,99 @@ def processar_chunk(dados_chunk: Tuple[List[str], CotacaoParser]) -> List[Tuple]
             print(f"ERRO CRÍTICO NO PROCESSO {current_process().pid}: {error_msg}", file=sys.stderr)
             print(stack_trace, file=sys.stderr)
         
-        # Retorna lista vazia em caso de erro para não interromper todo o processamento
+        # Retorna tupla vazia em caso de erro para não interromper todo o processamento
         # O processo principal deve verificar e lidar com chunks vazios
-        return []
\ No newline at end of file
+        return ()
+
+
+def dividir_arquivo(caminho: str, tamanho_trecho: int) -> List[Tuple[int, int]]:
+    """
+    Divide um arquivo em trechos de aproximadamente tamanho_trecho bytes,
+    terminando cada trecho no fim de uma linha.
+    
+    Args:
+        caminho: Caminho do arquivo
+        tamanho_trecho: Tamanho aproximado de cada trecho em bytes
+        
+    Returns:
+        Lista de tuplas (inicio, fim) com as posições em bytes de cada trecho
+    """
+    tamanho = os.path.getsize(caminho)
+    trechos = []
+    inicio = 0
+    
+    with open(caminho, 'rb') as arquivo:
+        while inicio < tamanho:
+            # Avança até o fim da linha em que o trecho terminaria
+            arquivo.seek(min(inicio + tamanho_trecho, tamanho))
+            arquivo.readline()
+            fim = min(arquivo.tell(), tamanho)
+            
+            trechos.append((inicio, fim))
+            inicio = fim
+    
+    return trechos
+
+
+def ler_trecho(caminho: str, inicio: int, fim: int) -> bytes:
+    """
+    Lê um trecho de um arquivo com leituras posicionais (pread) em blocos grandes,
+    sem buffer intermediário do Python. Em sistemas que suportam, avisa antes o
+    kernel para antecipar a leitura do trecho inteiro (readahead).
+    
+    Args:
+        caminho: Caminho do arquivo
+        inicio, fim: Posições em bytes do trecho
+        
+    Returns:
+        Conteúdo do trecho
+    """
+    if not hasattr(os, 'pread'):
+        # Sem leituras posicionais (ex: Windows), lê pelo objeto de arquivo
+        with open(caminho, 'rb') as arquivo:
+            arquivo.seek(inicio)
+            return arquivo.read(fim - inicio)
+    
+    fd = os.open(caminho, os.O_RDONLY)
+    try:
+        if hasattr(os, 'posix_fadvise'):
+            os.posix_fadvise(fd, inicio, fim - inicio, os.POSIX_FADV_WILLNEED)
+        
+        partes = []
+        posicao = inicio
+        while posicao < fim:
+            parte = os.pread(fd, min(_BLOCO_LEITURA, fim - posicao), posicao)
+            if not parte:
+                break
+            partes.append(parte)
+            posicao += len(parte)
+        
+        return partes[0] if len(partes) == 1 else b''.join(partes)
+    finally:
+        os.close(fd)
+
+
+def processar_trecho(dados_trecho: Tuple[str, int, int, CotacaoParser]) -> Tuple:
+    """
+    Processa um trecho de um arquivo de cotações em um processo separado.
+    O processo lê o trecho direto do arquivo, em vez de receber as linhas
+    serializadas do processo principal.
+    
+    Args:
+        dados_trecho: Tupla (caminho, inicio, fim, parser) onde:
+            - caminho: Caminho do arquivo de cotações
+            - inicio, fim: Posições em bytes do trecho (ver dividir_arquivo)
+            - parser: Objeto CotacaoParser para processar as linhas
+            
+    Returns:
+        Colunas dos registros processados (ver processar_chunk), ou tupla vazia em caso de erro
+    """
+    caminho, inicio, fim, parser = dados_trecho
+    
+    try:
+        linhas = ler_trecho(caminho, inicio, fim).splitlines()
+    except OSError as e:
+        _configurar_logger_processo().error(f"Erro ao ler o trecho {inicio}-{fim} de {caminho}: {e}")
+        return ()
+    
+    return processar_chunk((linhas, parser))
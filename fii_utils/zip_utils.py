@@ -4,10 +4,12 @@ Centraliza funções relacionadas à extração e verificação de arquivos ZIP.
 """
 
 import os
+import io
 import logging
 import zipfile
 import time
-from typing import List, Optional, Tuple, Set, Dict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import List, Optional, Tuple, Set, FrozenSet, Dict, Union
 
 from fii_utils.logging_manager import get_logger
 
@@ -58,8 +60,28 @@ def obter_caminho_arquivo_correspondente(caminho_arquivo: str, extensao_destino:
     return os.path.join(diretorio, nome_base + extensao_destino)
 
 
+# Threads usadas para extrair ZIPs com vários arquivos
+MAX_THREADS_EXTRACAO = 8
+
+
+def _extrair_membros(origem: Union[str, bytes], membros: List[str], extract_to: str) -> None:
+    """
+    Extrai um grupo de arquivos de um ZIP. Cada chamada abre o próprio ZipFile,
+    pois um mesmo ZipFile não pode ser lido por várias threads ao mesmo tempo.
+    
+    Args:
+        origem: Caminho do ZIP ou seu conteúdo em memória
+        membros: Nomes dos arquivos a extrair
+        extract_to: Diretório para extração
+    """
+    with zipfile.ZipFile(io.BytesIO(origem) if isinstance(origem, bytes) else origem, 'r') as zip_ref:
+        for membro in membros:
+            zip_ref.extract(membro, extract_to)
+
+
 def extrair_zip(zip_path: str, extract_to: Optional[str] = None, 
-                max_retries: int = 3, retry_delay: float = 2.0) -> List[str]:
+                max_retries: int = 3, retry_delay: float = 2.0,
+                arquivo_memoria: Optional[io.BytesIO] = None) -> List[str]:
     """
     Extrai um arquivo ZIP com suporte a múltiplas tentativas.
     
@@ -68,6 +90,8 @@ def extrair_zip(zip_path: str, extract_to: Optional[str] = None,
         extract_to: Diretório para extração (padrão: mesmo diretório do ZIP)
         max_retries: Número máximo de tentativas em caso de falha
         retry_delay: Tempo de espera entre tentativas (segundos)
+        arquivo_memoria: Conteúdo do ZIP já em memória (ex: recém-baixado); se
+                         fornecido, é extraído no lugar de zip_path, sem ler o disco
         
     Returns:
         Lista de caminhos completos para os arquivos extraídos ou lista vazia em caso de falha
@@ -75,7 +99,7 @@ def extrair_zip(zip_path: str, extract_to: Optional[str] = None,
     logger = get_logger('FIIDatabase')
 
     # Verifica se o arquivo existe
-    if not os.path.exists(zip_path):
+    if arquivo_memoria is None and not os.path.exists(zip_path):
         logger.error(f"Arquivo ZIP não encontrado: {zip_path}")
         return []
     
@@ -91,14 +115,24 @@ def extrair_zip(zip_path: str, extract_to: Optional[str] = None,
         try:
             extracted_files = []
             
-            with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+            with zipfile.ZipFile(arquivo_memoria if arquivo_memoria is not None else zip_path, 'r') as zip_ref:
                 # Lista de arquivos no ZIP
                 file_list = zip_ref.namelist()
                 logger.info(f"Tentativa {tentativa+1}/{max_retries}: Extraindo {len(file_list)} arquivos de {zip_path}")
                 
-                # Extrai todos os arquivos
+                # Extrai todos os arquivos; com vários arquivos, em threads paralelas
+                # (o zlib libera o GIL durante a descompressão)
+                threads = min(MAX_THREADS_EXTRACAO, len(file_list))
+                if threads > 1:
+                    origem = arquivo_memoria.getvalue() if arquivo_memoria is not None else zip_path
+                    grupos = [file_list[i::threads] for i in range(threads)]
+                    with ThreadPoolExecutor(max_workers=threads) as executor:
+                        list(executor.map(_extrair_membros, [origem] * threads, grupos, [extract_to] * threads))
+                else:
+                    for file in file_list:
+                        zip_ref.extract(file, extract_to)
+                
                 for file in file_list:
-                    zip_ref.extract(file, extract_to)
                     extracted_path = os.path.join(extract_to, file)
                     extracted_files.append(extracted_path)
                     logger.info(f"Arquivo extraído: {file}")
@@ -125,45 +159,65 @@ def extrair_zip(zip_path: str, extract_to: Optional[str] = None,
     return []
 
 
-def obter_arquivos_processados_do_banco(db_path: str, logger: logging.Logger) -> Set[str]:
+def _extract_one(zip_path: str, out_dir: str, max_retries: int = 3, retry_delay: float = 2.0) -> List[str]:
+    """
+    Extrai um único ZIP; função de nível de módulo para poder ser executada
+    em um processo separado.
+    
+    Args:
+        zip_path: Caminho completo para o arquivo ZIP
+        out_dir: Diretório para extração
+        max_retries: Número máximo de tentativas em caso de falha
+        retry_delay: Tempo de espera entre tentativas (segundos)
+        
+    Returns:
+        Lista de caminhos dos arquivos extraídos ou lista vazia em caso de falha
+    """
+    return extrair_zip(zip_path, out_dir, max_retries=max_retries, retry_delay=retry_delay)
+
+
+def obter_arquivos_processados_do_banco(db_path: str, logger: logging.Logger, manager=None) -> FrozenSet[str]:
     """
     Consulta o banco de dados para obter a lista de arquivos ZIP já processados.
     
     Args:
         db_path: Caminho para o arquivo do banco de dados
         logger: Logger para registro de eventos
+        manager: ArquivosProcessadosManager já conectado (opcional). Quando informado,
+                 sua conexão é reutilizada e não é fechada aqui
         
     Returns:
-        Conjunto de nomes de arquivos ZIP já processados
+        Conjunto imutável de nomes de arquivos ZIP já processados, em maiúsculas
     """
     try:
         # Importação tardia para evitar problemas de importação circular
         from db_managers.arquivos import ArquivosProcessadosManager
         
         # Consultar o banco para determinar quais ZIPs já foram processados
-        arquivos_processados = set()
-        arquivos_manager = ArquivosProcessadosManager(db_path)
+        arquivos_processados = frozenset()
+        arquivos_manager = manager or ArquivosProcessadosManager(db_path)
         
         try:
-            arquivos_manager.conectar()
+            if manager is None:
+                arquivos_manager.conectar()
             
             # Obter lista de arquivos já processados
+            # Normaliza os nomes uma vez aqui, para a busca por nome ser direta
             arquivos = arquivos_manager.listar_arquivos_processados()
-            for a in arquivos:
-                if a['nome_arquivo'].endswith('.ZIP'):
-                    arquivos_processados.add(a['nome_arquivo'])
+            nomes = (a['nome_arquivo'].upper() for a in arquivos)
+            arquivos_processados = frozenset(nome for nome in nomes if nome.endswith('.ZIP'))
                     
             logger.info(f"Encontrados {len(arquivos_processados)} arquivos ZIP já processados no banco")
             
         finally:
-            if arquivos_manager and hasattr(arquivos_manager, 'fechar_conexao'):
+            if manager is None:
                 arquivos_manager.fechar_conexao()
             
         return arquivos_processados
         
     except Exception as e:
         logger.error(f"Erro ao consultar banco de dados: {e}")
-        return set()
+        return frozenset()
 
 
 def verificar_extrair_zips_pendentes(diretorio: str, logger: logging.Logger, 
@@ -177,7 +231,7 @@ def verificar_extrair_zips_pendentes(diretorio: str, logger: logging.Logger,
     Args:
         diretorio: Diretório onde buscar arquivos ZIP
         logger: Logger para registro de eventos
-        arquivos_processados: Conjunto de nomes de arquivos ZIP já processados
+        arquivos_processados: Conjunto de nomes de arquivos ZIP já processados (em maiúsculas)
         config: Configuração com parâmetros de extração
         
     Returns:
@@ -195,33 +249,35 @@ def verificar_extrair_zips_pendentes(diretorio: str, logger: logging.Logger,
     zips_pendentes = []
     
     # Procura todos os arquivos ZIP no diretório
-    for nome_arquivo in os.listdir(diretorio):
-        nome_arquivo = nome_arquivo.upper()  # Normaliza para maiúsculas
-        
-        if nome_arquivo.endswith('.ZIP') and nome_arquivo.startswith('COTAHIST_'):
-            # Verifica se o ZIP já foi processado (único critério)
-            if nome_arquivo in arquivos_processados:
-                logger.debug(f"Arquivo ZIP {nome_arquivo} já processado. Ignorando.")
-                continue
+    with os.scandir(diretorio) as entradas:
+        for entrada in entradas:
+            nome_arquivo = entrada.name.upper()  # Normaliza para maiúsculas
             
-            # Adicionar à lista de ZIPs pendentes
-            zip_path = os.path.join(diretorio, nome_arquivo)
-            zips_pendentes.append(zip_path)
+            if nome_arquivo.endswith('.ZIP') and nome_arquivo.startswith('COTAHIST_'):
+                # Verifica se o ZIP já foi processado (único critério)
+                if nome_arquivo in arquivos_processados:
+                    logger.debug(f"Arquivo ZIP {nome_arquivo} já processado. Ignorando.")
+                    continue
+                
+                # Adicionar à lista de ZIPs pendentes
+                zips_pendentes.append(entrada.path)
     
     # Processa os ZIPs pendentes
     if zips_pendentes:
         logger.info(f"Encontrados {len(zips_pendentes)} ZIPs pendentes para extração")
         
-        for zip_path in zips_pendentes:
+        # A descompressão usa CPU: com vários ZIPs, extrai em processos paralelos
+        n = len(zips_pendentes)
+        args = ([diretorio] * n, [max_retries] * n, [retry_delay] * n)
+        workers = min(os.cpu_count() or 1, n)
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                resultados = list(executor.map(_extract_one, zips_pendentes, *args))
+        else:
+            resultados = list(map(_extract_one, zips_pendentes, *args))
+        
+        for zip_path, extracted_files in zip(zips_pendentes, resultados):
             nome_arquivo = os.path.basename(zip_path)
-            logger.info(f"Extraindo ZIP pendente: {nome_arquivo}")
-            
-            # Tenta extrair o arquivo
-            extracted_files = extrair_zip(
-                zip_path, diretorio,
-                max_retries=max_retries,
-                retry_delay=retry_delay
-            )
             
             if extracted_files:
                 processados += 1
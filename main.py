@@ -718,18 +718,18 @@ def baixar_arquivos(args, logger) -> None:
         if range_diario:
             inicio, fim = range_diario
             imprimir_item("Modo de download", f"Diário (intervalo de {inicio.strftime('%d/%m/%Y')} a {fim.strftime('%d/%m/%Y')})")
-            datas = baixar_arquivos_diarios(inicio, fim, args.force)
+            datas = baixar_arquivos_diarios(inicio, fim, config_manager.get_config(), args.force)
         
         elif range_mensal:
             mes_inicio, ano_inicio, mes_fim, ano_fim = range_mensal
             imprimir_item("Modo de download", f"Mensal (intervalo de {mes_inicio:02d}/{ano_inicio} a {mes_fim:02d}/{ano_fim})")
-            meses = baixar_arquivos_mensais(mes_inicio, ano_inicio, mes_fim, ano_fim, args.force)
+            meses = baixar_arquivos_mensais(mes_inicio, ano_inicio, mes_fim, ano_fim, config_manager.get_config(), args.force)
             download_mensal = True
         
         elif range_anual:
             ano_inicio, ano_fim = range_anual
             imprimir_item("Modo de download", f"Anual (intervalo de {ano_inicio} a {ano_fim})")
-            anos = baixar_arquivos_anuais(ano_inicio, ano_fim, args.force)
+            anos = baixar_arquivos_anuais(ano_inicio, ano_fim, config_manager.get_config(), args.force)
             download_anual = True
     
     elif args.anterior:
@@ -771,7 +771,7 @@ def baixar_arquivos(args, logger) -> None:
         # Download de arquivos anuais usando a função centralizada
         for ano in anos:
             imprimir_item("Baixando", f"Arquivo anual para {ano}")
-            sucesso = baixar_arquivo_anual(ano, args.force)
+            sucesso, _, _ = baixar_arquivo_anual(ano, config_manager.get_config(), args.force)
             if sucesso:
                 success_count += 1
                 imprimir_sucesso(f"Download do arquivo anual para {ano} concluído com sucesso")
@@ -785,7 +785,7 @@ def baixar_arquivos(args, logger) -> None:
         # Download de arquivos mensais usando a função centralizada
         for mes, ano in meses:
             imprimir_item("Baixando", f"Arquivo mensal para {mes}/{ano}")
-            sucesso = baixar_arquivo_mensal(mes, ano, args.force)
+            sucesso, _, _ = baixar_arquivo_mensal(mes, ano, config_manager.get_config(), args.force)
             if sucesso:
                 success_count += 1
                 imprimir_sucesso(f"Download do arquivo mensal para {mes}/{ano} concluído com sucesso")
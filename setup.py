@@ -34,7 +34,6 @@ DEFAULT_CONFIG = {
     "max_log_backups": 5,
     "verify_downloads": True,
     "concurrent_downloads": 1,
-    "enable_curl_verbose": True,
     "fix_permissions": False,
     "secure_permissions": "750",
     "default_period": "daily",
@@ -132,40 +131,21 @@ def verificar_sistema():
     python_ok = python_version.major == 3 and python_version.minor >= 6
     print(f"{'✓' if python_ok else '✗'} Python 3.6+: v{python_version.major}.{python_version.minor}.{python_version.micro}")
     
-    # Verificar curl
+    # Verificar suporte a SSL do Python (downloads e verificação de certificados)
     try:
-        subprocess.check_output(["curl", "--version"])
-        curl_ok = True
-        print("✓ curl: Instalado")
-    except:
-        curl_ok = False
-        print("✗ curl: Não encontrado")
+        import ssl
+        ssl_ok = True
+        print(f"✓ SSL: {ssl.OPENSSL_VERSION}")
+    except ImportError:
+        ssl_ok = False
+        print("✗ SSL: Módulo ssl não disponível")
     
-    # Verificar OpenSSL
-    try:
-        subprocess.check_output(["openssl", "version"])
-        openssl_ok = True
-        print("✓ OpenSSL: Instalado")
-    except:
-        openssl_ok = False
-        print("✗ OpenSSL: Não encontrado")
-    
-    if not (python_ok and curl_ok and openssl_ok):
+    if not (python_ok and ssl_ok):
         print("\n⚠ Atenção: Alguns requisitos de sistema não foram encontrados.")
         
-        if not curl_ok:
-            print("  - curl é necessário para download de arquivos da B3")
-            print("    - Ubuntu/Debian: sudo apt install curl")
-            print("    - Fedora/CentOS: sudo dnf install curl")
-            print("    - macOS: brew install curl")
-            print("    - Windows: Instale Git for Windows ou use WSL")
-        
-        if not openssl_ok:
-            print("  - OpenSSL é necessário para verificação de certificados SSL")
-            print("    - Ubuntu/Debian: sudo apt install openssl")
-            print("    - Fedora/CentOS: sudo dnf install openssl")
-            print("    - macOS: brew install openssl")
-            print("    - Windows: Instale Git for Windows ou use WSL")
+        if not ssl_ok:
+            print("  - O módulo ssl do Python é necessário para download seguro e verificação de certificados")
+            print("    - Reinstale o Python com suporte a OpenSSL (ex.: Ubuntu/Debian: sudo apt install python3 libssl-dev)")
 
 def main():
     """Função principal."""